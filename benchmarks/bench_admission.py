@@ -0,0 +1,105 @@
+"""Benchmark: server peak RSS under concurrent large /v1/tts requests.
+
+Fires CONCURRENCY simultaneous base64-JSON requests for a large clip (from
+a local fake MiniMax upstream) at a fresh server with admission control
+off, then on with the default budgets, and reports the server's peak RSS,
+how many requests succeeded, spilled to disk or got 503.
+
+Usage:
+    python benchmarks/bench_admission.py [CLIP_MB] [CONCURRENCY]
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bench_cold_start  # noqa: E402
+from bench_cold_start import ROOT, FakeMinimax, free_port, wait_for  # noqa: E402
+from bench_binary_audio import peak_rss_mib  # noqa: E402
+
+# Long enough that the admission estimate is close to an 8 MiB clip
+TEXT = "word " * 1000
+
+
+def post(base: str) -> int:
+    request = urllib.request.Request(
+        f"{base}/v1/tts", data=json.dumps({"text": TEXT, "model": "speech-02-hd"}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run(env: dict, concurrency: int) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for(f"{base}/ready", time.perf_counter() + 60)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            statuses = list(pool.map(lambda _: post(base), range(concurrency)))
+        elapsed = time.perf_counter() - start
+        metrics = urllib.request.urlopen(f"{base}/metrics").read().decode()
+        spilled = next((line.split()[-1] for line in metrics.splitlines()
+                        if line.startswith('audio_admission_total{outcome="spilled"}')), "0")
+        return {
+            "ok": statuses.count(200),
+            "busy": statuses.count(503),
+            "spilled": int(spilled),
+            "rss_peak": peak_rss_mib(server.pid),
+            "elapsed": elapsed,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    clip_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 8.0
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    frame = b"\xff\xfb\x90\x00"
+    bench_cold_start.FAKE_AUDIO_HEX = (frame * int(clip_mb * 2 ** 20 / len(frame))).hex()
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), FakeMinimax)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'admission.db')}",
+        "MINIMAX_BASE_URL": f"http://127.0.0.1:{upstream.server_address[1]}",
+        "MINIMAX_API_KEY": "bench-key",
+        "MINIMAX_GROUP_ID": "1",
+        "ENFORCE_AUTH": "false",
+        "FALLBACK_TO_SILENT_AUDIO": "false",
+        "MAX_TEXT_LENGTH": "10000",
+    })
+    subprocess.run([sys.executable, "-m", "src.init_db"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    print(f"clip {clip_mb:.1f} MiB, {concurrency} concurrent base64 JSON requests")
+    print(f"{'admission':<10} {'200':>5} {'503':>5} {'spilled':>8} {'peak RSS MiB':>13} {'wall s':>7}")
+    for label, enabled in (("off", "false"), ("on", "true")):
+        r = run({**env, "ADMISSION_ENABLED": enabled}, concurrency)
+        print(f"{label:<10} {r['ok']:>5} {r['busy']:>5} {r['spilled']:>8} {r['rss_peak']:>13.1f} {r['elapsed']:>7.1f}")
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark: /v1/tts as base64-in-JSON vs raw ``audio/mpeg``.
+
+Starts the app against a local fake MiniMax upstream returning a large clip
+and requests it once per mode, each from a fresh server process, reporting
+bytes on the wire, request latency and the server's peak RSS (``VmHWM``
+from ``/proc``, Linux only) before and after the requests.
+
+Usage:
+    python benchmarks/bench_binary_audio.py [CLIP_MB] [REQUESTS]
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_cold_start import ROOT, FakeMinimax, free_port, wait_for  # noqa: E402
+
+MODES = {"json": "application/json", "binary": "audio/mpeg"}
+
+
+def peak_rss_mib(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def run_mode(env: dict, accept: str, requests: int) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        wait_for(f"{base}/ready", time.perf_counter() + 60)
+        rss_idle = peak_rss_mib(server.pid)
+        payload = json.dumps({"text": "Hello from the binary audio benchmark"}).encode()
+        wire_bytes, elapsed = 0, 0.0
+        for _ in range(requests):
+            request = urllib.request.Request(
+                f"{base}/v1/tts", data=payload,
+                headers={"Content-Type": "application/json", "Accept": accept},
+            )
+            start = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=120) as response:
+                body = response.read()
+            elapsed += time.perf_counter() - start
+            wire_bytes = len(body)
+        return {
+            "wire_mib": wire_bytes / 2 ** 20,
+            "latency_ms": elapsed / requests * 1000,
+            "rss_idle": rss_idle,
+            "rss_peak": peak_rss_mib(server.pid),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    clip_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 8.0
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    frame = b"\xff\xfb\x90\x00"
+    import bench_cold_start
+    bench_cold_start.FAKE_AUDIO_HEX = (frame * int(clip_mb * 2 ** 20 / len(frame))).hex()
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), FakeMinimax)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'binary_audio.db')}",
+        "MINIMAX_BASE_URL": f"http://127.0.0.1:{upstream.server_address[1]}",
+        "MINIMAX_API_KEY": "bench-key",
+        "MINIMAX_GROUP_ID": "1",
+        "ENFORCE_AUTH": "false",
+        "FALLBACK_TO_SILENT_AUDIO": "false",
+    })
+    subprocess.run([sys.executable, "-m", "src.init_db"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    print(f"clip {clip_mb:.1f} MiB, {requests} requests per mode")
+    print(f"{'mode':<8} {'wire MiB':>9} {'latency ms':>11} {'idle RSS':>9} {'peak RSS':>9}  (MiB)")
+    for label, accept in MODES.items():
+        r = run_mode(env, accept, requests)
+        print(f"{label:<8} {r['wire_mib']:>9.2f} {r['latency_ms']:>11.0f} {r['rss_idle']:>9.1f} {r['rss_peak']:>9.1f}")
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
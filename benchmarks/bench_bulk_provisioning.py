@@ -0,0 +1,73 @@
+"""Benchmark: onboarding N users one at a time vs. ``POST /admin/users/bulk``.
+
+Both paths run in-process against a throwaway SQLite file so the numbers
+exclude network round trips (which make the per-user loop far worse in
+practice). The per-user path mirrors ``/admin/users``: email check, insert,
+commit, refresh.
+
+Each key costs one PBKDF2 run (``API_KEY_PBKDF2_ITERATIONS``) on both paths;
+the bulk path hashes on ``KEY_HASH_WORKERS`` threads, so it gains most on
+multi-core hosts.
+
+Usage:
+    python benchmarks/bench_bulk_provisioning.py [users]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User, Plan, PLAN_CONFIGS
+from src.api_keys import issue_api_key
+from src.provisioning import provision_users
+
+
+def fresh_session():
+    path = os.path.join(tempfile.mkdtemp(), "bulk.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def one_at_a_time(db, rows) -> None:
+    for row in rows:
+        if db.query(User).filter(User.email == row["email"]).first():
+            continue
+        _, key_id, key_hash = issue_api_key()
+        user = User(name=row["name"], email=row["email"], api_key_prefix=key_id, api_key_hash=key_hash,
+                    plan=Plan.FREE, quota_seconds=PLAN_CONFIGS[Plan.FREE]["quota_seconds"], used_seconds=0.0)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rows = [{"name": f"User {i}", "email": f"user{i}@reseller.example.com"} for i in range(users)]
+
+    db = fresh_session()
+    start = time.perf_counter()
+    one_at_a_time(db, rows)
+    single = time.perf_counter() - start
+    db.close()
+
+    db = fresh_session()
+    start = time.perf_counter()
+    results = provision_users(db, rows)
+    bulk = time.perf_counter() - start
+    assert sum("api_key" in r for r in results) == users
+    db.close()
+
+    print(f"{users} users")
+    print(f"  one at a time: {single:8.2f} s")
+    print(f"  bulk:          {bulk:8.2f} s  ({single / bulk:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark: process start to first successful /v1/tts.
+
+Mirrors the container start command (``python -m src.init_db`` followed by
+uvicorn) against a throwaway SQLite database and a local fake MiniMax
+upstream, and reports when each milestone was reached:
+
+    init_db done -> /health 200 -> /ready 200 -> first /v1/tts 200
+
+Runs twice: a cold run on an empty database and a warm-disk run where
+init_db finds the schema already current.
+
+Usage:
+    python benchmarks/bench_cold_start.py
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_AUDIO_HEX = (b"\xff\xfb\x90\x00" * 4096).hex()
+
+
+class FakeMinimax(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "data": {"audio": FAKE_AUDIO_HEX},
+            "base_resp": {"status_code": 0, "status_msg": "success"},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float, data: bytes = None) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def run_once(env: dict) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "src.init_db"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    init_done = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        deadline = start + 60
+        health = wait_for(f"{base}/health", deadline)
+        ready = wait_for(f"{base}/ready", deadline)
+        payload = json.dumps({"text": "Hello from the cold start benchmark"}).encode()
+        tts = wait_for(f"{base}/v1/tts", deadline, data=payload)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "init_db": init_done - start,
+        "health": health - start,
+        "ready": ready - start,
+        "first_tts": tts - start,
+    }
+
+
+def main():
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), FakeMinimax)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cold_start.db')}",
+        "MINIMAX_BASE_URL": f"http://127.0.0.1:{upstream.server_address[1]}",
+        "MINIMAX_API_KEY": "bench-key",
+        "MINIMAX_GROUP_ID": "1",
+        "ENFORCE_AUTH": "false",
+        "FALLBACK_TO_SILENT_AUDIO": "false",
+    })
+
+    print(f"{'run':<10} {'init_db':>9} {'/health':>9} {'/ready':>9} {'1st tts':>9}  (ms since start)")
+    for label in ("cold", "warm-disk"):
+        result = run_once(env)
+        print(f"{label:<10} " + " ".join(f"{result[k] * 1000:>9.0f}" for k in ("init_db", "health", "ready", "first_tts")))
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
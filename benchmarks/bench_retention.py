@@ -0,0 +1,109 @@
+"""Benchmark: database size and auth-lookup latency before/after usage retention.
+
+Builds a throwaway SQLite database with N users and M usage rows spread over
+a year, then runs compaction with the default 90-day window and reports the
+file size (db + WAL) and the median latency of the auth query
+(``SELECT ... FROM users WHERE api_key_hash = ?``) before and after.
+
+Usage:
+    python benchmarks/bench_retention.py [usage_rows] [users]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import random
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User, Usage, Plan, UsageStatus
+from src.auth import generate_api_key, hash_api_key
+from src.retention import compact_usage_logs, retention_cutoff, reclaim_space
+
+
+def file_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def auth_latency(Session, hashes, samples: int = 2000) -> float:
+    db = Session()
+    try:
+        timings = []
+        for _ in range(samples):
+            key_hash = random.choice(hashes)
+            start = time.perf_counter()
+            db.query(User).filter(User.api_key_hash == key_hash).first()
+            timings.append(time.perf_counter() - start)
+            db.expunge_all()
+        return statistics.median(timings) * 1e6
+    finally:
+        db.close()
+
+
+def main():
+    usage_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    user_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_retention.db")
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    hashes = [hash_api_key(generate_api_key()) for _ in range(user_count)]
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "name": f"user{i}", "email": f"user{i}@bench.local", "api_key_hash": h,
+                "plan": Plan.BASIC, "quota_seconds": 3600.0, "used_seconds": 0.0,
+                "is_active": True, "created_at": now, "updated_at": now,
+            }
+            for i, h in enumerate(hashes)
+        ])
+        batch = []
+        for i in range(usage_rows):
+            batch.append({
+                "user_id": random.randint(1, user_count),
+                "voice_id": 0,
+                "text_length": random.randint(10, 500),
+                "audio_seconds": random.uniform(1, 30),
+                "status": UsageStatus.SUCCESS,
+                "model_used": "speech-02-turbo",
+                "timestamp": now - timedelta(seconds=random.randint(0, 365 * 86400)),
+            })
+            if len(batch) == 10_000:
+                conn.execute(insert(Usage), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(Usage), batch)
+
+    size_before = file_size(path)
+    latency_before = auth_latency(Session, hashes)
+
+    db = Session()
+    start = time.perf_counter()
+    result = compact_usage_logs(db, cutoff=retention_cutoff())
+    elapsed = time.perf_counter() - start
+    db.close()
+    reclaim_space(engine)
+
+    size_after = file_size(path)
+    latency_after = auth_latency(Session, hashes)
+
+    print(f"usage rows:        {usage_rows:,}  users: {user_count:,}")
+    print(f"rows compacted:    {result['rows_compacted']:,} in {result['batches']} batches ({elapsed:.2f}s)")
+    print(f"db size:           {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+    print(f"auth lookup (p50): {latency_before:.1f} us -> {latency_after:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark: SQLite requests/sec under NullPool vs pooled connections.
+
+Simulates request handlers on a thread pool (as FastAPI runs sync
+dependencies): each "request" opens a session, looks up a user by id and,
+for a share of requests, records usage (insert + quota update), then closes
+the session. Compares ``database_fixed`` SQLite modes:
+
+- null: new connection and PRAGMA setup per request (previous behaviour)
+- queue: bounded pool of long-lived connections
+- thread: one long-lived connection per thread
+
+Usage:
+    python benchmarks/bench_sqlite_pool.py [requests] [threads] [write_pct]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import sessionmaker
+
+from src.database_fixed import create_sqlite_engine
+from src.migrations import run_migrations
+from src.models import User, Usage, UsageStatus, Plan
+
+USERS = 1_000
+
+
+def seed(url: str) -> None:
+    engine = create_sqlite_engine(url, mode="null")
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"u{i}", "email": f"u{i}@bench.local", "api_key_hash": f"h{i}",
+             "plan": Plan.PRO, "quota_seconds": 1e9, "used_seconds": 0.0}
+            for i in range(USERS)
+        ])
+    engine.dispose()
+
+
+def run(url: str, mode: str, requests: int, threads: int, write_pct: float) -> float:
+    engine = create_sqlite_engine(url, mode=mode, pool_size=threads)
+    session = sessionmaker(bind=engine)
+
+    def handle(_):
+        user_id = random.randint(1, USERS)
+        if random.random() < write_pct:
+            db = session()
+            try:
+                db.get(User, user_id)
+                db.execute(insert(Usage).values(
+                    user_id=user_id, text_length=100, audio_seconds=1.5,
+                    status=UsageStatus.SUCCESS, model_used="bench"))
+                db.execute(update(User).where(User.id == user_id)
+                           .values(used_seconds=User.used_seconds + 1.5))
+                db.commit()
+            finally:
+                db.close()
+        else:
+            db = session()
+            try:
+                db.get(User, user_id)
+            finally:
+                db.close()
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(handle, range(requests // 10)))  # warm up
+        start = time.perf_counter()
+        list(pool.map(handle, range(requests)))
+        elapsed = time.perf_counter() - start
+    engine.dispose()
+    return requests / elapsed
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    write_pct = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_pool.db')}"
+    seed(url)
+    print(f"requests: {requests:,}  threads: {threads}  writes: {write_pct:.0%}")
+    print(f"{'mode':<14} {'req/s':>10}")
+    for mode in ("null", "queue", "thread"):
+        print(f"{mode:<14} {run(url, mode, requests, threads, write_pct):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
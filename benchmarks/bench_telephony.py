@@ -0,0 +1,144 @@
+"""Benchmark: time to the first 20 ms telephony frame, and G.711 encode cost.
+
+A local fake MiniMax synthesizes a 10 s clip of 8 kHz PCM at 4x real time
+(one 0.5 s chunk every 125 ms). Two ways to get the first mu-law frame:
+
+- download: one ``text_to_speech`` call, the whole clip, then encode
+  (what a bridge downloading the finished file waits for)
+- stream:   ``stream_speech`` (``"stream": true``) and the frame encoder,
+  which emits the first frame as soon as the first chunk arrives
+
+Then mu-law encoding throughput: the vectorized table lookup against a
+per-sample Python loop.
+
+Usage:
+    python benchmarks/bench_telephony.py
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_cold_start import free_port  # noqa: E402
+
+SAMPLE_RATE = 8000
+CHUNK_SECONDS = 0.5
+CHUNKS = 20
+SYNTHESIS_SPEEDUP = 4.0
+CHUNK = bytes(range(256)) * int(SAMPLE_RATE * 2 * CHUNK_SECONDS / 256)
+
+
+class FakeMinimax(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        delay = CHUNK_SECONDS / SYNTHESIS_SPEEDUP
+        if not payload.get("stream"):
+            time.sleep(delay * CHUNKS)
+            body = json.dumps({
+                "data": {"audio": (CHUNK * CHUNKS).hex()},
+                "base_resp": {"status_code": 0, "status_msg": "success"},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        # Server-sent events over chunked encoding, one event per chunk, as MiniMax sends them
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for _ in range(CHUNKS):
+            time.sleep(delay)
+            event = {"data": {"audio": CHUNK.hex(), "status": 1}, "base_resp": {"status_code": 0}}
+            data = b"data: " + json.dumps(event).encode() + b"\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def first_frame_download(client, fmt) -> float:
+    from src.telephony import FrameEncoder
+    start = time.perf_counter()
+    result = client.text_to_speech("x", "voice", audio_format=fmt, encode_base64=False)
+    FrameEncoder("mulaw", SAMPLE_RATE).feed(bytes(result["audio_data"]))
+    return time.perf_counter() - start
+
+
+def first_frame_stream(client, fmt) -> float:
+    from src.telephony import FrameEncoder
+    start = time.perf_counter()
+    encoder = FrameEncoder("mulaw", SAMPLE_RATE)
+    chunks = client.stream_speech("x", "voice", audio_format=fmt)
+    for chunk in chunks:
+        if encoder.feed(chunk):
+            elapsed = time.perf_counter() - start
+            break
+    for _ in chunks:  # drain, so the connection is released
+        pass
+    return elapsed
+
+
+def python_mulaw(pcm: bytes) -> bytes:
+    out = bytearray(len(pcm) // 2)
+    for i in range(len(out)):
+        sample = int.from_bytes(pcm[2 * i:2 * i + 2], "little", signed=True) >> 2
+        mask = 0x7F if sample < 0 else 0xFF
+        sample = min(abs(sample), 8159) + 0x21
+        segment = 0
+        while segment < 8 and sample > (0x3F << segment):
+            segment += 1
+        value = 0x7F if segment >= 8 else (segment << 4) | ((sample >> (segment + 1)) & 0x0F)
+        out[i] = value ^ mask
+    return bytes(out)
+
+
+def main():
+    port = free_port()
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeMinimax)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["MINIMAX_BASE_URL"] = f"http://127.0.0.1:{port}"
+
+    from unittest import mock
+    from src.minimax_client import MinimaxClient
+    from src.telephony import encode_g711, telephony_format
+
+    client = MinimaxClient(api_key="key", group_id="1")
+    fmt = telephony_format("mulaw", SAMPLE_RATE)
+    clip_seconds = CHUNK_SECONDS * CHUNKS
+    print(f"{clip_seconds:.0f} s clip, synthesized at {SYNTHESIS_SPEEDUP:.0f}x real time")
+    with mock.patch("builtins.print"):
+        download = min(first_frame_download(client, fmt) for _ in range(2))
+    stream = min(first_frame_stream(client, fmt) for _ in range(3))
+    print(f"  first frame, download then encode: {download * 1000:7.0f} ms")
+    print(f"  first frame, streamed:             {stream * 1000:7.0f} ms")
+    server.shutdown()
+
+    pcm = CHUNK * CHUNKS
+    encode_g711(pcm[:2], "mulaw")  # build the table
+    start = time.perf_counter()
+    for _ in range(100):
+        encode_g711(pcm, "mulaw")
+    vectorized = (time.perf_counter() - start) / 100
+    start = time.perf_counter()
+    python_mulaw(pcm)
+    loop = time.perf_counter() - start
+    print(f"mu-law encode of {clip_seconds:.0f} s: table {vectorized * 1000:.2f} ms, "
+          f"Python loop {loop * 1000:.0f} ms ({loop / vectorized:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark: serializing a /v1/tts JSON response with a large audio_base64.
+
+Each method starts from the clip bytes and ends with the response body
+bytes, including the base64 step, at 100 KB, 1 MB and 5 MB:
+
+- pydantic + json.dumps: ``TTSResponse`` validated, dumped to a dict and
+  rendered by ``JSONResponse`` (FastAPI < 0.130, as pinned in
+  requirements.txt)
+- pydantic dump_json: validated and serialized by pydantic-core (FastAPI's
+  newer fast path for ``response_model``)
+- orjson: the dict through ``orjson.dumps`` (skipped if not installed)
+- spliced envelope: ``AudioJSONResponse``, the base64 bytes spliced between
+  a prebuilt prefix and suffix
+
+Reports median time and the tracemalloc peak of allocations (the clip
+itself excluded), as a multiple of the clip size.
+
+Usage:
+    python benchmarks/bench_tts_serialization.py
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import base64
+import statistics
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from src.schemas import TTSResponse  # noqa: E402
+from src.responses import AudioJSONResponse  # noqa: E402
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+SIZES = {"100 KB": 100 * 1000, "1 MB": 10 ** 6, "5 MB": 5 * 10 ** 6}
+FIELDS = {
+    "audio_url": None,
+    "duration_seconds": 12.5,
+    "sample_rate": 32000,
+    "voice_used": "marcus",
+    "text_length": 180,
+    "remaining_quota": 3412.25,
+}
+ADAPTER = TypeAdapter(TTSResponse)
+
+
+def pydantic_json_dumps(audio: bytes) -> bytes:
+    model = TTSResponse(audio_base64=base64.b64encode(audio).decode("utf-8"), **FIELDS)
+    return JSONResponse(ADAPTER.dump_python(ADAPTER.validate_python(model), mode="json")).body
+
+
+def pydantic_dump_json(audio: bytes) -> bytes:
+    model = TTSResponse(audio_base64=base64.b64encode(audio).decode("utf-8"), **FIELDS)
+    return ADAPTER.dump_json(ADAPTER.validate_python(model))
+
+
+def orjson_dumps(audio: bytes) -> bytes:
+    return orjson.dumps({"audio_base64": base64.b64encode(audio).decode("utf-8"), **FIELDS})
+
+
+def spliced(audio: bytes):
+    return AudioJSONResponse("audio_base64", base64.b64encode(audio), FIELDS).parts
+
+
+METHODS = {
+    "pydantic + json.dumps": pydantic_json_dumps,
+    "pydantic dump_json": pydantic_dump_json,
+    "orjson": orjson_dumps if orjson is not None else None,
+    "spliced envelope": spliced,
+}
+
+
+def measure(func, audio: bytes, repeat: int):
+    func(audio)  # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(audio)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(audio)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main():
+    print(f"{'size':<7} {'method':<22} {'median ms':>10} {'peak alloc':>11}")
+    for label, size in SIZES.items():
+        audio = os.urandom(size)
+        repeat = max(5, int(2e7 // size))
+        for name, func in METHODS.items():
+            if func is None:
+                continue
+            elapsed, peak = measure(func, audio, repeat)
+            print(f"{label:<7} {name:<22} {elapsed * 1000:>10.2f} {peak / size:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark: usage analytics on the row store vs the Parquet archive.
+
+Fills a throwaway SQLite database with usage rows over 30 days, archives
+them with ``archive_closed_days`` and times the same aggregations two ways:
+
+- sql: ``GROUP BY`` over ``usage_logs`` in the OLTP database
+- archive: ``query_archive`` (vectorized pyarrow over day partitions)
+
+Usage:
+    python benchmarks/bench_usage_analytics.py [rows]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select, func, case, cast, Integer
+
+from src.models import Base, User, Usage, UsageStatus, Plan
+from src.usage_archive import archive_closed_days, query_archive, TEXT_LENGTH_BUCKET
+
+START = datetime(2026, 9, 1)
+DAYS = 30
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = os.path.join(tempfile.mkdtemp(), "bench_analytics.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    statuses = [UsageStatus.SUCCESS] * 18 + [UsageStatus.ERROR, UsageStatus.RATE_LIMITED]
+    step = timedelta(days=DAYS) / rows
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"u{i}", "email": f"u{i}@bench.local", "api_key_hash": f"h{i}", "plan": Plan.PRO}
+            for i in range(100)
+        ])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "user_id": random.randint(1, 100), "voice_id": random.randint(1, 4),
+                "text_length": random.randint(10, 5000), "audio_seconds": random.random() * 60,
+                "status": random.choice(statuses), "model_used": random.choice(["speech-02-hd", "speech-02-turbo"]),
+                "timestamp": START + step * i,
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(Usage), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(Usage), batch)
+
+    archive_dir = tempfile.mkdtemp()
+    started = time.perf_counter()
+    archived = archive_closed_days(engine, START + timedelta(days=DAYS + 1), archive_dir)
+    size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(archive_dir) for f in files)
+    print(f"rows: {rows:,}  archived {len(archived['days'])} days in {time.perf_counter() - started:.1f} s, "
+          f"{size / 2**20:.1f} MiB parquet vs {os.path.getsize(path) / 2**20:.1f} MiB sqlite")
+
+    start_ts, end_ts = START, START + timedelta(days=DAYS)
+    in_range = (Usage.timestamp >= start_ts, Usage.timestamp < end_ts)
+    errors = func.avg(case((Usage.status != UsageStatus.SUCCESS, 1.0), else_=0.0))
+    hour = cast(func.strftime("%H", Usage.timestamp), Integer)
+    bucket = (Usage.text_length // TEXT_LENGTH_BUCKET) * TEXT_LENGTH_BUCKET
+
+    def sql(*keys):
+        def run():
+            with engine.connect() as conn:
+                return conn.execute(
+                    select(*keys, func.count(), func.sum(Usage.audio_seconds), func.sum(Usage.text_length), errors)
+                    .where(*in_range).group_by(*keys)
+                ).all()
+        return run
+
+    cases = [
+        ("seconds per voice per hour", sql(Usage.voice_id, hour), ["voice_id", "hour"]),
+        ("error rate by model, length", sql(Usage.model_used, bucket), ["model_used", "text_length_bucket"]),
+        ("per user", sql(Usage.user_id), ["user_id"]),
+    ]
+    print(f"{'query':<30} {'sql (ms)':>10} {'archive (ms)':>13}")
+    for label, run_sql, group_by in cases:
+        def run_archive():
+            return query_archive(start_ts.date(), end_ts.date(), group_by, archive_dir)
+
+        assert len(run_sql()) == len(run_archive()["rows"])
+        print(f"{label:<30} {timed(run_sql):>10.0f} {timed(run_archive):>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark: billing export of usage logs, ORM load vs streaming export.
+
+Fills a throwaway SQLite database with usage rows spread over one billing
+cycle and exports the cycle as CSV two ways, reporting time and peak Python
+memory (tracemalloc):
+
+- orm: ``db.query(Usage).all()`` then ``csv.writer`` (everything in memory)
+- stream: ``iter_usage_export``, one fetch batch encoded at a time
+
+Usage:
+    python benchmarks/bench_usage_export.py [rows ...]
+"""
+from __future__ import annotations
+import os
+import io
+import csv
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base, User, Usage, UsageStatus, Plan
+from src.usage_export import iter_usage_export, cycle_bounds, EXPORT_FIELDS
+
+CYCLE = "2026-10"
+
+
+def seed(rows: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench_export.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    start, end = cycle_bounds(CYCLE)
+    step = (end - start) / rows
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"u{i}", "email": f"u{i}@bench.local", "api_key_hash": f"h{i}", "plan": Plan.PRO}
+            for i in range(100)
+        ])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "user_id": random.randint(1, 100), "text_length": random.randint(10, 5000),
+                "audio_seconds": random.random() * 60, "status": UsageStatus.SUCCESS,
+                "model_used": "speech-02-hd", "timestamp": start + step * i,
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(Usage), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(Usage), batch)
+    return engine
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, size
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 200_000]
+    print(f"{'rows':>9} {'orm (s)':>8} {'orm MiB':>8} {'stream (s)':>11} {'stream MiB':>11}")
+    for rows in sizes:
+        engine = seed(rows)
+        start, end = cycle_bounds(CYCLE)
+
+        def orm_export():
+            db = sessionmaker(bind=engine)()
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_FIELDS)
+            logs = db.query(Usage).filter(Usage.timestamp >= start, Usage.timestamp < end).all()
+            for log in logs:
+                writer.writerow([getattr(log, field) for field in EXPORT_FIELDS])
+            db.close()
+            return len(buffer.getvalue())
+
+        def stream_export():
+            # Chunks are discarded as a network write would
+            return sum(len(chunk) for chunk in iter_usage_export(engine, start, end, "csv"))
+
+        orm_s, orm_mib, _ = measure(orm_export)
+        stream_s, stream_mib, _ = measure(stream_export)
+        print(f"{rows:>9,} {orm_s:>8.2f} {orm_mib:>8.1f} {stream_s:>11.2f} {stream_mib:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
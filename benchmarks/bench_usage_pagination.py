@@ -0,0 +1,104 @@
+"""Benchmark: OFFSET vs keyset pagination over per-user usage history.
+
+Fills a throwaway SQLite database with a million usage rows (default) for a
+handful of users, then times fetching page 1, 100 and 1000 of one user's
+history newest-first, once with ``OFFSET`` and once with the keyset cursor
+used by ``/v1/usage/logs``.
+
+Usage:
+    python benchmarks/bench_usage_pagination.py [rows] [users] [page_size]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.main import usage_log_page
+from src.migrations import run_migrations
+from src.models import User, Usage, Plan, UsageStatus
+from src.pagination import encode_cursor
+from src.schemas import UsageLogResponse
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    page_size = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_pagination.db")
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"u{i}", "email": f"u{i}@bench.local", "api_key_hash": f"h{i}", "plan": Plan.PRO,
+             "quota_seconds": 1e9, "used_seconds": 0.0, "is_active": True, "created_at": now, "updated_at": now}
+            for i in range(users)
+        ])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "user_id": random.randint(1, users), "voice_id": 0, "text_length": 100,
+                "audio_seconds": 5.0, "status": UsageStatus.SUCCESS, "model_used": "speech-02-turbo",
+                "timestamp": now - timedelta(seconds=rows - i),
+            })
+            if len(batch) == 20_000:
+                conn.execute(insert(Usage), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(Usage), batch)
+        conn.exec_driver_sql("ANALYZE")
+
+    db = Session()
+    user_id = 1
+    print(f"rows: {rows:,}  users: {users}  page size: {page_size}")
+    print(f"{'page':>6} {'offset (ms)':>12} {'keyset (ms)':>12}")
+    for page in (1, 100, 1000):
+        def offset_page():
+            rows = (
+                db.query(Usage).filter(Usage.user_id == user_id)
+                .order_by(Usage.timestamp.desc(), Usage.id.desc())
+                .offset((page - 1) * page_size).limit(page_size).all()
+            )
+            return [UsageLogResponse.model_validate(row) for row in rows]
+
+        # Walk to the cursor of the previous page once, outside the timing
+        cursor = None
+        if page > 1:
+            anchor = (
+                db.query(Usage).filter(Usage.user_id == user_id)
+                .order_by(Usage.timestamp.desc(), Usage.id.desc())
+                .offset((page - 1) * page_size - 1).limit(1).one()
+            )
+            cursor = encode_cursor(anchor.timestamp, anchor.id)
+
+        def keyset_page():
+            return usage_log_page(db, user_id, page_size, cursor)
+
+        assert [u.id for u in offset_page()] == [u.id for u in keyset_page().items]
+        print(f"{page:>6} {timed(offset_page):>12.2f} {timed(keyset_page):>12.2f}")
+        db.expunge_all()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
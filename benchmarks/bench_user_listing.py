@@ -0,0 +1,104 @@
+"""Benchmark: filtered admin user listing over a large user table.
+
+Fills a throwaway SQLite database with 100k users (default) and times one
+page of ``GET /admin/users`` filters two ways:
+
+- python: load users with ORM objects, filter on the Python properties
+  (what a client walking ``/admin/users/{id}`` effectively does)
+- sql: ``user_list_page``, where the quota expressions are filtered and
+  computed in the database
+
+Usage:
+    python benchmarks/bench_user_listing.py [users] [page_size]
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.main import user_list_page, QUOTA_BUCKETS
+from src.migrations import run_migrations
+from src.models import User, Plan
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_users.db")
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+
+    now = datetime.utcnow()
+    plans = list(Plan)
+    with engine.begin() as conn:
+        rows = []
+        for i in range(users):
+            quota = 600.0
+            rows.append({
+                "name": f"u{i}", "email": f"u{i}@bench.local", "api_key_hash": f"h{i}",
+                "plan": random.choice(plans), "quota_seconds": quota,
+                "used_seconds": quota * random.betavariate(2, 5) * 1.2,
+                "is_active": random.random() > 0.05, "created_at": now, "updated_at": now,
+            })
+            if len(rows) == 20_000:
+                conn.execute(insert(User), rows)
+                rows.clear()
+        if rows:
+            conn.execute(insert(User), rows)
+        conn.exec_driver_sql("ANALYZE")
+
+    db = Session()
+    print(f"users: {users:,}  page size: {page_size}")
+    print(f"{'filter':<28} {'python (ms)':>12} {'sql (ms)':>10}")
+    cases = [
+        ("plan=pro", {"plan": "pro"}),
+        ("quota_bucket=over_90", {"quota_bucket": "over_90"}),
+        ("plan=free,active,over_90", {"plan": "free", "is_active": True, "quota_bucket": "over_90"}),
+    ]
+    for label, filters in cases:
+        def python_filter():
+            low, high = QUOTA_BUCKETS.get(filters.get("quota_bucket"), (None, None))
+            matched = []
+            for user in db.query(User).order_by(User.id):
+                if "plan" in filters and user.plan.value != filters["plan"]:
+                    continue
+                if "is_active" in filters and user.is_active != filters["is_active"]:
+                    continue
+                pct = user.quota_percentage_used
+                if (low is not None and pct < low) or (high is not None and pct >= high):
+                    continue
+                matched.append(user.id)
+                if len(matched) == page_size:
+                    break
+            db.expunge_all()
+            return matched
+
+        def sql_filter():
+            return [item.id for item in user_list_page(db, page_size, None, **filters).items]
+
+        assert python_filter() == sql_filter()
+        print(f"{label:<28} {timed(python_filter):>12.2f} {timed(sql_filter):>10.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
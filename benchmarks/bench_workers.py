@@ -0,0 +1,93 @@
+"""Benchmark: request throughput at 1, 2 and 4 worker processes.
+
+Starts ``python -m src.server`` with ``WEB_CONCURRENCY`` set to each worker
+count against a throwaway SQLite database and the fake MiniMax upstream from
+``bench_cold_start``, then drives ``/v1/voices/list`` and ``/v1/tts`` from a
+pool of client threads and reports requests per second.
+
+Usage:
+    python benchmarks/bench_workers.py [requests_per_run] [client_threads]
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_cold_start import ROOT, FakeMinimax, free_port, wait_for  # noqa: E402
+
+
+class Upstream(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under concurrent load
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def hammer(url: str, total: int, threads: int, data: bytes = None) -> float:
+    def one(_):
+        request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def run(workers: int, env: dict, total: int, threads: int) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(env, WEB_CONCURRENCY=str(workers), PORT=str(port), HOST="127.0.0.1", LOG_LEVEL="warning")
+    env.pop("SHARED_STATE_URL", None)
+    server = subprocess.Popen([sys.executable, "-m", "src.server"], cwd=ROOT, env=env,
+                              stderr=subprocess.DEVNULL)
+    try:
+        wait_for(f"{base}/ready", time.perf_counter() + 60)
+        payload = json.dumps({"text": "Throughput benchmark sentence."}).encode()
+        hammer(f"{base}/v1/voices/list", threads * 4, threads)  # warm every worker
+        return {
+            "voices": hammer(f"{base}/v1/voices/list", total, threads),
+            "tts": hammer(f"{base}/v1/tts", total // 4, threads, data=payload),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    upstream = Upstream(("127.0.0.1", 0), FakeMinimax)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'workers.db')}",
+        "MINIMAX_BASE_URL": f"http://127.0.0.1:{upstream.server_address[1]}",
+        "MINIMAX_API_KEY": "bench-key",
+        "MINIMAX_GROUP_ID": "1",
+        "ENFORCE_AUTH": "false",
+        "FALLBACK_TO_SILENT_AUDIO": "false",
+    })
+    subprocess.run([sys.executable, "-m", "src.init_db"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    print(f"{'workers':>7} {'voices req/s':>13} {'tts req/s':>10}")
+    for workers in (1, 2, 4):
+        result = run(workers, env, total, threads)
+        print(f"{workers:>7} {result['voices']:>13.0f} {result['tts']:>10.0f}")
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
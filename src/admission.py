@@ -0,0 +1,197 @@
+"""Admission control for the audio held in memory by in-flight requests.
+
+Every ``/v1/tts`` request reserves its estimated peak audio memory before
+calling MiniMax, and gives it back once its response has been sent. The
+estimate comes from the text length, speed and the model's output bitrate
+(MiniMax speaks roughly ``AUDIO_CHARS_PER_SECOND`` characters a second),
+times how many copies of the clip the delivery mode holds at its peak.
+
+While reservations stay under ``AUDIO_SPILL_THRESHOLD_MB`` requests keep
+their clip in RAM. Past it, newly admitted requests spill: the clip is
+decoded into a temp file under ``AUDIO_SPILL_DIR`` and streamed back from
+there, reserving only ``AUDIO_SPILL_RESERVE_MB`` of RAM (out of
+``AUDIO_MEMORY_BUDGET_MB``) and the clip's size out of
+``AUDIO_SPILL_BUDGET_MB`` of disk. When neither fits, ``reserve`` returns
+None and the caller answers 503 with ``Retry-After``.
+
+The three budgets are for the whole host. Reservations are per process
+(each one lives and dies with the worker holding the audio), so every
+worker gets an even share of each budget: with ``WEB_CONCURRENCY=2`` and
+the defaults, 128 MB of RAM and 1 GB of spill space apiece.
+"""
+from __future__ import annotations
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+from .shared_state import per_worker
+
+MIB = 2 ** 20
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# This worker's share of each host-wide budget
+AUDIO_MEMORY_BUDGET_BYTES = per_worker(int(float(os.getenv("AUDIO_MEMORY_BUDGET_MB", "256")) * MIB))
+AUDIO_SPILL_THRESHOLD_BYTES = per_worker(int(float(os.getenv("AUDIO_SPILL_THRESHOLD_MB", "128")) * MIB))
+AUDIO_SPILL_BUDGET_BYTES = per_worker(int(float(os.getenv("AUDIO_SPILL_BUDGET_MB", "2048")) * MIB))
+AUDIO_SPILL_RESERVE_BYTES = int(float(os.getenv("AUDIO_SPILL_RESERVE_MB", "1")) * MIB)
+AUDIO_SPILL_DIR = os.getenv("AUDIO_SPILL_DIR") or None  # default: the system temp dir
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+AUDIO_CHARS_PER_SECOND = float(os.getenv("AUDIO_CHARS_PER_SECOND", "15"))
+
+# Output bitrate per model; MiniMax's default for every speech model is 128 kbps MP3
+DEFAULT_BITRATE = 128000
+MODEL_BITRATES: Dict[str, int] = {
+    "speech-01-hd": DEFAULT_BITRATE,
+    "speech-01-turbo": DEFAULT_BITRATE,
+    "speech-02-hd": DEFAULT_BITRATE,
+    "speech-02-turbo": DEFAULT_BITRATE,
+}
+
+# Peak copies of the clip per delivery mode: base64 JSON holds the clip while
+# b64encode peaks at twice the clip (benchmarks/bench_tts_serialization.py)
+PEAK_COPIES = {"inline": 3.0, "binary": 1.1, "url": 1.1}
+# Clips vary around the estimate (pauses, numbers read out)
+ESTIMATE_MARGIN = 1.25
+
+RESERVATION_STATE_KEY = "audio_reservation"
+
+
+def estimate_audio_bytes(text_length: int, model: str, speed: float = 1.0,
+                         bitrate: Optional[int] = None) -> int:
+    """Estimated size of the synthesized clip."""
+    bitrate = bitrate or MODEL_BITRATES.get(model, DEFAULT_BITRATE)
+    seconds = text_length / AUDIO_CHARS_PER_SECOND / speed
+    return int(seconds * bitrate / 8 * ESTIMATE_MARGIN)
+
+
+class Reservation:
+    """Admitted work; ``release`` (idempotent) returns its bytes and deletes spill files."""
+
+    def __init__(self, budget: "AudioBudget", memory_bytes: int, spill_bytes: int):
+        self.budget = budget
+        self.memory_bytes = memory_bytes
+        self.spill_bytes = spill_bytes
+        self.spill_paths: List[str] = []
+        self.released = False
+
+    @property
+    def spill(self) -> bool:
+        return self.spill_bytes > 0
+
+    def spill_file(self, suffix: str = ".mp3"):
+        """Open a temp file for the clip; it is deleted on release."""
+        fd, path = tempfile.mkstemp(prefix="tts-", suffix=suffix, dir=AUDIO_SPILL_DIR)
+        os.close(fd)
+        self.spill_paths.append(path)
+        return open(path, "w+b")  # .name is the path
+
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        for path in self.spill_paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self.budget._release(self)
+
+
+class AudioBudget:
+    """This worker's byte budgets for in-flight audio, in RAM and spilled to disk."""
+
+    def __init__(self, memory_budget: int = AUDIO_MEMORY_BUDGET_BYTES,
+                 spill_threshold: int = AUDIO_SPILL_THRESHOLD_BYTES,
+                 spill_budget: int = AUDIO_SPILL_BUDGET_BYTES,
+                 spill_reserve: int = AUDIO_SPILL_RESERVE_BYTES):
+        self.memory_budget = memory_budget
+        self.spill_threshold = spill_threshold
+        self.spill_budget = spill_budget
+        self.spill_reserve = spill_reserve
+        self.memory_in_use = 0
+        self.spill_in_use = 0
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"admitted": 0, "spilled": 0, "rejected": 0}
+
+    def reserve(self, estimate: int, copies: float = 1.0) -> Optional[Reservation]:
+        """
+        Admit a request whose clip is about ``estimate`` bytes, held
+        ``copies`` times at its peak. None means over budget.
+        """
+        if not ADMISSION_ENABLED:
+            return Reservation(self, 0, 0)
+        in_memory = int(estimate * copies)
+        # A clip bigger than the whole disk budget still runs, alone
+        spilled = max(1, min(estimate, self.spill_budget))
+        with self._lock:
+            if self.memory_in_use + in_memory <= self.spill_threshold:
+                reservation = Reservation(self, in_memory, 0)
+            elif (self.memory_in_use + self.spill_reserve <= self.memory_budget
+                  and self.spill_in_use + spilled <= self.spill_budget):
+                reservation = Reservation(self, self.spill_reserve, spilled)
+                self.counters["spilled"] += 1
+            else:
+                self.counters["rejected"] += 1
+                return None
+            self.memory_in_use += reservation.memory_bytes
+            self.spill_in_use += reservation.spill_bytes
+            self.counters["admitted"] += 1
+        return reservation
+
+    def _release(self, reservation: Reservation) -> None:
+        with self._lock:
+            self.memory_in_use -= reservation.memory_bytes
+            self.spill_in_use -= reservation.spill_bytes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_in_use": self.memory_in_use,
+            "memory_budget": self.memory_budget,
+            "spill_in_use": self.spill_in_use,
+            "spill_budget": self.spill_budget,
+            **self.counters,
+        }
+
+    def metrics(self) -> str:
+        """Stats in Prometheus text exposition format."""
+        s = self.stats()
+        return (
+            "# HELP audio_memory_reserved_bytes Estimated audio held in RAM by in-flight requests.\n"
+            "# TYPE audio_memory_reserved_bytes gauge\n"
+            f"audio_memory_reserved_bytes {s['memory_in_use']}\n"
+            "# HELP audio_spill_reserved_bytes Estimated audio spilled to disk by in-flight requests.\n"
+            "# TYPE audio_spill_reserved_bytes gauge\n"
+            f"audio_spill_reserved_bytes {s['spill_in_use']}\n"
+            "# HELP audio_admission_total TTS requests by admission outcome.\n"
+            "# TYPE audio_admission_total counter\n"
+            f'audio_admission_total{{outcome="admitted"}} {s["admitted"]}\n'
+            f'audio_admission_total{{outcome="spilled"}} {s["spilled"]}\n'
+            f'audio_admission_total{{outcome="rejected"}} {s["rejected"]}\n'
+        )
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware releasing the request's reservation (stored under
+    ``RESERVATION_STATE_KEY`` in ``request.state``) once the response has
+    been sent, or the request failed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = scope.setdefault("state", {})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reservation = state.get(RESERVATION_STATE_KEY)
+            if reservation is not None:
+                reservation.release()
+
+
+audio_budget = AudioBudget()
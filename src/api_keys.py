@@ -0,0 +1,226 @@
+"""Prefixed, salted API keys.
+
+Keys look like ``odk_<key_id>_<secret>``. The 12-hex-char ``key_id`` is public
+and stored in the indexed ``users.api_key_prefix`` column, so authentication
+fetches exactly one row and runs the expensive salted PBKDF2 verification
+once. The stored hash is ``pbkdf2_sha256$<iterations>$<salt>:<hash>``, so the
+iteration count (``API_KEY_PBKDF2_ITERATIONS``) can change without
+invalidating existing keys.
+
+Successful verifications are remembered for ``API_KEY_CACHE_TTL`` seconds in
+a per-process cache keyed by the SHA-256 of the presented key, so repeat
+requests skip PBKDF2 entirely. An entry also records the stored hash it was
+verified against and only counts while the user's row still has that hash,
+so a key rotated by any worker stops working on every worker at once.
+
+Legacy keys (no prefix, unsalted SHA-256 in ``api_key_hash``) keep working
+while ``ALLOW_LEGACY_API_KEYS`` is true. Rotate them with
+``POST /admin/users/{user_id}/api-key``, which issues a prefixed key.
+
+Before any of that, the key's token (key ID, or legacy SHA-256) is checked
+against the ``active_keys`` filter (see key_filter.py); keys of unknown or
+deactivated users are rejected without a database query. Code that creates,
+rotates or deactivates keys must keep the filter in step.
+"""
+from __future__ import annotations
+import os
+import time
+import secrets
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple
+
+from .auth import generate_api_key, hash_api_key
+from .auth_fixed import hash_api_key_with_salt, verify_api_key_with_salt, PBKDF2_ITERATIONS
+from .models import User
+from .key_filter import active_keys
+
+logger = logging.getLogger(__name__)
+
+API_KEY_TAG = "odk"
+KEY_ID_BYTES = 6  # 12 hex chars
+HASH_SCHEME = "pbkdf2_sha256"
+
+API_KEY_PBKDF2_ITERATIONS = int(os.getenv("API_KEY_PBKDF2_ITERATIONS", str(PBKDF2_ITERATIONS)))
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+ALLOW_LEGACY_API_KEYS = os.getenv("ALLOW_LEGACY_API_KEYS", "true").lower() == "true"
+
+
+def hash_key_secret(api_key: str, iterations: Optional[int] = None) -> str:
+    """Salted PBKDF2 hash of a full API key, in the stored format."""
+    iterations = iterations or API_KEY_PBKDF2_ITERATIONS
+    salted = hash_api_key_with_salt(api_key, secrets.token_hex(16), iterations)
+    return f"{HASH_SCHEME}${iterations}${salted}"
+
+
+def verify_key_secret(api_key: str, stored_hash: str) -> bool:
+    """Check ``api_key`` against a stored ``pbkdf2_sha256$...`` hash."""
+    try:
+        scheme, iterations, salted = stored_hash.split("$", 2)
+    except ValueError:
+        return False
+    if scheme != HASH_SCHEME:
+        return False
+    return verify_api_key_with_salt(api_key, salted, int(iterations))
+
+
+def issue_api_key() -> Tuple[str, str, str]:
+    """
+    Generate a new prefixed API key.
+
+    Returns:
+        tuple: ``(api_key, key_id, stored_hash)``; show ``api_key`` once and
+        persist the other two as ``api_key_prefix`` and ``api_key_hash``
+    """
+    key_id = secrets.token_hex(KEY_ID_BYTES)
+    api_key = f"{API_KEY_TAG}_{key_id}_{generate_api_key()}"
+    return api_key, key_id, hash_key_secret(api_key)
+
+
+def parse_key_id(api_key: str) -> Optional[str]:
+    """Return the public key ID of a prefixed key, or None for legacy keys."""
+    parts = api_key.split("_", 2)
+    if len(parts) != 3 or parts[0] != API_KEY_TAG or len(parts[1]) != KEY_ID_BYTES * 2:
+        return None
+    return parts[1]
+
+
+def key_filter_token(api_key: str) -> Optional[str]:
+    """Token ``active_keys`` holds for ``api_key``, or None if it can't be valid."""
+    key_id = parse_key_id(api_key)
+    if key_id is not None:
+        return f"id:{key_id}"
+    if ALLOW_LEGACY_API_KEYS:
+        return f"legacy:{hash_api_key(api_key)}"
+    return None
+
+
+def user_key_token(key_id: Optional[str], key_hash: str) -> str:
+    """Token ``active_keys`` holds for a user's stored key columns."""
+    return f"id:{key_id}" if key_id is not None else f"legacy:{key_hash}"
+
+
+def active_key_tokens(session_factory) -> Iterator[str]:
+    """Tokens of every active user's key, for ``active_keys.loader``."""
+    db = session_factory()
+    try:
+        rows = db.query(User.api_key_prefix, User.api_key_hash).filter(
+            User.is_active == True
+        ).yield_per(10_000)
+        for key_id, key_hash in rows:
+            yield user_key_token(key_id, key_hash)
+    finally:
+        db.close()
+
+
+class VerifiedKeyCache:
+    """Bounded TTL cache of ``sha256(api_key) -> (user_id, stored key hash)`` for verified keys."""
+
+    def __init__(self, ttl: float = API_KEY_CACHE_TTL, max_size: int = API_KEY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[int, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def get(self, api_key: str) -> Optional[Tuple[int, str]]:
+        digest = self._digest(api_key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            user_id, key_hash, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return user_id, key_hash
+
+    def put(self, api_key: str, user_id: int, key_hash: str) -> None:
+        if self.ttl <= 0:
+            return
+        digest = self._digest(api_key)
+        with self._lock:
+            self._entries[digest] = (user_id, key_hash, time.monotonic() + self.ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def forget_user(self, user_id: int) -> None:
+        """Drop every cached key for ``user_id`` (after rotation or deactivation)."""
+        with self._lock:
+            for digest in [d for d, (uid, _, _) in self._entries.items() if uid == user_id]:
+                del self._entries[digest]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+verified_keys = VerifiedKeyCache()
+
+
+def resolve_api_key_user(db, api_key: str) -> Optional[User]:
+    """
+    Return the user owning ``api_key``, or None if it doesn't match.
+
+    Inactive users are returned too (the caller decides how to reject them)
+    until the key filter is loaded; from then on their keys are filtered out.
+    """
+    token = key_filter_token(api_key)
+    if token is None or not active_keys.might_contain(token):
+        return None
+
+    cached = verified_keys.get(api_key)
+    if cached is not None:
+        user = db.get(User, cached[0])
+        if user is not None and user.api_key_hash == cached[1]:
+            return user
+
+    key_id = parse_key_id(api_key)
+    if key_id is not None:
+        user = db.query(User).filter(User.api_key_prefix == key_id).first()
+        if user is None or not verify_key_secret(api_key, user.api_key_hash):
+            return None
+    elif ALLOW_LEGACY_API_KEYS:
+        user = db.query(User).filter(
+            User.api_key_prefix.is_(None),
+            User.api_key_hash == hash_api_key(api_key),
+        ).first()
+        if user is None:
+            return None
+    else:
+        return None
+
+    verified_keys.put(api_key, user.id, user.api_key_hash)
+    return user
+
+
+def rotate_user_api_key(db, user: User) -> str:
+    """Replace ``user``'s key with a new prefixed one and return it (commits)."""
+    api_key, key_id, stored_hash = issue_api_key()
+    old_token = user_key_token(user.api_key_prefix, user.api_key_hash)
+    user.api_key_prefix = key_id
+    user.api_key_hash = stored_hash
+    db.commit()
+    verified_keys.forget_user(user.id)
+    if user.is_active:
+        active_keys.remove(old_token)
+        active_keys.add(user_key_token(key_id, stored_hash))
+    return api_key
+
+
+def deactivate_user(db, user: User) -> None:
+    """Disable ``user`` and stop accepting their key (commits)."""
+    if not user.is_active:
+        return
+    user.is_active = False
+    db.commit()
+    verified_keys.forget_user(user.id)
+    active_keys.remove(user_key_token(user.api_key_prefix, user.api_key_hash))
@@ -0,0 +1,155 @@
+"""Output formats for synthesized audio.
+
+Every MiniMax T2A call carries an ``audio_setting`` (container format,
+sample rate, MP3 bitrate, channels). ``TTSRequest.output_format`` picks one
+by profile name or spells it out; without it the user's plan default
+(``PLAN_CONFIGS[plan]["audio_profile"]``) applies.
+
+Profiles are sized for the channel that plays the clip:
+
+- ``studio``     44.1 kHz, 256 kbps MP3
+- ``default``    32 kHz, 128 kbps MP3 (what MiniMax returns unasked)
+- ``web``        24 kHz, 64 kbps MP3, plenty for a browser player
+- ``whatsapp``   16 kHz, 32 kbps mono MP3. MiniMax has no Opus/OGG output,
+  so this is the smallest format WhatsApp accepts as an audio message
+- ``telephony``  8 kHz 16-bit mono WAV, the narrowband telephone rate
+
+MiniMax reports the format it produced in the response's ``extra_info``
+(``audio_format``, ``audio_sample_rate``, ``bitrate``, ``audio_channel`` and
+``audio_length`` in ms); ``upstream_format`` and ``upstream_duration`` read
+it, so response metadata describes the actual clip.
+"""
+from __future__ import annotations
+from typing import Any, Dict, NamedTuple, Optional
+
+from .audio_store import MEDIA_TYPES
+
+# Values MiniMax accepts in audio_setting
+FORMATS = ("mp3", "wav", "flac", "pcm")
+SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100)
+BITRATES = (32000, 64000, 128000, 256000)
+CHANNELS = (1, 2)
+
+# pcm is raw 16-bit little-endian samples with no header: used internally
+# (telephony streaming), never stored or served as a file
+PCM_SAMPLE_WIDTH = 2
+# Lossless compression of speech is roughly 60% of PCM
+FLAC_RATIO = 0.6
+
+
+class AudioFormat(NamedTuple):
+    format: str = "mp3"
+    sample_rate: int = 32000
+    bitrate: Optional[int] = 128000  # MP3 only
+    channels: int = 1
+
+    @property
+    def ext(self) -> str:
+        return self.format
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES.get(self.format, "application/octet-stream")
+
+    @property
+    def byte_rate(self) -> float:
+        """Approximate bytes per second of audio."""
+        if self.format == "mp3":
+            return self.bitrate / 8
+        pcm = self.sample_rate * PCM_SAMPLE_WIDTH * self.channels
+        return pcm * FLAC_RATIO if self.format == "flac" else pcm
+
+    def audio_setting(self) -> Dict[str, Any]:
+        """The MiniMax ``audio_setting`` payload."""
+        setting = {"format": self.format, "sample_rate": self.sample_rate, "channel": self.channels}
+        if self.format == "mp3":
+            setting["bitrate"] = self.bitrate
+        return setting
+
+
+def audio_format(format: str = "mp3", sample_rate: int = 32000, bitrate: Optional[int] = None,
+                 channels: int = 1) -> AudioFormat:
+    """A validated ``AudioFormat``; ``bitrate`` defaults to 128 kbps for MP3 and is dropped otherwise."""
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported audio format: {format}")
+    if sample_rate not in SAMPLE_RATES:
+        raise ValueError(f"Unsupported sample rate: {sample_rate}")
+    if channels not in CHANNELS:
+        raise ValueError(f"Unsupported channel count: {channels}")
+    if format != "mp3":
+        bitrate = None
+    elif bitrate is None:
+        bitrate = 128000
+    elif bitrate not in BITRATES:
+        raise ValueError(f"Unsupported bitrate: {bitrate}")
+    return AudioFormat(format, sample_rate, bitrate, channels)
+
+
+AUDIO_PROFILES: Dict[str, AudioFormat] = {
+    "studio": audio_format("mp3", 44100, 256000),
+    "default": audio_format("mp3", 32000, 128000),
+    "web": audio_format("mp3", 24000, 64000),
+    "whatsapp": audio_format("mp3", 16000, 32000),
+    "telephony": audio_format("wav", 8000),
+}
+DEFAULT_PROFILE = "default"
+
+
+def resolve_output_format(output_format: Any, plan_profile: Optional[str] = None) -> AudioFormat:
+    """
+    The format for a request.
+
+    Args:
+        output_format: A profile name, a mapping (or model) with ``format``,
+            ``sample_rate``, ``bitrate`` and ``channels``, or None
+        plan_profile: Profile used when ``output_format`` is None
+
+    Raises:
+        ValueError: Unknown profile or unsupported setting
+    """
+    if output_format is None:
+        output_format = plan_profile or DEFAULT_PROFILE
+    if isinstance(output_format, str):
+        try:
+            return AUDIO_PROFILES[output_format]
+        except KeyError:
+            raise ValueError(
+                f"Unknown audio profile '{output_format}'. Valid options: {', '.join(AUDIO_PROFILES)}"
+            )
+    if not isinstance(output_format, dict):
+        output_format = output_format.model_dump()
+    return audio_format(**output_format)
+
+
+def upstream_format(extra_info: Optional[Dict[str, Any]], requested: AudioFormat) -> AudioFormat:
+    """The format MiniMax reports for the clip, falling back to what was requested."""
+    if not extra_info:
+        return requested
+    fmt = extra_info.get("audio_format")
+    if fmt not in FORMATS:
+        fmt = requested.format
+    bitrate = None
+    if fmt == "mp3":
+        bitrate = int(extra_info.get("bitrate") or requested.bitrate or 128000)
+    return AudioFormat(
+        fmt,
+        int(extra_info.get("audio_sample_rate") or requested.sample_rate),
+        bitrate,
+        int(extra_info.get("audio_channel") or requested.channels),
+    )
+
+
+def upstream_duration(extra_info: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Clip length in seconds from ``extra_info.audio_length`` (ms), if reported."""
+    length = (extra_info or {}).get("audio_length")
+    return length / 1000 if length else None
+
+
+__all__ = [
+    "AudioFormat",
+    "AUDIO_PROFILES",
+    "audio_format",
+    "resolve_output_format",
+    "upstream_format",
+    "upstream_duration",
+]
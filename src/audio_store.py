@@ -0,0 +1,256 @@
+"""Content-addressed store for generated audio.
+
+A clip's ID is the SHA-256 of its bytes plus its format extension
+(``<sha256>.mp3``), so storing the same audio twice is a no-op, the ID is
+a strong ETag and a stored object never changes (responses are cacheable
+forever). IDs are unguessable, so ``GET /v1/audio/{id}`` needs no API key:
+the URL itself is the capability, as with presigned links.
+
+The backend comes from ``AUDIO_STORE_URL``:
+
+- ``file://./audio_store``               local directory (default)
+- ``s3://bucket/prefix``                 S3 or any S3-compatible service
+  (``AUDIO_STORE_S3_ENDPOINT`` points it at MinIO or a local stub; needs
+  boto3)
+
+Whole local files are served with ``FileResponse``; ``Range`` requests,
+for either backend, are answered with the requested bytes read through
+``AudioStore.read``. Neither path is zero-copy in the app. Behind nginx,
+set ``AUDIO_STORE_ACCEL_PREFIX`` to an internal location aliased to the
+store directory and nginx serves the file itself (sendfile, ``Range``).
+"""
+from __future__ import annotations
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterator, NamedTuple, Optional
+
+try:
+    import boto3
+except Exception:
+    boto3 = None
+
+AUDIO_STORE_URL = os.getenv("AUDIO_STORE_URL", "file://./audio_store")
+AUDIO_STORE_S3_ENDPOINT = os.getenv("AUDIO_STORE_S3_ENDPOINT") or None
+AUDIO_STORE_ACCEL_PREFIX = os.getenv("AUDIO_STORE_ACCEL_PREFIX") or None
+# Public base for audio_url (e.g. a CDN); defaults to the request's own host
+AUDIO_PUBLIC_BASE_URL = os.getenv("AUDIO_PUBLIC_BASE_URL", "").rstrip("/")
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+AUDIO_READ_CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav", "flac": "audio/flac"}
+_AUDIO_ID = re.compile(r"^([0-9a-f]{64})\.(mp3|wav|flac)$")
+
+
+class AudioObject(NamedTuple):
+    id: str
+    size: int
+    media_type: str
+    path: Optional[str] = None  # local file, if the backend has one
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.id.split(".")[0]}"'
+
+
+def audio_id_for(data: bytes, ext: str = "mp3") -> str:
+    if ext not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported audio format: {ext}")
+    return f"{hashlib.sha256(data).hexdigest()}.{ext}"
+
+
+def audio_id_for_file(path: str, ext: str = "mp3") -> str:
+    if ext not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported audio format: {ext}")
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(AUDIO_READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return f"{digest.hexdigest()}.{ext}"
+
+
+def parse_audio_id(audio_id: str) -> Optional[str]:
+    """Extension of a well-formed ID, else None (never a path to open)."""
+    match = _AUDIO_ID.match(audio_id)
+    return match.group(2) if match else None
+
+
+class AudioStore(ABC):
+    """Interface implemented by every backend."""
+
+    @abstractmethod
+    def put(self, data: bytes, ext: str = "mp3") -> str:
+        """Store ``data`` (if not already stored) and return its ID."""
+
+    @abstractmethod
+    def put_file(self, path: str, ext: str = "mp3") -> str:
+        """Like ``put``, for audio in a file (which is left in place)."""
+
+    @abstractmethod
+    def stat(self, audio_id: str) -> Optional[AudioObject]:
+        """The stored object, or None if ``audio_id`` is unknown or malformed."""
+
+    @abstractmethod
+    def read(self, audio_id: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes ``start <= i < end`` of a stored object, in chunks."""
+
+
+class LocalAudioStore(AudioStore):
+    """Files under ``root/<first two hex digits>/<id>``."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def relative_path(self, audio_id: str) -> str:
+        return f"{audio_id[:2]}/{audio_id}"
+
+    def path(self, audio_id: str) -> str:
+        return os.path.join(self.root, audio_id[:2], audio_id)
+
+    def _write(self, audio_id: str, write) -> str:
+        path = self.path(audio_id)
+        if os.path.exists(path):
+            return audio_id
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return audio_id
+
+    def put(self, data, ext="mp3"):
+        return self._write(audio_id_for(data, ext), lambda f: f.write(data))
+
+    def put_file(self, path, ext="mp3"):
+        def copy(f):
+            with open(path, "rb") as source:
+                shutil.copyfileobj(source, f, AUDIO_READ_CHUNK_SIZE)
+
+        return self._write(audio_id_for_file(path, ext), copy)
+
+    def stat(self, audio_id):
+        ext = parse_audio_id(audio_id)
+        if ext is None:
+            return None
+        path = self.path(audio_id)
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            return None
+        return AudioObject(audio_id, size, MEDIA_TYPES[ext], path)
+
+    def read(self, audio_id, start=0, end=None):
+        with open(self.path(audio_id), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                chunk = f.read(AUDIO_READ_CHUNK_SIZE if remaining is None
+                               else min(AUDIO_READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+
+class S3AudioStore(AudioStore):
+    """Objects under ``s3://bucket/prefix``; ``client`` is a boto3 S3 client or a stub."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("boto3 package not installed; pip install boto3")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def key(self, audio_id: str) -> str:
+        return f"{self.prefix}/{audio_id}" if self.prefix else audio_id
+
+    def _head(self, audio_id: str) -> Optional[dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(audio_id))
+        except Exception as e:
+            status = (getattr(e, "response", None) or {}).get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if status == 404:
+                return None
+            raise
+
+    def _put_object(self, audio_id: str, ext: str, body) -> None:
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.key(audio_id), Body=body,
+            ContentType=MEDIA_TYPES[ext], CacheControl=AUDIO_CACHE_CONTROL,
+        )
+
+    def put(self, data, ext="mp3"):
+        audio_id = audio_id_for(data, ext)
+        if self._head(audio_id) is None:
+            self._put_object(audio_id, ext, data)
+        return audio_id
+
+    def put_file(self, path, ext="mp3"):
+        audio_id = audio_id_for_file(path, ext)
+        if self._head(audio_id) is None:
+            with open(path, "rb") as f:
+                self._put_object(audio_id, ext, f)
+        return audio_id
+
+    def stat(self, audio_id):
+        ext = parse_audio_id(audio_id)
+        if ext is None:
+            return None
+        head = self._head(audio_id)
+        if head is None:
+            return None
+        return AudioObject(audio_id, int(head["ContentLength"]), MEDIA_TYPES[ext])
+
+    def read(self, audio_id, start=0, end=None):
+        byte_range = f"bytes={start}-{'' if end is None else end - 1}"
+        body = self.client.get_object(Bucket=self.bucket, Key=self.key(audio_id), Range=byte_range)["Body"]
+        try:
+            yield from body.iter_chunks(AUDIO_READ_CHUNK_SIZE)
+        finally:
+            body.close()
+
+
+def create_audio_store(url: str) -> AudioStore:
+    """Build a store from an ``AUDIO_STORE_URL``-style URL."""
+    if url.startswith("file://"):
+        return LocalAudioStore(url[len("file://"):])
+    if url.startswith("s3://"):
+        bucket, _, prefix = url[len("s3://"):].partition("/")
+        return S3AudioStore(bucket, prefix, endpoint_url=AUDIO_STORE_S3_ENDPOINT)
+    raise ValueError(f"Unsupported AUDIO_STORE_URL: {url}")
+
+
+_store: Optional[AudioStore] = None
+_store_lock = threading.Lock()
+
+
+def get_audio_store() -> AudioStore:
+    """Process-wide store built from ``AUDIO_STORE_URL`` on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_audio_store(AUDIO_STORE_URL)
+    return _store
+
+
+__all__ = [
+    "AudioObject",
+    "AudioStore",
+    "LocalAudioStore",
+    "S3AudioStore",
+    "create_audio_store",
+    "get_audio_store",
+]
@@ -9,6 +9,7 @@ from typing import Tuple
 # Use 512-bit keys for quantum resistance
 API_KEY_BYTES = 64
 API_KEY_VERSION = "v1"
+PBKDF2_ITERATIONS = 100_000
 
 
 def generate_api_key() -> str:
@@ -120,13 +121,14 @@ def generate_api_key_with_salt() -> Tuple[str, str]:
     return api_key, salt
 
 
-def hash_api_key_with_salt(key: str, salt: str) -> str:
+def hash_api_key_with_salt(key: str, salt: str, iterations: int = PBKDF2_ITERATIONS) -> str:
     """
     Hash API key with salt using PBKDF2.
     
     Args:
         key: Plain API key
         salt: Salt (hex string)
+        iterations: PBKDF2 iteration count
         
     Returns:
         str: Hashed key with salt prepended
@@ -134,12 +136,12 @@ def hash_api_key_with_salt(key: str, salt: str) -> str:
     salt_bytes = bytes.fromhex(salt)
     key_bytes = key.encode("utf-8")
     
-    # Use PBKDF2 with 100,000 iterations (OWASP recommendation)
+    # Default of 100,000 iterations follows the OWASP recommendation
     hashed = hashlib.pbkdf2_hmac(
         'sha256',
         key_bytes,
         salt_bytes,
-        iterations=100_000,
+        iterations=iterations,
         dklen=32
     )
     
@@ -147,13 +149,14 @@ def hash_api_key_with_salt(key: str, salt: str) -> str:
     return f"{salt}:{hashed.hex()}"
 
 
-def verify_api_key_with_salt(key: str, stored_hash: str) -> bool:
+def verify_api_key_with_salt(key: str, stored_hash: str, iterations: int = PBKDF2_ITERATIONS) -> bool:
     """
     Verify API key hashed with salt.
     
     Args:
         key: Plain API key
         stored_hash: Stored hash in format "salt:hash"
+        iterations: PBKDF2 iteration count used when hashing
         
     Returns:
         bool: True if key matches
@@ -165,7 +168,7 @@ def verify_api_key_with_salt(key: str, stored_hash: str) -> bool:
     except ValueError:
         return False
     
-    computed_hash = hash_api_key_with_salt(key, salt)
+    computed_hash = hash_api_key_with_salt(key, salt, iterations)
     _, computed_hash_only = computed_hash.split(":", 1)
     
     return hmac.compare_digest(computed_hash_only, expected_hash)
@@ -216,6 +219,7 @@ def is_api_key_expired(key: str, max_age_days: int = 365) -> bool:
 
 
 __all__ = [
+    "PBKDF2_ITERATIONS",
     "generate_api_key",
     "hash_api_key",
     "verify_api_key",
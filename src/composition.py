@@ -0,0 +1,284 @@
+"""Stitch synthesized clips and silences into one clip without re-encoding.
+
+MP3 clips are spliced at frame boundaries: each clip's ID3 tag, its
+Xing/Info (or VBRI) header frame, which would give players the length of
+that clip alone, and anything after its last whole frame are dropped, and
+the frames themselves are copied as they are. Silences are runs of
+precomputed silent frames (``silence.py``) cloned from the first clip's
+frame header. All clips must share the sample rate and channel mode, as
+one request's clips do.
+
+WAV clips are spliced at the sample level under a single new header.
+
+``silent_clip`` is a whole clip of silence, cached per format and length,
+for responses that have no speech at all.
+
+``synthesize_concurrently`` runs the upstream calls for the clips on a
+bounded number of threads, so a composition takes about as long as its
+slowest clip instead of the sum of all of them.
+"""
+from __future__ import annotations
+import os
+import struct
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple, TypeVar, Union
+
+from .audio_profiles import AudioFormat, PCM_SAMPLE_WIDTH
+from .silence import mp3_silence, mp3_frames_for, pcm_silence, SILENCE_CACHE_SIZE
+
+SYNTHESIS_CONCURRENCY = int(os.getenv("SYNTHESIS_CONCURRENCY", "4"))
+
+# Layer III frame header fields, by the header's 2-bit version ID
+_MPEG1, _MPEG2, _MPEG25 = 3, 2, 0
+_BITRATES_KBPS = {
+    _MPEG1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    _MPEG2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    _MPEG1: (44100, 48000, 32000),
+    _MPEG2: (22050, 24000, 16000),
+    _MPEG25: (11025, 12000, 8000),
+}
+_MONO = 3
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MP3Header(NamedTuple):
+    raw: bytes  # the 4 header bytes
+    version: int
+    bitrate: int
+    sample_rate: int
+    padding: int
+    channels: int
+
+    @property
+    def samples(self) -> int:
+        """Samples per channel in one frame."""
+        return 1152 if self.version == _MPEG1 else 576
+
+    @property
+    def frame_length(self) -> int:
+        return self.samples // 8 * self.bitrate // self.sample_rate + self.padding
+
+    @property
+    def side_info_length(self) -> int:
+        if self.version == _MPEG1:
+            return 17 if self.channels == 1 else 32
+        return 9 if self.channels == 1 else 17
+
+    def unpadded(self) -> "MP3Header":
+        if not self.padding:
+            return self
+        raw = bytes((self.raw[0], self.raw[1], self.raw[2] & ~0x02, self.raw[3]))
+        return self._replace(raw=raw, padding=0)
+
+
+def parse_mp3_header(data, offset: int = 0) -> Optional[MP3Header]:
+    """The Layer III frame header at ``offset``, or None if there isn't one."""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset:offset + 4]
+    if b0 != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrates = _BITRATES_KBPS[_MPEG1 if version == _MPEG1 else _MPEG2]
+    return MP3Header(
+        raw=bytes((b0, b1, b2, b3)),
+        version=version,
+        bitrate=bitrates[bitrate_index] * 1000,
+        sample_rate=_SAMPLE_RATES[version][rate_index],
+        padding=(b2 >> 1) & 1,
+        channels=1 if b3 >> 6 == _MONO else 2,
+    )
+
+
+@lru_cache(maxsize=32)
+def mp3_header_for(fmt: AudioFormat) -> MP3Header:
+    """A frame header for ``fmt`` (the nearest valid bitrate at or below it)."""
+    version = next(v for v, rates in _SAMPLE_RATES.items() if fmt.sample_rate in rates)
+    bitrates = _BITRATES_KBPS[_MPEG1 if version == _MPEG1 else _MPEG2]
+    kbps = (fmt.bitrate or 128000) // 1000
+    bitrate_index = max(i for i, rate in enumerate(bitrates) if 0 < rate <= kbps) if kbps >= bitrates[1] else 1
+    raw = bytes((
+        0xFF,
+        0xE0 | version << 3 | 1 << 1 | 1,  # Layer III, no CRC
+        bitrate_index << 4 | _SAMPLE_RATES[version].index(fmt.sample_rate) << 2,
+        (_MONO if fmt.channels == 1 else 0) << 6,
+    ))
+    return parse_mp3_header(raw)
+
+
+def _is_info_frame(data, offset: int, header: MP3Header) -> bool:
+    tag = offset + 4 + header.side_info_length
+    return bytes(data[tag:tag + 4]) in (b"Xing", b"Info") or bytes(data[offset + 36:offset + 40]) == b"VBRI"
+
+
+def mp3_audio(data) -> Tuple[memoryview, MP3Header, int]:
+    """
+    The audio frames of an MP3 clip, without tags or the Xing/Info frame.
+
+    Returns:
+        tuple: A view of the frames, the first frame's header and the
+        clip's length in samples
+
+    Raises:
+        ValueError: No MP3 frames found
+    """
+    view = memoryview(data)
+    pos = 0
+    if bytes(view[:3]) == b"ID3" and len(view) >= 10:
+        size = 0
+        for byte in view[6:10]:
+            size = size << 7 | (byte & 0x7F)
+        pos = 10 + size + (10 if view[5] & 0x10 else 0)
+    header = parse_mp3_header(view, pos)
+    if header is not None and _is_info_frame(view, pos, header):
+        pos += header.frame_length
+        header = parse_mp3_header(view, pos)
+    if header is None:
+        raise ValueError("No MP3 frames in clip")
+    first, start, samples = header, pos, 0
+    while header is not None and pos + header.frame_length <= len(view):
+        pos += header.frame_length
+        samples += header.samples
+        header = parse_mp3_header(view, pos)
+    return view[start:pos], first, samples
+
+
+class WavInfo(NamedTuple):
+    sample_rate: int
+    channels: int
+    sample_width: int
+
+
+def wav_audio(data) -> Tuple[memoryview, WavInfo]:
+    """The sample data of a WAV clip and its format."""
+    view = memoryview(data)
+    if bytes(view[:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        raise ValueError("Not a WAV clip")
+    pos, info = 12, None
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        size = int.from_bytes(view[pos + 4:pos + 8], "little")
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            channels, sample_rate = struct.unpack_from("<HI", view, body + 2)
+            bits = struct.unpack_from("<H", view, body + 14)[0]
+            info = WavInfo(sample_rate, channels, bits // 8)
+        elif chunk_id == b"data":
+            if info is None:
+                break
+            # Streamed WAVs may leave the size unset (0 or 0xFFFFFFFF)
+            end = len(view) if size in (0, 0xFFFFFFFF) else min(body + size, len(view))
+            return view[body:end], info
+        pos = body + size + (size & 1)
+    raise ValueError("WAV clip has no fmt or data chunk")
+
+
+def wav_header(data_length: int, info: WavInfo) -> bytes:
+    block_align = info.channels * info.sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_length, b"WAVE",
+        b"fmt ", 16, 1, info.channels, info.sample_rate, info.sample_rate * block_align,
+        block_align, info.sample_width * 8,
+        b"data", data_length,
+    )
+
+
+class Stitched(NamedTuple):
+    audio: bytes
+    duration_seconds: float
+
+
+def stitch(parts: Sequence[Union[bytes, bytearray, float]], fmt: AudioFormat) -> Stitched:
+    """
+    Join clips (bytes) and silences (seconds, as floats), in order, into one clip.
+
+    Raises:
+        ValueError: Clips in a format that can't be stitched, or clips
+            that don't share a sample rate and channel count
+    """
+    if fmt.format == "mp3":
+        return _stitch_mp3(parts, fmt)
+    if fmt.format == "wav":
+        return _stitch_wav(parts, fmt)
+    raise ValueError(f"Cannot stitch {fmt.format} clips; use mp3 or wav")
+
+
+def _stitch_mp3(parts, fmt: AudioFormat) -> Stitched:
+    clips = {i: mp3_audio(part) for i, part in enumerate(parts) if not isinstance(part, (int, float))}
+    reference = next(iter(clips.values()))[1] if clips else mp3_header_for(fmt)
+    pieces, samples = [], 0
+    for i, part in enumerate(parts):
+        if i in clips:
+            frames, header, clip_samples = clips[i]
+            if (header.sample_rate, header.channels) != (reference.sample_rate, reference.channels):
+                raise ValueError("Clips differ in sample rate or channels")
+            pieces.append(frames)
+            samples += clip_samples
+        else:
+            pieces.append(mp3_silence(reference, part))
+            samples += mp3_frames_for(reference, part) * reference.samples
+    return Stitched(b"".join(pieces), samples / reference.sample_rate)
+
+
+def _stitch_wav(parts, fmt: AudioFormat) -> Stitched:
+    clips = {i: wav_audio(part) for i, part in enumerate(parts) if not isinstance(part, (int, float))}
+    info = next(iter(clips.values()))[1] if clips else WavInfo(fmt.sample_rate, fmt.channels, PCM_SAMPLE_WIDTH)
+    pieces = []
+    for i, part in enumerate(parts):
+        if i in clips:
+            samples, clip_info = clips[i]
+            if clip_info != info:
+                raise ValueError("Clips differ in sample rate, channels or sample width")
+            pieces.append(samples)
+        else:
+            pieces.append(pcm_silence(part, info.sample_rate, info.channels, info.sample_width))
+    length = sum(len(piece) for piece in pieces)
+    audio = b"".join([wav_header(length, info), *pieces])
+    return Stitched(audio, length / (info.sample_rate * info.channels * info.sample_width))
+
+
+@lru_cache(maxsize=SILENCE_CACHE_SIZE)
+def silent_clip(fmt: AudioFormat, seconds: float) -> Stitched:
+    """A whole clip of ``seconds`` of silence in ``fmt`` (mp3 or wav), built once."""
+    return stitch([seconds], fmt)
+
+
+def synthesize_concurrently(fn: Callable[[T], R], jobs: Sequence[T],
+                            limit: int = SYNTHESIS_CONCURRENCY) -> List[R]:
+    """
+    ``fn(job)`` for every job on at most ``limit`` threads; results in job
+    order. The first failure (in job order) cancels the jobs not yet
+    started and is raised.
+    """
+    if len(jobs) <= 1:
+        return [fn(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=min(limit, len(jobs)), thread_name_prefix="synth") as pool:
+        futures = [pool.submit(fn, job) for job in jobs]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+__all__ = [
+    "MP3Header",
+    "Stitched",
+    "mp3_audio",
+    "mp3_header_for",
+    "parse_mp3_header",
+    "silent_clip",
+    "stitch",
+    "synthesize_concurrently",
+    "wav_audio",
+]
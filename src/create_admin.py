@@ -2,7 +2,8 @@
 import sys
 from .database import SessionLocal
 from .models import User, Plan, PLAN_CONFIGS
-from .auth import generate_api_key, hash_api_key
+from .api_keys import issue_api_key
+from .key_filter import active_keys
 
 
 def create_admin_user(name: str, email: str):
@@ -23,14 +24,14 @@ def create_admin_user(name: str, email: str):
             return
         
         # Generate API key
-        api_key = generate_api_key()
-        api_key_hash = hash_api_key(api_key)
+        api_key, key_id, api_key_hash = issue_api_key()
         
         # Create enterprise user (acts as admin)
         plan_config = PLAN_CONFIGS[Plan.ENTERPRISE]
         user = User(
             name=name,
             email=email,
+            api_key_prefix=key_id,
             api_key_hash=api_key_hash,
             plan=Plan.ENTERPRISE,
             quota_seconds=plan_config["quota_seconds"],
@@ -41,6 +42,8 @@ def create_admin_user(name: str, email: str):
         db.add(user)
         db.commit()
         db.refresh(user)
+        # Running servers sharing SHARED_STATE_URL rebuild their key filters
+        active_keys.invalidate()
         
         print("\n✅ Admin user created successfully!")
         print(f"\n{'='*70}")
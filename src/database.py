@@ -6,6 +6,7 @@ from contextlib import contextmanager
 try:
     from sqlalchemy import create_engine
     from sqlalchemy.orm import sessionmaker
+    from .replicas import RoutingSession, create_replica_router
 except Exception:
     create_engine = None  # type: ignore
     sessionmaker = None   # type: ignore
@@ -18,9 +19,15 @@ if create_engine:
         connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
     )
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # Read-only endpoints read from DATABASE_REPLICA_URLS when set (see replicas.py)
+    replica_router = None if DATABASE_URL.startswith("sqlite") else create_replica_router()
+    ReadSessionLocal = sessionmaker(
+        class_=RoutingSession, router=replica_router, autocommit=False, autoflush=False, bind=engine,
+    ) if replica_router else SessionLocal
 else:
     engine = None
-    SessionLocal = None
+    SessionLocal = ReadSessionLocal = None
+    replica_router = None
 
 @contextmanager
 def get_session():
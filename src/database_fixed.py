@@ -1,45 +1,84 @@
 """Production-ready database setup with connection pooling and health checks."""
 from __future__ import annotations
 import os
+import logging
 from contextlib import contextmanager
 from typing import Generator
 
 try:
     from sqlalchemy import create_engine, event, select
     from sqlalchemy.orm import sessionmaker, Session
-    from sqlalchemy.pool import QueuePool, NullPool
+    from sqlalchemy.pool import QueuePool, NullPool, SingletonThreadPool
     from sqlalchemy.exc import SQLAlchemyError
+    from .replicas import DATABASE_REPLICA_URLS, Replica, ReplicaRouter, RoutingSession, create_replica_router
 except Exception:
     create_engine = None
     sessionmaker = None
     Session = None
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./odeadev_tts.db")
 IS_SQLITE = DATABASE_URL.startswith("sqlite")
+SQL_DEBUG = os.getenv("SQL_DEBUG", "false").lower() == "true"
+
+# SQLite pooling: "queue" (bounded pool of long-lived connections),
+# "thread" (one connection per thread) or "null" (new connection per checkout)
+SQLITE_POOL_MODE = os.getenv("SQLITE_POOL_MODE", "queue").lower()
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "8"))
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-64000",  # 64MB cache, kept for the connection's lifetime
+    "PRAGMA busy_timeout=30000",  # 30 second timeout
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def _apply_sqlite_pragmas(dbapi_conn, connection_record) -> None:
+    """Runs once per new DBAPI connection, not per checkout."""
+    cursor = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def create_sqlite_engine(url: str, mode: str = SQLITE_POOL_MODE, pool_size: int = SQLITE_POOL_SIZE):
+    """
+    Engine with pooled connections, PRAGMAs applied once per connection.
+
+    Args:
+        url: SQLite database URL
+        mode: "queue", "thread" or "null" (see ``SQLITE_POOL_MODE``)
+        pool_size: Long-lived connections kept open
+    """
+    pool_args = {
+        "queue": {"poolclass": QueuePool, "pool_size": pool_size,
+                  "max_overflow": SQLITE_MAX_OVERFLOW, "pool_timeout": 30},
+        "thread": {"poolclass": SingletonThreadPool, "pool_size": pool_size},
+        "null": {"poolclass": NullPool},
+    }
+    if mode not in pool_args:
+        raise ValueError(f"Unsupported SQLITE_POOL_MODE: {mode}")
+    sqlite_engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": 30.0,  # 30 second timeout for lock wait
+        },
+        echo=SQL_DEBUG,
+        **pool_args[mode],
+    )
+    event.listen(sqlite_engine, "connect", _apply_sqlite_pragmas)
+    return sqlite_engine
+
 
 # Production-grade connection pooling
 if create_engine:
     if IS_SQLITE:
-        # SQLite: Use NullPool (no connection pooling) to avoid locking issues
-        engine = create_engine(
-            DATABASE_URL,
-            connect_args={
-                "check_same_thread": False,
-                "timeout": 30.0,  # 30 second timeout for lock wait
-            },
-            poolclass=NullPool,
-            echo=os.getenv("SQL_DEBUG", "false").lower() == "true",
-        )
-        
-        # Enable WAL mode for better concurrency
-        @event.listens_for(engine, "connect")
-        def set_sqlite_pragma(dbapi_conn, connection_record):
-            cursor = dbapi_conn.cursor()
-            cursor.execute("PRAGMA journal_mode=WAL")
-            cursor.execute("PRAGMA synchronous=NORMAL")
-            cursor.execute("PRAGMA cache_size=-64000")  # 64MB cache
-            cursor.execute("PRAGMA busy_timeout=30000")  # 30 second timeout
-            cursor.close()
+        engine = create_sqlite_engine(DATABASE_URL)
     else:
         # PostgreSQL: Use connection pooling
         engine = create_engine(
@@ -50,7 +89,7 @@ if create_engine:
             pool_timeout=30,
             pool_recycle=3600,  # Recycle connections after 1 hour
             pool_pre_ping=True,  # Test connections before use
-            echo=os.getenv("SQL_DEBUG", "false").lower() == "true",
+            echo=SQL_DEBUG,
         )
     
     SessionLocal = sessionmaker(
@@ -59,9 +98,21 @@ if create_engine:
         bind=engine,
         expire_on_commit=False  # Don't expire objects after commit
     )
+
+    replica_router = create_replica_router(DATABASE_REPLICA_URLS, echo=SQL_DEBUG) if not IS_SQLITE else None
+    
+    ReadSessionLocal = sessionmaker(
+        class_=RoutingSession,
+        router=replica_router,
+        autocommit=False,
+        autoflush=False,
+        bind=engine,
+        expire_on_commit=False
+    ) if replica_router else SessionLocal
 else:
     engine = None
-    SessionLocal = None
+    SessionLocal = ReadSessionLocal = None
+    replica_router = None
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -94,6 +145,34 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    FastAPI dependency for read-only endpoints, routed to a read replica.
+    
+    Reads may be up to ``REPLICA_MAX_LAG_SECONDS`` stale. Anything that must
+    see the caller's earlier writes, or reads before writing, should use
+    ``get_db`` instead. Without ``DATABASE_REPLICA_URLS`` this is ``get_db``.
+    
+    Yields:
+        Session: ``RoutingSession`` (or a primary session without replicas)
+    """
+    if ReadSessionLocal is None:
+        raise RuntimeError("SQLAlchemy not available in this environment")
+    
+    db = ReadSessionLocal()
+    try:
+        yield db
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise RuntimeError(f"Database error: {type(e).__name__}") from e
+    except Exception as e:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 @contextmanager
 def get_session() -> Generator[Session, None, None]:
     """
@@ -132,7 +211,10 @@ def health_check() -> dict:
         # Simple query to test connection
         db.execute(select(1))
         db.close()
-        return {"status": "healthy", "database": "connected"}
+        result = {"status": "healthy", "database": "connected"}
+        if replica_router is not None:
+            result["replicas"] = replica_router.status()
+        return result
     except Exception as e:
         return {"status": "unhealthy", "error": type(e).__name__}
 
@@ -176,7 +258,13 @@ def update_user_quota_atomic(db: Session, user_id: int, seconds_to_add: float) -
 __all__ = [
     "engine",
     "SessionLocal",
+    "ReadSessionLocal",
+    "ReplicaRouter",
+    "RoutingSession",
+    "replica_router",
+    "create_sqlite_engine",
     "get_db",
+    "get_read_db",
     "get_session",
     "health_check",
     "update_user_quota_atomic",
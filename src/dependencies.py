@@ -9,9 +9,9 @@ try:
 except Exception:
     Header = HTTPException = Depends = Session = None
 
-from .database import SessionLocal
+from .database import SessionLocal, ReadSessionLocal
 from .models import User
-from .auth import hash_api_key
+from .api_keys import resolve_api_key_user
 
 # Optional auth bypass for testing (set ENFORCE_AUTH=false)
 ENFORCE_AUTH = os.getenv("ENFORCE_AUTH", "true").lower() == "true"
@@ -26,7 +26,22 @@ def get_db():
         db.close()
 
 
-async def get_current_user(
+def get_read_db():
+    """
+    Dependency to get a session for read-only endpoints.
+    
+    Reads go to a read replica when ``DATABASE_REPLICA_URLS`` is set and may
+    be up to ``REPLICA_MAX_LAG_SECONDS`` stale; writes still go to the
+    primary. Without replicas this is ``get_db``.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_current_user(
     authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ) -> User:
@@ -35,6 +50,10 @@ async def get_current_user(
     
     Expected format: Authorization: Bearer <api_key>
     
+    Declared sync so FastAPI runs it in the threadpool: the database lookup
+    blocks, and blocking the event loop while waiting for a pooled connection
+    deadlocks the worker once the pool is exhausted.
+    
     Can be bypassed when ENFORCE_AUTH=false (for testing only).
     
     Raises:
@@ -85,9 +104,8 @@ async def get_current_user(
             detail="API key is empty"
         )
     
-    # Hash the provided key and look up in database
-    api_key_hash = hash_api_key(api_key)
-    user = db.query(User).filter(User.api_key_hash == api_key_hash).first()
+    # One indexed lookup by key ID, one salted verification (cached briefly)
+    user = resolve_api_key_user(db, api_key)
     
     if not user:
         raise HTTPException(
@@ -104,6 +122,20 @@ async def get_current_user(
     return user
 
 
+def get_read_only_user(
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+) -> User:
+    """
+    ``get_current_user`` for read-only endpoints, looked up on a read replica.
+    
+    The user may be up to ``REPLICA_MAX_LAG_SECONDS`` stale: a just-created
+    or just-rotated key can take that long to work here. Endpoints that
+    check or charge quota must use ``get_current_user``.
+    """
+    return get_current_user(authorization, db)
+
+
 async def get_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -5,25 +5,25 @@ import hmac
 import time
 import random
 from typing import Optional
-from functools import lru_cache
 
 try:
     from fastapi import Header, HTTPException, Depends, Request
     from sqlalchemy.orm import Session
-    from cachetools import TTLCache
 except Exception:
     Header = HTTPException = Depends = Session = Request = None
-    TTLCache = None
 
-from .database_fixed import get_db
+from .database_fixed import get_db, get_read_db
 from .models import User, Plan, PLAN_CONFIGS
-from .auth import hash_api_key
+from .api_keys import resolve_api_key_user
+from .shared_state import get_shared_store
 
 # Optional auth bypass for testing (set ENFORCE_AUTH=false)
 ENFORCE_AUTH = os.getenv("ENFORCE_AUTH", "true").lower() == "true"
 
-# Rate limiting cache (user_id -> list of request timestamps)
-_rate_limit_cache = TTLCache(maxsize=10000, ttl=60) if TTLCache else {}
+# Rate limit window; counters live in the shared store so every worker
+# process sees the same count for a user
+RATE_LIMIT_WINDOW_SECONDS = 60
+RATE_LIMIT_KEY_PREFIX = "rl:"
 
 
 def constant_time_compare(a: str, b: str) -> bool:
@@ -40,17 +40,20 @@ def constant_time_compare(a: str, b: str) -> bool:
     return hmac.compare_digest(a.encode(), b.encode())
 
 
-async def get_current_user(
+def get_current_user(
     authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ) -> User:
     """
     Authentication dependency with timing attack protection.
     
+    Sync so FastAPI runs it in the threadpool; the database lookup and the
+    failure delays would otherwise block the event loop.
+    
     Security features:
-    - Constant-time comparison
+    - Salted key hashes, verified once per key ID (see api_keys.py)
     - Random delay on failure to prevent timing analysis
-    - Query optimization to reduce timing variance
+    - Minimum response time to reduce timing variance
     
     Args:
         authorization: Authorization header value
@@ -111,30 +114,18 @@ async def get_current_user(
             detail="Invalid API key format"
         )
     
-    # Hash the provided key
-    api_key_hash = hash_api_key(api_key)
-    
-    # Fetch active users (optimized query)
-    users = db.query(User).filter(
-        User.is_active == True
-    ).all()
-    
-    # Constant-time comparison to find matching user
-    matched_user = None
-    for user in users:
-        if constant_time_compare(user.api_key_hash, api_key_hash):
-            matched_user = user
-            # Don't break early - complete the loop for constant time
-    
-    # Calculate elapsed time
-    elapsed = time.time() - start_time
-    
-    # Ensure minimum response time to prevent timing analysis
-    min_time = 0.1
-    if elapsed < min_time:
-        time.sleep(min_time - elapsed + random.uniform(0, 0.1))
+    # One indexed lookup by key ID and a single salted verification
+    matched_user = resolve_api_key_user(db, api_key)
+    if matched_user is not None and not matched_user.is_active:
+        matched_user = None
     
     if not matched_user:
+        # Ensure minimum failure time to prevent timing analysis; successful
+        # (cached) lookups return immediately
+        elapsed = time.time() - start_time
+        min_time = 0.1
+        if elapsed < min_time:
+            time.sleep(min_time - elapsed + random.uniform(0, 0.1))
         raise HTTPException(
             status_code=401,
             detail="Invalid API key"
@@ -143,6 +134,21 @@ async def get_current_user(
     return matched_user
 
 
+def get_read_only_user(
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+) -> User:
+    """
+    ``get_current_user`` for read-only endpoints, looked up on a read replica.
+    
+    The returned user (and any query on the request's ``get_read_db``
+    session) may be up to ``REPLICA_MAX_LAG_SECONDS`` stale: a just-created
+    or just-rotated key can take that long to take effect here. Endpoints
+    that check or charge quota must use ``get_current_user``.
+    """
+    return get_current_user(authorization, db)
+
+
 async def get_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -197,24 +203,16 @@ async def check_rate_limit(
     # Get rate limit for user's plan
     rpm_limit = PLAN_CONFIGS[user.plan]["rpm"]
     
-    # Get current timestamp
+    # Fixed one-minute window counter shared across worker processes
     now = time.time()
-    minute_ago = now - 60
-    
-    # Get or create request log for user
-    if user.id not in _rate_limit_cache:
-        _rate_limit_cache[user.id] = []
-    
-    request_times = _rate_limit_cache[user.id]
-    
-    # Remove requests older than 1 minute
-    request_times[:] = [t for t in request_times if t > minute_ago]
+    window = int(now // RATE_LIMIT_WINDOW_SECONDS)
+    count = get_shared_store().incr(
+        f"{RATE_LIMIT_KEY_PREFIX}{user.id}:{window}", ttl=RATE_LIMIT_WINDOW_SECONDS + 1
+    )
     
     # Check if rate limit exceeded
-    if len(request_times) >= rpm_limit:
-        # Calculate retry-after
-        oldest_request = min(request_times)
-        retry_after = int(60 - (now - oldest_request) + 1)
+    if count > rpm_limit:
+        retry_after = int(RATE_LIMIT_WINDOW_SECONDS - (now % RATE_LIMIT_WINDOW_SECONDS)) + 1
         
         raise HTTPException(
             status_code=429,
@@ -222,31 +220,19 @@ async def check_rate_limit(
             headers={"Retry-After": str(retry_after)}
         )
     
-    # Add current request
-    request_times.append(now)
-    
     return user
 
 
-@lru_cache(maxsize=1)
-def get_rate_limiter_cache():
-    """
-    Get rate limiter cache (singleton).
-    
-    Returns:
-        dict or TTLCache: Cache for rate limiting
-    """
-    return _rate_limit_cache
-
-
 def clear_rate_limit_cache():
-    """Clear rate limit cache (for testing)."""
-    _rate_limit_cache.clear()
+    """Clear rate limit counters (for testing)."""
+    get_shared_store().clear(RATE_LIMIT_KEY_PREFIX)
 
 
 __all__ = [
     "get_db",
+    "get_read_db",
     "get_current_user",
+    "get_read_only_user",
     "get_admin_user",
     "check_rate_limit",
     "clear_rate_limit_cache",
@@ -0,0 +1,103 @@
+"""Conditional-request (ETag / If-None-Match), Range and content-negotiation helpers."""
+from __future__ import annotations
+from typing import Optional, Sequence, Tuple
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an ``If-None-Match`` header against ``etag``.
+
+    Uses the weak comparison RFC 9110 prescribes for ``If-None-Match``, so a
+    ``W/`` prefix added by an intermediary still matches.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def preferred_media_type(accept: Optional[str], offered: Sequence[str]) -> Optional[str]:
+    """
+    Pick the type in ``offered`` that the ``Accept`` header ranks highest.
+
+    The most specific matching range (``type/subtype`` over ``type/*`` over
+    ``*/*``) sets each type's quality; ties go to the earlier entry in
+    ``offered``, so list the default first. No header means the default;
+    None means nothing offered is acceptable.
+    """
+    if not accept:
+        return offered[0]
+    ranges = []
+    for part in accept.split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media:
+            ranges.append((media.lower(), quality))
+
+    best, best_quality = None, 0.0
+    for media_type in offered:
+        main_type = media_type.split("/")[0]
+        quality, specificity = 0.0, -1
+        for media, q in ranges:
+            if media == media_type:
+                match = 2
+            elif media == f"{main_type}/*":
+                match = 1
+            elif media == "*/*":
+                match = 0
+            else:
+                continue
+            if match > specificity:
+                quality, specificity = q, match
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range: bytes=...`` header into ``(start, end)``,
+    end exclusive.
+
+    Returns None when the whole representation should be sent (no header,
+    another unit, several ranges or a malformed value, all of which RFC 9110
+    lets a server ignore). Raises ``ValueError`` when the range is
+    unsatisfiable (416).
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[6:].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    first, _, last = (part.strip() for part in spec.partition("-"))
+    if not first and not last:
+        return None
+    try:
+        start = int(first) if first else None
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if start is None:
+        # Suffix range: the last N bytes
+        if end - 1 <= 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - (end - 1)), size
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    if end <= start:
+        return None
+    return start, min(end, size)
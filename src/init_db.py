@@ -2,13 +2,25 @@
 from __future__ import annotations
 
 from .database import engine
-from .models import Base, Voice, Gender
+from .models import Voice, Gender
+from .migrations import run_migrations, schema_is_current
 
 
 def init_database():
-    """Create all database tables."""
+    """Create all database tables (no-op when the schema is already current)."""
+    if schema_is_current(engine):
+        print("✅ Database schema already current")
+        return
+    
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "sqlite":
+        # Only takes effect on a fresh database file; lets retention hand
+        # deleted pages back to the filesystem (see src/retention.py).
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+    applied = run_migrations(engine)
+    for name in applied:
+        print(f"  ✅ Applied migration: {name}")
     print("✅ Database tables created successfully!")
 
 
@@ -50,25 +62,36 @@ def seed_default_voices(db_session):
     ]
     
     print("Seeding default voices...")
+    # One query for all seeded voices; only write rows that differ
+    existing_voices = {
+        voice.friendly_name: voice
+        for voice in db_session.query(Voice).filter(
+            Voice.friendly_name.in_([v["friendly_name"] for v in default_voices])
+        )
+    }
+    changed = False
     for voice_data in default_voices:
-        # Check if voice already exists
-        existing = db_session.query(Voice).filter(
-            Voice.friendly_name == voice_data["friendly_name"]
-        ).first()
+        existing = existing_voices.get(voice_data["friendly_name"])
         
         if not existing:
             voice = Voice(**voice_data)
             db_session.add(voice)
+            changed = True
             print(f"  ✅ Added voice: {voice_data['friendly_name']}")
-        else:
+        elif any(getattr(existing, field) != value for field, value in voice_data.items()):
             # Update existing voice with new data
             existing.minimax_voice_id = voice_data["minimax_voice_id"]
             existing.language = voice_data["language"]
             existing.gender = voice_data["gender"]
             existing.description = voice_data["description"]
             existing.is_cloned = voice_data["is_cloned"]
+            changed = True
             print(f"  🔄 Updated voice: {voice_data['friendly_name']}")
     
+    if not changed:
+        print("✅ Default voices already current")
+        return
+    
     db_session.commit()
     print("✅ Default voices seeded successfully!")
 
@@ -0,0 +1,247 @@
+"""In-memory prefilter of active API keys.
+
+A counting Bloom filter holds one token per active user's key (the key ID
+for prefixed keys, the unsalted SHA-256 for legacy ones). Authentication
+asks it first: a key whose token is definitely absent gets a 401 without
+touching the database. Counters (one byte each, saturating) rather than
+bits let deactivation and rotation remove tokens.
+
+Sizing comes from ``KEY_FILTER_CAPACITY`` and ``KEY_FILTER_FP_RATE``
+(capacity is raised to twice the key count at build time, leaving room for
+new keys); ``stats()`` and ``metrics()``
+report memory and the estimated false-positive rate at the current fill.
+
+The filter is built during warm-up and answers "maybe" for everything
+until then. Each process has its own copy: changes made through this
+process update it directly, and every change also bumps a generation
+counter in the shared store (``SHARED_STATE_URL``). A process that sees the
+generation move (checked every ``KEY_FILTER_SYNC_SECONDS``) stops rejecting
+and rebuilds in the background. Rows written outside the app are picked up
+by the periodic rebuild (``KEY_FILTER_REBUILD_SECONDS``).
+"""
+from __future__ import annotations
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .shared_state import SharedStore, get_shared_store
+
+logger = logging.getLogger(__name__)
+
+KEY_FILTER_ENABLED = os.getenv("KEY_FILTER_ENABLED", "true").lower() == "true"
+KEY_FILTER_CAPACITY = int(os.getenv("KEY_FILTER_CAPACITY", "100000"))
+KEY_FILTER_FP_RATE = float(os.getenv("KEY_FILTER_FP_RATE", "0.001"))
+KEY_FILTER_SYNC_SECONDS = float(os.getenv("KEY_FILTER_SYNC_SECONDS", "1"))
+KEY_FILTER_REBUILD_SECONDS = float(os.getenv("KEY_FILTER_REBUILD_SECONDS", "300"))
+GENERATION_KEY = "key_filter:generation"
+
+COUNTER_MAX = 255
+
+
+class CountingBloomFilter:
+    """Bloom filter with byte counters, so items can be removed."""
+
+    def __init__(self, capacity: int = KEY_FILTER_CAPACITY, fp_rate: float = KEY_FILTER_FP_RATE):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.size = max(8, int(math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.counters = bytearray(self.size)
+        self.items = 0
+
+    def _positions(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> None:
+        counters = self.counters
+        for pos in self._positions(item):
+            if counters[pos] < COUNTER_MAX:
+                counters[pos] += 1
+        self.items += 1
+
+    def remove(self, item: str) -> None:
+        """Remove an item previously added (removing anything else corrupts the filter)."""
+        counters = self.counters
+        for pos in self._positions(item):
+            # A saturated counter may hide other items' increments: leave it
+            if 0 < counters[pos] < COUNTER_MAX:
+                counters[pos] -= 1
+        self.items = max(0, self.items - 1)
+
+    def __contains__(self, item: str) -> bool:
+        counters = self.counters
+        return all(counters[pos] for pos in self._positions(item))
+
+    def estimated_fp_rate(self) -> float:
+        return (1.0 - math.exp(-self.hash_count * self.items / self.size)) ** self.hash_count
+
+
+class KeyFilter:
+    """
+    Per-process filter of active key tokens, kept in step across workers.
+
+    ``loader`` returns every active token; set it before ``rebuild``.
+    """
+
+    def __init__(self, capacity: int = KEY_FILTER_CAPACITY, fp_rate: float = KEY_FILTER_FP_RATE,
+                 loader: Optional[Callable[[], Iterable[str]]] = None,
+                 store: Optional[SharedStore] = None,
+                 sync_interval: float = KEY_FILTER_SYNC_SECONDS,
+                 rebuild_interval: float = KEY_FILTER_REBUILD_SECONDS):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.loader = loader
+        self._store = store
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._bloom: Optional[CountingBloomFilter] = None
+        self._generation = 0
+        self._stale = False
+        self._built_at = 0.0
+        self._synced_at = 0.0
+        self._pending: Optional[List[tuple]] = None  # changes made while rebuilding
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"checks": 0, "rejected": 0, "rebuilds": 0}
+
+    @property
+    def store(self) -> SharedStore:
+        return self._store or get_shared_store()
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None
+
+    def _shared_generation(self) -> int:
+        return int(self.store.get(GENERATION_KEY) or 0)
+
+    def rebuild(self) -> bool:
+        """Load every active token into a fresh filter and swap it in."""
+        if self.loader is None:
+            raise RuntimeError("KeyFilter.loader is not configured")
+        with self._lock:
+            if self._pending is not None:
+                return True  # another thread is rebuilding
+            self._pending = []
+        try:
+            generation = self._shared_generation()
+            tokens = list(self.loader())
+            bloom = CountingBloomFilter(max(self.capacity, 2 * len(tokens)), self.fp_rate)
+            for token in tokens:
+                bloom.add(token)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for op, token in self._pending:
+                getattr(bloom, op)(token)
+            self._pending = None
+            self._bloom = bloom
+            self._generation = generation
+            self._stale = False
+            self._built_at = self._synced_at = time.monotonic()
+            self.counters["rebuilds"] += 1
+        logger.info(f"Key filter built: {len(tokens)} keys, {bloom.size / 1024:.0f} KiB")
+        return True
+
+    def _rebuild_in_background(self) -> None:
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                logger.error(f"Key filter rebuild failed: {e}")
+
+        threading.Thread(target=run, name="key-filter-rebuild", daemon=True).start()
+
+    def _sync(self) -> None:
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+        if self._shared_generation() != self._generation:
+            self._stale = True
+            self._rebuild_in_background()
+        elif now - self._built_at >= self.rebuild_interval:
+            self._rebuild_in_background()
+
+    def might_contain(self, token: Optional[str]) -> bool:
+        """False only if ``token`` is definitely not an active key."""
+        if not KEY_FILTER_ENABLED or self._bloom is None:
+            return True
+        self.counters["checks"] += 1
+        self._sync()
+        if self._stale or token in self._bloom:
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def _apply(self, op: str, tokens: List[str]) -> None:
+        with self._lock:
+            for token in tokens:
+                if self._bloom is not None:
+                    getattr(self._bloom, op)(token)
+                if self._pending is not None:
+                    self._pending.append((op, token))
+        generation = self.store.incr(GENERATION_KEY)
+        with self._lock:
+            if generation == self._generation + 1:
+                self._generation = generation
+            else:
+                # Another process changed keys since we last synced
+                self._synced_at = 0.0
+
+    def add(self, *tokens: str) -> None:
+        self._apply("add", list(tokens))
+
+    def remove(self, *tokens: str) -> None:
+        self._apply("remove", list(tokens))
+
+    def invalidate(self) -> None:
+        """Tell every process to rebuild (after writing keys outside the app)."""
+        self.store.incr(GENERATION_KEY)
+
+    def stats(self) -> Dict[str, object]:
+        bloom = self._bloom
+        return {
+            "ready": bloom is not None,
+            "stale": self._stale,
+            "keys": bloom.items if bloom else 0,
+            "capacity": bloom.capacity if bloom else self.capacity,
+            "memory_bytes": bloom.size if bloom else 0,
+            "hash_count": bloom.hash_count if bloom else 0,
+            "target_fp_rate": self.fp_rate,
+            "estimated_fp_rate": bloom.estimated_fp_rate() if bloom else None,
+            **self.counters,
+        }
+
+    def metrics(self) -> str:
+        """Stats in Prometheus text exposition format."""
+        s = self.stats()
+        return (
+            "# HELP key_filter_keys Active API keys in the prefilter.\n"
+            "# TYPE key_filter_keys gauge\n"
+            f"key_filter_keys {s['keys']}\n"
+            "# HELP key_filter_memory_bytes Prefilter counter memory.\n"
+            "# TYPE key_filter_memory_bytes gauge\n"
+            f"key_filter_memory_bytes {s['memory_bytes']}\n"
+            "# HELP key_filter_estimated_fp_rate Estimated false-positive rate at the current fill.\n"
+            "# TYPE key_filter_estimated_fp_rate gauge\n"
+            f"key_filter_estimated_fp_rate {s['estimated_fp_rate'] or 0:.6g}\n"
+            "# HELP key_filter_checks_total Keys checked against the prefilter.\n"
+            "# TYPE key_filter_checks_total counter\n"
+            f"key_filter_checks_total {s['checks']}\n"
+            "# HELP key_filter_rejected_total Keys rejected without a database lookup.\n"
+            "# TYPE key_filter_rejected_total counter\n"
+            f"key_filter_rejected_total {s['rejected']}\n"
+        )
+
+
+active_keys = KeyFilter()
@@ -1,84 +1,550 @@
 """Entry point for the ODIADEV AI TTS service."""
 from __future__ import annotations
 import os
-import json
 import uuid
+import base64
 import logging
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import date, datetime
+
+from .startup import startup_profile, readiness, READINESS_WARM_UPSTREAM
 
 try:
-    from fastapi import FastAPI, Depends, HTTPException, Request
+    from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query, WebSocket, WebSocketDisconnect
+    from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+    from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse
+    from sqlalchemy import tuple_, update
     from sqlalchemy.orm import Session
     from dotenv import load_dotenv
 except Exception:
-    FastAPI = Depends = HTTPException = Session = None
+    FastAPI = Depends = HTTPException = Session = Response = JSONResponse = StreamingResponse = Query = tuple_ = None
+    update = None
+    WebSocket = WebSocketDisconnect = iterate_in_threadpool = run_in_threadpool = None
     load_dotenv = lambda: None
 
 # Load environment variables
 load_dotenv()
 
-from .database import get_session
-from .models import User, Voice, Usage, Plan, Gender, UsageStatus, PLAN_CONFIGS
+from .database import get_session, engine, SessionLocal
+from .models import User, Voice, Usage, Plan, Gender, UsageStatus, PLAN_CONFIGS, billing_cycle
 from .schemas import (
-    HealthResponse, UserCreate, UserCreateResponse, UserResponse,
-    QuotaUpdate, VoiceCreate, VoiceResponse, TTSRequest, TTSResponse
+    HealthResponse, UserCreate, UserCreateResponse, UserResponse, UserPage, BulkUserCreate,
+    QuotaUpdate, VoiceCreate, VoiceResponse, TTSRequest, TTSResponse, TelephonyTTSRequest, DialogueRequest,
+    RetentionResult, QuotaResetResult, UsageAnalytics, UsageLogPage, UsageLogResponse,
+)
+from .api_keys import (
+    issue_api_key, rotate_user_api_key, deactivate_user, user_key_token, active_key_tokens,
+)
+from .key_filter import active_keys
+from .dependencies import get_db, get_read_db, get_current_user, get_read_only_user, get_admin_user
+from .minimax_client import MinimaxClient, MinimaxAPIError, warm_upstream_pool
+from .retention import (
+    compact_usage_logs, retention_cutoff, run_retention, USAGE_RETENTION_INTERVAL_SECONDS,
+    MIN_RETENTION_DAYS, USAGE_RETENTION_REQUEST_BATCHES, MAX_RETENTION_REQUEST_BATCHES,
+)
+from .usage_archive import (
+    archive_closed_days, query_archive, GROUP_KEYS, USAGE_ARCHIVE_INTERVAL_SECONDS, ARCHIVE_AVAILABLE,
+)
+from .usage_export import iter_usage_export, cycle_bounds, naive_utc, EXPORT_FORMATS
+from .provisioning import provision_users, iter_ndjson, MAX_BULK_USERS
+from .quota_reset import reset_quotas, reset_current_cycle, QUOTA_RESET_CHECK_SECONDS
+from .scheduler import scheduler, SCHEDULER_ENABLED
+from .voice_registry import voice_registry
+from .http_cache import etag_matches, preferred_media_type, byte_range
+from .audio_store import (
+    get_audio_store, AudioObject, AudioStore, LocalAudioStore,
+    AUDIO_CACHE_CONTROL, AUDIO_STORE_ACCEL_PREFIX, AUDIO_PUBLIC_BASE_URL,
+)
+from .throttle import AuthThrottleMiddleware, auth_throttle
+from .admission import (
+    AdmissionMiddleware, audio_budget, estimate_audio_bytes,
+    PEAK_COPIES, RESERVATION_STATE_KEY, ADMISSION_RETRY_AFTER_SECONDS,
+)
+from .audio_profiles import AudioFormat, resolve_output_format
+from .composition import silent_clip, stitch, synthesize_concurrently
+from .ssml import Segment, SSMLError, parse_ssml
+from .telephony import FrameEncoder, stream_paced, telephony_format, telephony_streams
+from .responses import AudioBytesResponse, AudioJSONResponse, json_envelope, iter_base64, iter_file
+from .pagination import (
+    encode_cursor, decode_cursor, InvalidCursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 )
-from .auth import generate_api_key, hash_api_key
-from .dependencies import get_db, get_current_user, get_admin_user
-from .minimax_client import MinimaxClient, MinimaxAPIError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load voices configuration
-VOICES_CONFIG = {}
-try:
-    with open("voices.json", "r") as f:
-        VOICES_CONFIG = json.load(f)
-except FileNotFoundError:
-    logger.warning("voices.json not found, using default voices")
-    VOICES_CONFIG = {
-        "voices": [
-            {"id": "marcus", "name": "Marcus", "minimax_voice_id": "moss_audio_a59cd561-ab87-11f0-a74c-2a7a0b4baedc"},
-            {"id": "marcy", "name": "Marcy", "minimax_voice_id": "moss_audio_fdad4786-ab84-11f0-a816-023f15327f7a"},
-            {"id": "austyn", "name": "Austyn", "minimax_voice_id": "moss_audio_4e6eb029-ab89-11f0-a74c-2a7a0b4baedc"},
-            {"id": "joslyn", "name": "Joslyn", "minimax_voice_id": "moss_audio_141d8c4c-a6f8-11f0-84c1-0ec6fa858d82"}
-        ]
+VOICE_LIST_CACHE_CONTROL = f"private, max-age={int(os.getenv('VOICE_LIST_MAX_AGE', '60'))}"
+
+startup_profile.checkpoint("imports")
+
+def generate_silent_audio(fmt: AudioFormat, duration_seconds: float = 1.0) -> Tuple[bytes, AudioFormat]:
+    """
+    A silent clip for fallback in the negotiated ``fmt`` (built once per length
+    and format). Formats that can't be rendered locally (flac, pcm) get a
+    16-bit mono WAV clip at ``fmt``'s sample rate instead.
+    """
+    if fmt.format not in ("mp3", "wav"):
+        fmt = AudioFormat("wav", fmt.sample_rate, None, 1)
+    return silent_clip(fmt, duration_seconds).audio, fmt
+
+
+def audio_response(audio: Optional[bytes], fmt: AudioFormat, duration_seconds: float,
+                   voice_used: str, text_length: int, remaining_quota: float,
+                   path: Optional[str] = None) -> Response:
+    """Raw audio body (from memory, or the file at ``path``) with the ``TTSResponse`` metadata in headers."""
+    headers = {
+        "X-Audio-Duration": f"{duration_seconds:.3f}",
+        "X-Sample-Rate": str(fmt.sample_rate),
+        "X-Channels": str(fmt.channels),
+        "X-Voice-Used": voice_used,
+        "X-Text-Length": str(text_length),
+        "X-Remaining-Quota": f"{remaining_quota:.3f}",
+        "Vary": "Accept",
+    }
+    if fmt.bitrate:
+        headers["X-Bitrate"] = str(fmt.bitrate)
+    media_type = fmt.media_type
+    if path is not None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    # The client's bytearray is sent as it is, without a copy
+    return AudioBytesResponse(audio, media_type=media_type, headers=headers)
+
+
+def negotiate_delivery(requested: str, http_request: Request, fmt: AudioFormat) -> str:
+    """``url``, ``binary`` (the client accepts the clip's media type over JSON) or ``inline``."""
+    if requested == "url":
+        return "url"
+    offered = ("application/json", fmt.media_type)
+    if preferred_media_type(http_request.headers.get("accept"), offered) == offered[1]:
+        return "binary"
+    return "inline"
+
+
+def speech_response(http_request: Request, delivery: str, audio, fmt: AudioFormat, duration_seconds: float,
+                    voice_used: str, text_length: int, remaining_quota: float,
+                    audio_id: Optional[str] = None, audio_path: Optional[str] = None) -> Response:
+    """
+    A synthesized clip (in memory, or spilled to ``audio_path``) as
+    ``delivery`` asks: raw bytes, stored behind ``audio_url`` (under
+    ``audio_id`` if already stored) or base64 in the JSON body.
+    """
+    if delivery == "binary":
+        return audio_response(audio, fmt, duration_seconds, voice_used, text_length, remaining_quota,
+                              path=audio_path)
+    fields = {
+        "audio_url": None,
+        "duration_seconds": duration_seconds,
+        "format": fmt.format,
+        "sample_rate": fmt.sample_rate,
+        "bitrate": fmt.bitrate,
+        "channels": fmt.channels,
+        "voice_used": voice_used,
+        "text_length": text_length,
+        "remaining_quota": remaining_quota,
     }
+    if delivery == "url":
+        store = get_audio_store()
+        fields["audio_url"] = stored_audio_url(http_request, audio_id or (
+            store.put_file(audio_path, fmt.ext) if audio_path else store.put(audio, fmt.ext)))
+        return TTSResponse(audio_base64=None, **fields)
+    if audio_path is not None:
+        # Spilled clip: base64 streamed from the file into the JSON body
+        return StreamingResponse(
+            json_envelope("audio_base64", iter_base64(iter_file(audio_path)), fields),
+            media_type="application/json",
+        )
+    # Base64 bytes spliced into the envelope: no pydantic pass, no JSON encoder scan
+    return AudioJSONResponse("audio_base64", base64.b64encode(audio), fields)
+
+
+def stored_audio_url(request: Request, audio_id: str) -> str:
+    if AUDIO_PUBLIC_BASE_URL:
+        return f"{AUDIO_PUBLIC_BASE_URL}/v1/audio/{audio_id}"
+    return str(request.url_for("get_audio", audio_id=audio_id))
+
+
+def stored_audio_response(store: AudioStore, obj: AudioObject, request: Request) -> Response:
+    """
+    Serve a stored clip: strong ETag, immutable caching and single ``Range``
+    requests (``If-Range`` against the ETag).
+    """
+    headers = {"ETag": obj.etag, "Cache-Control": AUDIO_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), obj.etag):
+        return Response(status_code=304, headers=headers)
+    
+    if obj.path is not None and AUDIO_STORE_ACCEL_PREFIX and isinstance(store, LocalAudioStore):
+        # nginx serves the file (sendfile, Range) from an internal location
+        headers["X-Accel-Redirect"] = AUDIO_STORE_ACCEL_PREFIX.rstrip("/") + "/" + store.relative_path(obj.id)
+        return Response(media_type=obj.media_type, headers=headers)
+    
+    if_range = request.headers.get("if-range")
+    try:
+        requested = byte_range(request.headers.get("range"), obj.size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{obj.size}"})
+    if requested is None or (if_range is not None and if_range != obj.etag):
+        if obj.path is not None:
+            return FileResponse(obj.path, media_type=obj.media_type, headers=headers)
+        headers["Content-Length"] = str(obj.size)
+        return StreamingResponse(store.read(obj.id), media_type=obj.media_type, headers=headers)
+    
+    # Ranges are read through the store for every backend (FileResponse
+    # ignores Range in the pinned starlette)
+    start, end = requested
+    headers["Content-Length"] = str(end - start)
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{obj.size}"
+    return StreamingResponse(store.read(obj.id, start, end), status_code=206,
+                             media_type=obj.media_type, headers=headers)
+
+
+def upstream_http_error(e: MinimaxAPIError) -> HTTPException:
+    """The HTTP error reported for a failed MiniMax call."""
+    if e.status_code == 1008:
+        return HTTPException(status_code=503, detail=e.message)
+    if e.status_code in [401, 403]:
+        return HTTPException(status_code=500, detail="Service authentication error. Contact administrator.")
+    return HTTPException(status_code=500, detail=f"TTS generation failed: {e.message}")
+
+
+def charge_user(db, user: User, seconds: float) -> None:
+    """
+    Add ``seconds`` to ``user``'s usage in one ``UPDATE ... SET used_seconds =
+    used_seconds + :seconds``, so a concurrent charge or quota reset is never
+    overwritten by this session's copy of the row. Only executes the UPDATE:
+    the caller must commit, and refresh ``user`` afterwards to see the new
+    total (``user.used_seconds`` is stale until then).
+    """
+    db.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(used_seconds=User.used_seconds + seconds)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_usage(db, usage_log: Usage, user: Optional[User] = None, seconds: float = 0.0) -> None:
+    """Save ``usage_log``, charging ``user`` ``seconds`` in the same commit."""
+    db.add(usage_log)
+    if user is not None and seconds:
+        charge_user(db, user, seconds)
+    db.commit()
+    if user is not None:
+        db.refresh(user)
+
+
+def load_user(session_factory, user_id: int) -> Optional[User]:
+    """``user_id``'s current row, detached: its session is closed before returning."""
+    with session_factory() as db:
+        return db.get(User, user_id)
+
+
+def record_usage_in_new_session(session_factory, usage_log: Usage, user_id: int, seconds: float) -> User:
+    """``record_usage`` in a short-lived session; returns the user, refreshed and detached."""
+    # The caller keeps reading usage_log after the session is gone
+    with session_factory(expire_on_commit=False) as db:
+        user = db.get(User, user_id)
+        record_usage(db, usage_log, user, seconds)
+        return user
+
+
+def compose_speech(http_request: Request, db, user: User, request_id: str, delivery: str,
+                   output_format: AudioFormat, parts: List[Any], model: str, voice_used: str) -> Response:
+    """
+    Synthesize the clips of a composition concurrently and respond with them
+    stitched into one, in order.
+
+    ``parts`` are ``text_to_speech`` keyword arguments (``text``,
+    ``voice_id``, ``speed``, ``pitch``, ``emotion``) for each clip, or
+    seconds of silence as floats. Each clip is billed as its own usage row;
+    silence is free. A ``MinimaxAPIError`` is recorded and re-raised for the
+    caller to map.
+    """
+    jobs = [part for part in parts if isinstance(part, dict)]
+    text_length = sum(len(job["text"]) for job in jobs)
+
+    # The clips and the stitched clip are held together
+    estimate = estimate_audio_bytes(text_length, model, min(job["speed"] for job in jobs),
+                                    bitrate=int(output_format.byte_rate * 8))
+    reservation = audio_budget.reserve(estimate, PEAK_COPIES[delivery] + 1)
+    if reservation is None:
+        logger.warning(f"Request {request_id}: Rejected, audio memory budget exhausted")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy: too much audio in flight. Retry shortly.",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+    setattr(http_request.state, RESERVATION_STATE_KEY, reservation)  # released by AdmissionMiddleware
+
+    minimax = MinimaxClient()
+
+    def synthesize(job):
+        return minimax.text_to_speech(model=model, encode_base64=False, audio_format=output_format, **job)
+
+    try:
+        results = synthesize_concurrently(synthesize, jobs)
+    except MinimaxAPIError as e:
+        record_usage(db, Usage(
+            user_id=user.id, voice_id=0, text_length=text_length, status=UsageStatus.ERROR,
+            model_used=model, error_message=e.message,
+        ))
+        logger.error(f"Request {request_id}: MiniMax API error - {e.message}")
+        raise
+
+    clips = iter(results)
+    fmt = results[0].get("audio_format", output_format)
+    durations = [result["duration_seconds"] for result in results]
+    try:
+        stitched = stitch([next(clips)["audio_data"] if isinstance(part, dict) else part for part in parts], fmt)
+    except ValueError as e:
+        logger.error(f"Request {request_id}: Could not stitch clips - {e}")
+        raise HTTPException(status_code=500, detail=f"Could not stitch audio: {e}")
+    del results, clips
+
+    audio, audio_path = stitched.audio, None
+    if reservation.spill:
+        with reservation.spill_file(suffix=f".{fmt.ext}") as f:
+            f.write(audio)
+        audio, audio_path = None, f.name
+
+    # Store before charging, so a store failure is not billed
+    audio_id = None
+    if delivery == "url":
+        store = get_audio_store()
+        audio_id = store.put_file(audio_path, fmt.ext) if audio_path else store.put(audio, fmt.ext)
+
+    for job, seconds in zip(jobs, durations):
+        db.add(Usage(
+            user_id=user.id, voice_id=0, text_length=len(job["text"]), audio_seconds=seconds,
+            status=UsageStatus.SUCCESS, model_used=model,
+        ))
+    charge_user(db, user, sum(durations))
+    db.commit()
+    db.refresh(user)
+
+    return speech_response(
+        http_request, delivery, audio, fmt, stitched.duration_seconds, voice_used,
+        text_length, user.remaining_seconds, audio_id=audio_id, audio_path=audio_path,
+    )
+
+
+async def telephony_utterance(websocket: WebSocket, message: str, user: User, session_factory=None) -> None:
+    """
+    Synthesize one ``TelephonyTTSRequest`` and stream it as paced frames.
+
+    The socket holds no database session: the quota check and the usage
+    record each open a short-lived one (``session_factory``, by default
+    ``SessionLocal``), so idle call bridges don't keep pooled connections
+    checked out.
+    """
+    session_factory = session_factory or SessionLocal
+
+    async def error(detail: str):
+        await websocket.send_json({"event": "error", "detail": detail})
+
+    try:
+        request = TelephonyTTSRequest.model_validate_json(message)
+        upstream = telephony_format(request.encoding, request.sample_rate)
+    except ValueError as e:  # includes pydantic's ValidationError
+        return await error(str(e))
+
+    voices = voice_registry.snapshot()
+    voice_config = voices.get(request.voice_name) if request.voice_name else voices.default
+    if voice_config is None:
+        return await error(f"Invalid voice_id '{request.voice_name}'. Valid options: {', '.join(voices.by_id)}")
+    user = await run_in_threadpool(load_user, session_factory, user.id)
+    if user is None:
+        return await error("User not found")
+    estimated_seconds = (len(request.text.split()) / 150) * 60 / request.speed
+    if user.remaining_seconds <= 0 or estimated_seconds > user.remaining_seconds:
+        return await error(f"Quota exceeded. Remaining {user.remaining_seconds:.1f} seconds.")
+
+    encoder = FrameEncoder(request.encoding, request.sample_rate)
+    await websocket.send_json({
+        "event": "start",
+        "encoding": request.encoding,
+        "sample_rate": request.sample_rate,
+        "frame_ms": encoder.frame_ms,
+        "frame_bytes": encoder.frame_bytes,
+    })
+    usage_log = Usage(
+        user_id=user.id,
+        voice_id=0,  # No database voice ID for config-based voices
+        text_length=len(request.text),
+        status=UsageStatus.ERROR,  # Assume error, update on success
+        model_used=request.model,
+    )
+    try:
+        chunks = MinimaxClient().stream_speech(
+            text=request.text,
+            voice_id=voice_config["minimax_voice_id"],
+            model=request.model,
+            speed=request.speed,
+            pitch=request.pitch,
+            emotion=request.emotion,
+            audio_format=upstream,
+        )
+        # Upstream is read in the threadpool while frames go out paced
+        frames = await stream_paced(iterate_in_threadpool(chunks), encoder, websocket.send_bytes)
+    except (MinimaxAPIError, ValueError) as e:
+        usage_log.error_message = getattr(e, "message", str(e))
+        logger.error(f"Telephony stream failed for user {user.id}: {usage_log.error_message}")
+    except BaseException:
+        usage_log.error_message = "Stream interrupted"  # the caller hung up mid-utterance
+        raise
+    finally:
+        # Billed on the frames actually sent, however the stream ended
+        usage_log.audio_seconds = encoder.sent_seconds
+        if usage_log.error_message is None:
+            usage_log.status = UsageStatus.SUCCESS
+        user = await run_in_threadpool(
+            record_usage_in_new_session, session_factory, usage_log, user.id, encoder.sent_seconds,
+        )
+
+    if usage_log.error_message is not None:
+        return await error(f"TTS generation failed: {usage_log.error_message}")
+    await websocket.send_json({
+        "event": "end",
+        "frames": frames,
+        "duration_seconds": encoder.sent_seconds,
+        "remaining_quota": user.remaining_seconds,
+    })
+
+
+def usage_log_page(db, user_id: int, limit: int, cursor: Optional[str]) -> UsageLogPage:
+    """Fetch one newest-first page of a user's usage logs using a keyset cursor."""
+    query = db.query(Usage).filter(Usage.user_id == user_id)
+    if cursor:
+        try:
+            last_timestamp, last_id = decode_cursor(cursor, 2)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Row-value comparison so the planner seeks the composite index
+        query = query.filter(tuple_(Usage.timestamp, Usage.id) < tuple_(last_timestamp, last_id))
+    
+    rows = query.order_by(Usage.timestamp.desc(), Usage.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    
+    return UsageLogPage(
+        items=[UsageLogResponse.model_validate(row) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+# quota_bucket filter values -> [low, high) bounds on quota_percentage_used
+QUOTA_BUCKETS = {
+    "under_50": (None, 50.0),
+    "50_to_90": (50.0, 90.0),
+    "over_90": (90.0, None),
+    "exhausted": (100.0, None),
+}
+
+
+def user_list_page(
+    db,
+    limit: int,
+    cursor: Optional[str],
+    plan: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    quota_bucket: Optional[str] = None,
+) -> UserPage:
+    """
+    Fetch one page of users in id order, filtered in SQL.
+    
+    ``remaining_seconds`` and ``quota_percentage_used`` are computed by the
+    database (hybrid property expressions), so no ORM objects are built.
+    """
+    remaining = User.remaining_seconds
+    percentage = User.quota_percentage_used
+    query = db.query(
+        User.id, User.name, User.email, User.plan, User.quota_seconds, User.used_seconds,
+        remaining.label("remaining_seconds"), percentage.label("quota_percentage_used"),
+        User.is_active, User.created_at,
+    )
+    if plan is not None:
+        query = query.filter(User.plan == Plan[plan.upper()])
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if quota_bucket is not None:
+        low, high = QUOTA_BUCKETS[quota_bucket]
+        if low is not None:
+            query = query.filter(percentage >= low)
+        if high is not None:
+            query = query.filter(percentage < high)
+    if cursor:
+        try:
+            (last_id,) = decode_cursor(cursor, 1)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(User.id > last_id)
+    
+    rows = query.order_by(User.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    
+    return UserPage(
+        items=[UserResponse.model_validate(row._asdict()) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+def _check_database() -> bool:
+    """Open (and return to the pool) a database connection."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    return True
+
+
+def _check_upstream() -> bool:
+    """Pre-open the MiniMax connection pool when credentials are configured."""
+    if not READINESS_WARM_UPSTREAM or not os.getenv("MINIMAX_API_KEY"):
+        return True
+    return warm_upstream_pool()
+
+
+readiness.register("database", _check_database)
+readiness.register("voices", lambda: voice_registry.snapshot().default is not None)
+# Reported in /ready's body, but a MiniMax outage doesn't make instances unready
+readiness.register("upstream", _check_upstream, required=False)
+
+active_keys.loader = lambda: active_key_tokens(SessionLocal)
+readiness.register("key_filter", active_keys.rebuild)
+
+scheduler.add_job("quota_reset", QUOTA_RESET_CHECK_SECONDS, lambda: reset_current_cycle(SessionLocal))
+if ARCHIVE_AVAILABLE:
+    scheduler.add_job("usage_archive", USAGE_ARCHIVE_INTERVAL_SECONDS, lambda: archive_closed_days(engine))
+scheduler.add_job("usage_retention", USAGE_RETENTION_INTERVAL_SECONDS, lambda: run_retention(engine, SessionLocal))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in a thread so the port opens (and /health answers) immediately
+    readiness.warm_up_in_background(startup_profile)
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+    yield
+    scheduler.stop()
 
-def generate_silent_audio(duration_seconds: float) -> str:
-    """Generate silent audio as base64 string for fallback."""
-    import base64
-    import io
-    import wave
-    
-    # Create silent audio data
-    sample_rate = 32000
-    num_samples = int(sample_rate * duration_seconds)
-    silent_data = b'\x00' * (num_samples * 2)  # 16-bit audio
-    
-    # Create WAV file in memory
-    wav_buffer = io.BytesIO()
-    with wave.open(wav_buffer, 'wb') as wav_file:
-        wav_file.setnchannels(1)  # Mono
-        wav_file.setsampwidth(2)  # 16-bit
-        wav_file.setframerate(sample_rate)
-        wav_file.writeframes(silent_data)
-    
-    # Convert to base64
-    wav_buffer.seek(0)
-    return base64.b64encode(wav_buffer.read()).decode('utf-8')
 
 # Initialize FastAPI app
 app = FastAPI(
     title="ODIADEV AI TTS",
     version="1.0.0",
-    description="Production-ready TTS service with verified voice characteristics, authentication, quotas, and billing"
+    description="Production-ready TTS service with verified voice characteristics, authentication, quotas, and billing",
+    lifespan=lifespan,
 ) if FastAPI else None
 
 if app:
+    # Reject IPs / key prefixes with repeated 401s before routing or DB work
+    app.add_middleware(AdmissionMiddleware)
+    app.add_middleware(AuthThrottleMiddleware, throttle=auth_throttle)
+    
     # ==================== Health Check ====================
     @app.get("/health", response_model=HealthResponse, tags=["Health"])
     def health():
@@ -86,6 +552,30 @@ if app:
         return {"status": "ok"}
     
     
+    @app.get("/ready", tags=["Health"])
+    def ready():
+        """
+        Readiness check: 200 once the DB pool and voices are warm, else 503.
+        
+        `checks` also reports the upstream (MiniMax) pool, which never
+        makes this 503.
+        """
+        body = {"status": "ready" if readiness.is_ready else "starting", "checks": readiness.status}
+        if not readiness.is_ready:
+            return JSONResponse(status_code=503, content=body)
+        body["startup_ms"] = startup_profile.report()
+        return body
+    
+    
+    @app.get("/metrics", response_class=PlainTextResponse, tags=["Health"])
+    def metrics():
+        """Pre-auth throttle, key filter and audio admission counters in Prometheus text format."""
+        return PlainTextResponse(
+            auth_throttle.metrics() + active_keys.metrics() + audio_budget.metrics(),
+            media_type="text/plain; version=0.0.4",
+        )
+    
+    
     # ==================== Admin Endpoints ====================
     @app.post("/admin/users", response_model=UserCreateResponse, tags=["Admin"], status_code=201)
     def create_user(
@@ -103,9 +593,8 @@ if app:
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        # Generate API key
-        api_key = generate_api_key()
-        api_key_hash = hash_api_key(api_key)
+        # Generate prefixed API key (public key ID + salted hash)
+        api_key, key_id, api_key_hash = issue_api_key()
         
         # Get plan configuration
         plan_enum = Plan[user_data.plan.upper()]
@@ -115,6 +604,7 @@ if app:
         user = User(
             name=user_data.name,
             email=user_data.email,
+            api_key_prefix=key_id,
             api_key_hash=api_key_hash,
             plan=plan_enum,
             quota_seconds=plan_config["quota_seconds"],
@@ -124,6 +614,7 @@ if app:
         db.add(user)
         db.commit()
         db.refresh(user)
+        active_keys.add(user_key_token(key_id, api_key_hash))
         
         return UserCreateResponse(
             user=UserResponse.model_validate(user),
@@ -131,10 +622,56 @@ if app:
         )
     
     
+    @app.get("/admin/users", response_model=UserPage, tags=["Admin"])
+    def list_users(
+        plan: Optional[str] = Query(None, pattern="^(free|basic|pro|enterprise)$"),
+        is_active: Optional[bool] = None,
+        quota_bucket: Optional[str] = Query(None, pattern="^(" + "|".join(QUOTA_BUCKETS) + ")$"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_admin_user)
+    ):
+        """
+        List users in id order with keyset pagination. **Admin only**
+        
+        Filter by ``plan``, ``is_active`` and ``quota_bucket``
+        (under_50, 50_to_90, over_90, exhausted).
+        """
+        return user_list_page(db, limit, cursor, plan, is_active, quota_bucket)
+    
+    
+    @app.post("/admin/users/bulk", tags=["Admin"], status_code=201)
+    def create_users_bulk(
+        payload: BulkUserCreate,
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_admin_user)
+    ):
+        """
+        Create many users in one transaction.
+        
+        **Admin only** - Streams NDJSON: one line per input row (``api_key`` on
+        success, ``error`` otherwise) followed by a ``summary`` line. Plain keys
+        are shown only once!
+        """
+        if len(payload.users) > MAX_BULK_USERS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {MAX_BULK_USERS} users per request"
+            )
+        results = provision_users(db, payload.users)
+        return StreamingResponse(
+            iter_ndjson(results),
+            status_code=201,
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-store"},
+        )
+    
+    
     @app.get("/admin/users/{user_id}", response_model=UserResponse, tags=["Admin"])
     def get_user(
         user_id: int,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         admin: User = Depends(get_admin_user)
     ):
         """Get user details by ID. **Admin only**"""
@@ -169,6 +706,60 @@ if app:
         return UserResponse.model_validate(user)
     
     
+    @app.post("/admin/users/{user_id}/api-key", response_model=UserCreateResponse, tags=["Admin"])
+    def rotate_user_key(
+        user_id: int,
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_admin_user)
+    ):
+        """
+        Issue a new prefixed API key; the previous key stops working.
+        
+        **Admin only** - Also the migration path for legacy unsalted keys.
+        Returns the plain API key once.
+        """
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        api_key = rotate_user_api_key(db, user)
+        db.refresh(user)
+        
+        return UserCreateResponse(
+            user=UserResponse.model_validate(user),
+            api_key=api_key  # Plain key shown only once!
+        )
+    
+    
+    @app.post("/admin/users/{user_id}/deactivate", response_model=UserResponse, tags=["Admin"])
+    def deactivate_user_account(
+        user_id: int,
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_admin_user)
+    ):
+        """Deactivate a user; their API key is rejected from then on. **Admin only**"""
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        deactivate_user(db, user)
+        db.refresh(user)
+        
+        return UserResponse.model_validate(user)
+    
+    
+    @app.get("/admin/users/{user_id}/usage/logs", response_model=UsageLogPage, tags=["Admin"])
+    def get_user_usage_logs(
+        user_id: int,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_admin_user)
+    ):
+        """Page through a user's usage history, newest first. **Admin only**"""
+        return usage_log_page(db, user_id, limit, cursor)
+    
+    
     @app.post("/admin/voices", response_model=VoiceResponse, tags=["Admin"], status_code=201)
     def create_voice(
         voice_data: VoiceCreate,
@@ -193,56 +784,141 @@ if app:
         db.add(voice)
         db.commit()
         db.refresh(voice)
+        voice_registry.invalidate()
         
         return VoiceResponse.model_validate(voice)
     
     
+    @app.post("/admin/quota/reset", response_model=QuotaResetResult, tags=["Admin"])
+    def reset_quota_cycle(
+        cycle: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_admin_user)
+    ):
+        """
+        Reset usage and reapply plan quotas for a billing cycle (default:
+        current) for every user not yet reset in it. Safe to repeat. **Admin only**
+        """
+        if cycle and cycle > billing_cycle():
+            raise HTTPException(status_code=400, detail="Cannot reset a future billing cycle")
+        return QuotaResetResult(**reset_quotas(db, cycle))
+    
+    
+    @app.post("/admin/usage/compact", response_model=RetentionResult, tags=["Admin"])
+    def compact_usage(
+        retention_days: Optional[int] = Query(None, ge=MIN_RETENTION_DAYS),
+        max_batches: int = Query(USAGE_RETENTION_REQUEST_BATCHES, ge=1, le=MAX_RETENTION_REQUEST_BATCHES),
+        db: Session = Depends(get_db),
+        admin: User = Depends(get_admin_user)
+    ):
+        """
+        Roll up usage logs older than the retention window into daily totals
+        and delete the raw rows in small batches, at most ``max_batches`` per
+        call; repeat until ``rows_compacted`` is 0. **Admin only**
+        """
+        cutoff = retention_cutoff(days=retention_days)
+        return compact_usage_logs(db, cutoff=cutoff, max_batches=max_batches)
+    
+    
+    @app.get("/admin/usage/export", tags=["Admin"])
+    def export_usage(
+        format: str = Query("csv", pattern="^(csv|ndjson)$"),
+        cycle: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after_id: Optional[int] = Query(None, ge=0),
+        admin: User = Depends(get_admin_user)
+    ):
+        """
+        Stream raw usage logs for billing as CSV or NDJSON, in id order.
+        
+        The range is ``start``/``end`` if given, else the billing ``cycle``
+        (default: current). If a download breaks, repeat it with ``after_id``
+        set to the id of the last row received. **Admin only**
+        """
+        cycle_start, cycle_end = cycle_bounds(cycle or billing_cycle())
+        start = naive_utc(start) if start else cycle_start
+        end = naive_utc(end) if end else cycle_end
+        if start >= end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+        
+        filename = f"usage_{start:%Y%m%d}_{end:%Y%m%d}.{format}"
+        return StreamingResponse(
+            iter_usage_export(engine, start, end, format, after_id=after_id),
+            media_type=EXPORT_FORMATS[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+    
+    
+    @app.get("/admin/analytics/usage", response_model=UsageAnalytics, tags=["Admin"])
+    def usage_analytics(
+        start: date,
+        end: date,
+        group_by: str = Query("", description=f"Comma-separated: {', '.join(GROUP_KEYS)}"),
+        admin: User = Depends(get_admin_user)
+    ):
+        """
+        Aggregate archived usage for days ``start <= day < end``: requests,
+        audio seconds, characters and error rate per group.
+        
+        Reads the columnar archive only; days not yet archived (today, and
+        the last hour past midnight) are not included. **Admin only**
+        """
+        keys = [key.strip() for key in group_by.split(",") if key.strip()]
+        try:
+            return query_archive(start, end, keys)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    
+    
     @app.get("/v1/voices/list", response_model=List[Dict[str, Any]], tags=["Voices"])
     def list_voices(
+        request: Request,
         language: Optional[str] = None,
         gender: Optional[str] = None,
-        user: User = Depends(get_current_user)
+        user: User = Depends(get_read_only_user)
     ):
-        """List available voices. Optionally filter by language or gender."""
-        voices = VOICES_CONFIG["voices"]
-        
-        # Filter by language if specified
-        if language:
-            voices = [v for v in voices if v.get("language", "").startswith(language)]
-        
-        # Filter by gender if specified
-        if gender:
-            voices = [v for v in voices if v.get("gender", "").lower() == gender.lower()]
-        
-        # Return only active voices
-        active_voices = [v for v in voices if v.get("is_active", True)]
-        
-        # Format response
-        response = []
-        for voice in active_voices:
-            response.append({
-                "id": voice["id"],
-                "name": voice["name"],
-                "description": voice.get("description", ""),
-                "language": voice.get("language", "en-US"),
-                "gender": voice.get("gender", "unknown"),
-                "accent": voice.get("accent", "unknown"),
-                "tone": voice.get("tone", "neutral"),
-                "use_cases": voice.get("use_cases", []),
-                "is_verified": voice.get("is_verified", False)
-            })
+        """
+        List available voices. Optionally filter by language or gender.
         
-        return response
+        Responses carry a strong `ETag`; send it back in `If-None-Match` to get
+        `304 Not Modified` while the voice set is unchanged.
+        """
+        rendered = voice_registry.snapshot().rendered_list(language=language, gender=gender)
+        headers = {"ETag": rendered.etag, "Cache-Control": VOICE_LIST_CACHE_CONTROL}
+        
+        if etag_matches(request.headers.get("if-none-match"), rendered.etag):
+            return Response(status_code=304, headers=headers)
+        
+        return Response(content=rendered.body, media_type="application/json", headers=headers)
     
     
     @app.get("/v1/me", response_model=UserResponse, tags=["User"])
-    def get_current_user_info(user: User = Depends(get_current_user)):
+    def get_current_user_info(user: User = Depends(get_read_only_user)):
         """Get current authenticated user's information."""
         return UserResponse.model_validate(user)
     
     
+    @app.get("/v1/usage/logs", response_model=UsageLogPage, tags=["User"])
+    def get_usage_logs(
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        db: Session = Depends(get_db),
+        user: User = Depends(get_current_user)
+    ):
+        """
+        Page through your usage history, newest first.
+        
+        Pass the returned `next_cursor` as `cursor` to fetch the next page.
+        """
+        return usage_log_page(db, user.id, limit, cursor)
+    
+    
     # ==================== TTS Endpoint ====================
-    @app.post("/v1/tts", response_model=TTSResponse, tags=["TTS"])
+    @app.post("/v1/tts", response_model=TTSResponse, tags=["TTS"],
+              responses={200: {"content": {"audio/mpeg": {}, "audio/wav": {}, "audio/flac": {}}}})
     def generate_speech(
         request: TTSRequest,
         http_request: Request,
@@ -259,17 +935,52 @@ if app:
         - joslyn: African Female - Warm, professional tone
         
         Requires valid API key in Authorization header.
+        
+        `output_format` is an audio profile (`studio`, `default`, `web`,
+        `whatsapp`, `telephony`) or an explicit `format`, `sample_rate`,
+        `bitrate` and `channels`; without it your plan's profile applies.
+        
+        Send `Accept` with the format's media type (`audio/mpeg` for MP3) to
+        get the audio bytes as the response body (a third smaller than
+        base64 JSON, and nothing to decode), with the metadata in
+        `X-Audio-Duration`, `X-Sample-Rate`, `X-Bitrate`, `X-Channels`,
+        `X-Voice-Used`, `X-Text-Length` and `X-Remaining-Quota` headers.
+        
+        With `"delivery": "url"` the clip is stored and the response has an
+        `audio_url` (served by `GET /v1/audio/{id}`) instead of `audio_base64`.
+        
+        With `"text_type": "ssml"`, `text` is SSML: `<break time="500ms"/>`
+        (or `strength`), `<prosody rate="slow" pitch="+2st">` and
+        `<voice name="joslyn">`, inside an optional `<speak>`. The spans are
+        synthesized concurrently and joined without re-encoding; breaks are
+        silence rendered locally and not billed. The format must be MP3 or
+        WAV, and `text_length` counts the spoken text only.
+        
+        Returns `503` with `Retry-After` while the server holds too much
+        in-flight audio to take the request.
         """
         # Generate request ID for logging
         request_id = str(uuid.uuid4())[:8]
+        try:
+            output_format = resolve_output_format(request.output_format, PLAN_CONFIGS[user.plan]["audio_profile"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        delivery = negotiate_delivery(request.delivery, http_request, output_format)
+        
+        def respond(audio, fmt: AudioFormat, duration_seconds: float, voice_used: str,
+                    audio_id: Optional[str] = None, audio_path: Optional[str] = None):
+            return speech_response(
+                http_request, delivery, audio, fmt, duration_seconds, voice_used,
+                len(request.text), user.remaining_seconds, audio_id=audio_id, audio_path=audio_path,
+            )
         
         # Validate voice_id
-        valid_voice_ids = [voice["id"] for voice in VOICES_CONFIG["voices"]]
-        if request.voice_name and request.voice_name not in valid_voice_ids:
+        voices = voice_registry.snapshot()
+        if request.voice_name and voices.get(request.voice_name) is None:
             logger.error(f"Request {request_id}: Invalid voice_id '{request.voice_name}'")
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid voice_id '{request.voice_name}'. Valid options: {', '.join(valid_voice_ids)}"
+                detail=f"Invalid voice_id '{request.voice_name}'. Valid options: {', '.join(voices.by_id)}"
             )
         
         # Validate text length
@@ -281,6 +992,22 @@ if app:
                 detail=f"Text too long. Maximum {max_length} characters allowed."
             )
         
+        # SSML: segments and breaks, synthesized concurrently and stitched
+        segments = None
+        if request.text_type == "ssml":
+            try:
+                if output_format.format not in ("mp3", "wav"):
+                    raise SSMLError(f"SSML can't be rendered as {output_format.format}; use an mp3 or wav format")
+                segments = parse_ssml(request.text, request.speed, request.pitch, request.voice_name)
+            except SSMLError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            for part in segments:
+                if isinstance(part, Segment) and part.voice_name and voices.get(part.voice_name) is None:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Invalid voice_id '{part.voice_name}'. Valid options: {', '.join(voices.by_id)}"
+                    )
+        
         # Log request (without full text for privacy)
         text_snippet = request.text[:50] + "..." if len(request.text) > 50 else request.text
         logger.info(f"Request {request_id}: TTS request for voice '{request.voice_name}', text: '{text_snippet}'")
@@ -293,7 +1020,9 @@ if app:
             )
         
         # Estimate audio duration (conservative estimate)
-        word_count = len(request.text.split())
+        spoken = request.text if segments is None else " ".join(
+            part.text for part in segments if isinstance(part, Segment))
+        word_count = len(spoken.split())
         estimated_seconds = (word_count / 150) * 60 / request.speed
         
         # Check if estimated duration exceeds remaining quota
@@ -304,25 +1033,55 @@ if app:
                        f"({user.remaining_seconds:.1f}s)."
             )
         
-        # Get voice by ID or use default
-        voice_config = None
+        # Get voice by ID or use default (first active voice)
         if request.voice_name:
-            voice_config = next((v for v in VOICES_CONFIG["voices"] if v["id"] == request.voice_name), None)
-            
-            if not voice_config:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Voice '{request.voice_name}' not found. Use GET /v1/voices/list to list available voices."
-                )
+            voice_config = voices.get(request.voice_name)
         else:
-            # Use default voice (first active voice)
-            voice_config = next((v for v in VOICES_CONFIG["voices"] if v.get("is_active", True)), None)
+            voice_config = voices.default
             if not voice_config:
                 raise HTTPException(
                     status_code=500,
                     detail="No voices configured. Please contact administrator."
                 )
         
+        if segments is not None:
+            configs = [voices.get(part.voice_name) if part.voice_name else voice_config
+                       for part in segments if isinstance(part, Segment)]
+            clips = iter(configs)
+            parts = [
+                {
+                    "text": part.text, "voice_id": next(clips)["minimax_voice_id"],
+                    "speed": part.speed, "pitch": part.pitch, "emotion": request.emotion,
+                } if isinstance(part, Segment) else part
+                for part in segments
+            ]
+            logger.info(f"Request {request_id}: SSML of {len(configs)} segments")
+            try:
+                return compose_speech(
+                    http_request, db, user, request_id, delivery, output_format, parts, request.model,
+                    ",".join(dict.fromkeys(config["id"] for config in configs)),
+                )
+            except MinimaxAPIError as e:
+                if os.getenv("FALLBACK_TO_SILENT_AUDIO", "true").lower() == "true":
+                    logger.warning(f"Request {request_id}: Returning silent audio due to TTS failure")
+                    silence, silent = generate_silent_audio(output_format)
+                    return respond(silence, silent, 1.0, request.voice_name or "unknown")
+                raise upstream_http_error(e)
+        
+        # Admission: reserve the clip's estimated peak memory until the response is sent
+        estimate = estimate_audio_bytes(len(request.text), request.model, request.speed,
+                                        bitrate=int(output_format.byte_rate * 8))
+        reservation = audio_budget.reserve(estimate, PEAK_COPIES[delivery])
+        if reservation is None:
+            logger.warning(f"Request {request_id}: Rejected, audio memory budget exhausted")
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy: too much audio in flight. Retry shortly.",
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)},
+            )
+        setattr(http_request.state, RESERVATION_STATE_KEY, reservation)  # released by AdmissionMiddleware
+        spill = reservation.spill_file(suffix=f".{output_format.ext}") if reservation.spill else None
+        
         # Initialize MiniMax client
         minimax = MinimaxClient()
         
@@ -344,27 +1103,38 @@ if app:
                 speed=request.speed,
                 pitch=request.pitch,
                 emotion=request.emotion,
+                encode_base64=False,  # encoded straight into the response below
+                spill_file=spill,
+                audio_format=output_format,
             )
+            # What MiniMax actually produced, for the metadata and the store ID
+            fmt = result.get("audio_format", output_format)
+            audio_path = None
+            if spill is not None:
+                spill.close()
+                audio_path = spill.name
+            
+            # Store before charging, so a store failure is not billed
+            audio_id = None
+            if delivery == "url":
+                store = get_audio_store()
+                audio_id = store.put_file(audio_path, fmt.ext) if audio_path else store.put(result["audio_data"], fmt.ext)
             
             # Update usage log with success
             usage_log.audio_seconds = result["duration_seconds"]
             usage_log.status = UsageStatus.SUCCESS
             
             # Update user's used seconds
-            user.used_seconds += result["duration_seconds"]
+            charge_user(db, user, result["duration_seconds"])
             
             # Save to database
             db.add(usage_log)
             db.commit()
             db.refresh(user)
             
-            return TTSResponse(
-                audio_base64=result["audio_base64"],
-                duration_seconds=result["duration_seconds"],
-                sample_rate=result["sample_rate"],
-                voice_used=voice_config["id"],
-                text_length=len(request.text),
-                remaining_quota=user.remaining_seconds,
+            return respond(
+                result["audio_data"], fmt, result["duration_seconds"],
+                voice_config["id"], audio_id=audio_id, audio_path=audio_path,
             )
             
         except MinimaxAPIError as e:
@@ -380,24 +1150,11 @@ if app:
             
             if fallback_to_silent:
                 logger.warning(f"Request {request_id}: Returning silent audio due to TTS failure")
-                # Generate 1-second silent audio
-                silent_audio = generate_silent_audio(1.0)
-                return TTSResponse(
-                    audio_base64=silent_audio,
-                    duration_seconds=1.0,
-                    sample_rate=32000,
-                    voice_used=request.voice_name or "unknown",
-                    text_length=len(request.text),
-                    remaining_quota=user.remaining_seconds,
-                )
+                # Generate 1-second silent audio in the requested format
+                silence, silent = generate_silent_audio(output_format)
+                return respond(silence, silent, 1.0, request.voice_name or "unknown")
             else:
-                # Return appropriate HTTP error
-                if e.status_code == 1008:
-                    raise HTTPException(status_code=503, detail=e.message)
-                elif e.status_code in [401, 403]:
-                    raise HTTPException(status_code=500, detail="Service authentication error. Contact administrator.")
-                else:
-                    raise HTTPException(status_code=500, detail=f"TTS generation failed: {e.message}")
+                raise upstream_http_error(e)
         
         except Exception as e:
             # Log unexpected errors
@@ -412,18 +1169,150 @@ if app:
             
             if fallback_to_silent:
                 logger.warning(f"Request {request_id}: Returning silent audio due to unexpected error")
-                # Generate 1-second silent audio
-                silent_audio = generate_silent_audio(1.0)
-                return TTSResponse(
-                    audio_base64=silent_audio,
-                    duration_seconds=1.0,
-                    sample_rate=32000,
-                    voice_used=request.voice_name or "unknown",
-                    text_length=len(request.text),
-                    remaining_quota=user.remaining_seconds,
-                )
+                # Generate 1-second silent audio in the requested format
+                silence, silent = generate_silent_audio(output_format)
+                return respond(silence, silent, 1.0, request.voice_name or "unknown")
             else:
                 raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+        
+        finally:
+            # Already closed on success; on failure, don't leak the descriptor
+            if spill is not None:
+                spill.close()
+    
+    
+    @app.post("/v1/tts/dialogue", response_model=TTSResponse, tags=["TTS"],
+              responses={200: {"content": {"audio/mpeg": {}, "audio/wav": {}}}})
+    def generate_dialogue(
+        request: DialogueRequest,
+        http_request: Request,
+        db: Session = Depends(get_db),
+        user: User = Depends(get_current_user)
+    ):
+        """
+        Synthesize a multi-speaker dialogue as one clip.
+        
+        Each turn (`voice_name`, `text`, `emotion`) is synthesized
+        concurrently, at most `SYNTHESIS_CONCURRENCY` at a time, and the
+        clips are joined in order without re-encoding, with `gap_ms` of
+        silence between turns (per turn `gap_ms` overrides it). Silence is
+        rendered locally and not billed.
+        
+        `output_format` must be MP3 or WAV. Delivery, `Accept` negotiation
+        and the response are as for `/v1/tts`; `voice_used` lists the
+        voices in order of first appearance.
+        """
+        request_id = str(uuid.uuid4())[:8]
+        try:
+            output_format = resolve_output_format(request.output_format, PLAN_CONFIGS[user.plan]["audio_profile"])
+            if output_format.format not in ("mp3", "wav"):
+                raise ValueError(f"Dialogues can't be {output_format.format}; use an mp3 or wav format")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        delivery = negotiate_delivery(request.delivery, http_request, output_format)
+        
+        voices = voice_registry.snapshot()
+        jobs = []
+        for turn in request.turns:
+            voice_config = voices.get(turn.voice_name) if turn.voice_name else voices.default
+            if voice_config is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid voice_id '{turn.voice_name}'. Valid options: {', '.join(voices.by_id)}"
+                )
+            jobs.append((turn, voice_config))
+        
+        text_length = sum(len(turn.text) for turn in request.turns)
+        max_length = int(os.getenv("MAX_DIALOGUE_TEXT_LENGTH", "20000"))
+        if text_length > max_length:
+            raise HTTPException(status_code=400, detail=f"Dialogue too long. Maximum {max_length} characters allowed.")
+        
+        words = sum(len(turn.text.split()) for turn in request.turns)
+        estimated_seconds = (words / 150) * 60 / request.speed
+        if user.remaining_seconds <= 0 or estimated_seconds > user.remaining_seconds:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Estimated audio duration ({estimated_seconds:.1f}s) exceeds remaining quota "
+                       f"({user.remaining_seconds:.1f}s)."
+            )
+        
+        # Each turn's clip, followed by its gap (none after the last)
+        parts = []
+        for turn, voice_config in jobs:
+            if parts:
+                parts.append((request.gap_ms if previous.gap_ms is None else previous.gap_ms) / 1000)
+            parts.append({
+                "text": turn.text, "voice_id": voice_config["minimax_voice_id"],
+                "speed": request.speed, "pitch": request.pitch, "emotion": turn.emotion,
+            })
+            previous = turn
+        
+        logger.info(f"Request {request_id}: Dialogue of {len(jobs)} turns, {text_length} chars")
+        try:
+            return compose_speech(
+                http_request, db, user, request_id, delivery, output_format, parts, request.model,
+                ",".join(dict.fromkeys(voice_config["id"] for _, voice_config in jobs)),
+            )
+        except MinimaxAPIError as e:
+            raise upstream_http_error(e)
+    
+    
+    @app.websocket("/v1/tts/telephony")
+    async def telephony_stream(
+        websocket: WebSocket,
+        db: Session = Depends(get_db),
+        user: User = Depends(get_current_user),
+    ):
+        """
+        Stream speech to a call bridge as fixed 20 ms frames, paced in real time.
+        
+        Send one JSON message per utterance: `text`, `voice_name`, `encoding`
+        (`mulaw` or `alaw` at 8 kHz, or 16-bit little-endian `pcm` at 8 or
+        16 kHz), `sample_rate` and the `/v1/tts` voice settings. Each gets a
+        `start` event (`frame_ms`, `frame_bytes`), the audio as binary
+        frames, and an `end` event with the billed `duration_seconds`, or an
+        `error` event. The socket stays open for the next utterance.
+        
+        At most the plan's `max_streams` sockets per user are open at once,
+        across all workers; past that the handshake is refused.
+        """
+        # Give the auth lookup's connection back; each utterance opens its own session
+        db.close()
+        limit = PLAN_CONFIGS[user.plan]["max_streams"]
+        slot = telephony_streams.acquire(user.id, limit)
+        if slot is None:
+            await websocket.close(code=1013, reason=f"Too many open streams (plan limit {limit})")
+            return
+        lease = asyncio.create_task(telephony_streams.keep_alive(slot))
+        try:
+            await websocket.accept()
+            while True:
+                await telephony_utterance(websocket, await websocket.receive_text(), user)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            lease.cancel()
+            telephony_streams.release(slot)
+    
+    
+    @app.api_route("/v1/audio/{audio_id}", methods=["GET", "HEAD"], name="get_audio", tags=["TTS"],
+                   responses={200: {"content": {"audio/mpeg": {}, "audio/wav": {}, "audio/flac": {}}}})
+    def get_audio(audio_id: str, request: Request):
+        """
+        Fetch a clip generated with `"delivery": "url"`.
+        
+        No API key needed: the ID is the SHA-256 of the audio. Clips never
+        change, so responses are cacheable forever (`immutable`) and carry a
+        strong `ETag`; `Range` requests get `206 Partial Content`.
+        """
+        store = get_audio_store()
+        obj = store.stat(audio_id)
+        if obj is None:
+            raise HTTPException(status_code=404, detail="Audio not found")
+        return stored_audio_response(store, obj, request)
+
+
+startup_profile.checkpoint("app")
 
 
 __all__ = ["app"]
@@ -0,0 +1,140 @@
+"""Lightweight, idempotent schema migrations.
+
+``Base.metadata.create_all`` creates missing tables but never alters existing
+ones, so changes to tables that already hold data (new indexes, new columns)
+are listed here. Each migration runs once; applied names are recorded in the
+``schema_migrations`` table. Statements are written to be safe to re-run
+(``IF NOT EXISTS``) because a fresh database already gets them from the models.
+"""
+from __future__ import annotations
+import logging
+from typing import Callable, List, Tuple
+
+try:
+    from sqlalchemy import inspect, select, func
+except Exception:
+    inspect = select = func = None
+
+from .models import Base, SchemaMigration, User, UsageRollup, billing_cycle
+
+logger = logging.getLogger(__name__)
+
+
+def _usage_user_timestamp_index(conn) -> None:
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_usage_logs_user_id_timestamp "
+        "ON usage_logs (user_id, timestamp DESC, id DESC)"
+    )
+
+
+def _user_api_key_prefix(conn) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    if "api_key_prefix" not in columns:
+        conn.exec_driver_sql("ALTER TABLE users ADD COLUMN api_key_prefix VARCHAR(16)")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_api_key_prefix ON users (api_key_prefix)"
+    )
+    if conn.dialect.name == "postgresql":
+        # Salted hashes are longer than the original 64-char SHA-256 column
+        conn.exec_driver_sql("ALTER TABLE users ALTER COLUMN api_key_hash TYPE VARCHAR(128)")
+
+
+def _user_listing_indexes(conn) -> None:
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_users_plan_id ON users (plan, id)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_users_is_active_id ON users (is_active, id)")
+
+
+def _user_last_reset_cycle(conn) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    if "last_reset_cycle" not in columns:
+        conn.exec_driver_sql("ALTER TABLE users ADD COLUMN last_reset_cycle VARCHAR(7)")
+    # Existing users count as reset for the current cycle, so deploying this
+    # doesn't zero everyone's usage mid-month
+    conn.execute(
+        User.__table__.update()
+        .where(User.last_reset_cycle.is_(None))
+        .values(last_reset_cycle=billing_cycle())
+    )
+
+
+def _voice_updated_at(conn) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("voices")}
+    if "updated_at" not in columns:
+        conn.exec_driver_sql("ALTER TABLE voices ADD COLUMN updated_at TIMESTAMP")
+    conn.exec_driver_sql("UPDATE voices SET updated_at = created_at WHERE updated_at IS NULL")
+
+
+def _usage_rollup_key(conn) -> None:
+    rollups = UsageRollup.__table__
+    key = [rollups.c.user_id, rollups.c.voice_id, rollups.c.model_used, rollups.c.status, rollups.c.day]
+    # Fold duplicate buckets left by overlapping compaction runs into their oldest row
+    duplicates = conn.execute(
+        select(
+            *key,
+            func.min(rollups.c.id),
+            func.sum(rollups.c.request_count),
+            func.sum(rollups.c.text_length_total),
+            func.sum(rollups.c.audio_seconds_total),
+        )
+        .group_by(*key)
+        .having(func.count() > 1)
+    ).all()
+    for row in duplicates:
+        keep, count, text_total, audio_total = row[len(key):]
+        same_bucket = [column.is_not_distinct_from(value) for column, value in zip(key, row)]
+        conn.execute(rollups.delete().where(*same_bucket, rollups.c.id != keep))
+        conn.execute(
+            rollups.update()
+            .where(rollups.c.id == keep)
+            .values(request_count=count, text_length_total=text_total, audio_seconds_total=audio_total)
+        )
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_usage_rollups_key "
+        "ON usage_rollups (user_id, voice_id, model_used, status, day)"
+    )
+
+
+MIGRATIONS: List[Tuple[str, Callable]] = [
+    ("0001_usage_user_timestamp_index", _usage_user_timestamp_index),
+    ("0002_user_api_key_prefix", _user_api_key_prefix),
+    ("0003_user_listing_indexes", _user_listing_indexes),
+    ("0004_user_last_reset_cycle", _user_last_reset_cycle),
+    ("0005_voice_updated_at", _voice_updated_at),
+    ("0006_usage_rollup_key", _usage_rollup_key),
+]
+
+
+def pending_migrations(conn) -> List[str]:
+    """Return names of migrations not yet recorded as applied."""
+    applied = {row[0] for row in conn.execute(SchemaMigration.__table__.select())}
+    return [name for name, _ in MIGRATIONS if name not in applied]
+
+
+def schema_is_current(engine) -> bool:
+    """Cheap startup check: every table exists and no migration is pending."""
+    existing = set(inspect(engine).get_table_names())
+    if not set(Base.metadata.tables) <= existing:
+        return False
+    with engine.connect() as conn:
+        return not pending_migrations(conn)
+
+
+def run_migrations(engine) -> List[str]:
+    """
+    Create missing tables and apply pending migrations in order.
+
+    Returns:
+        list: Names of migrations applied by this call
+    """
+    Base.metadata.create_all(bind=engine)
+    applied = []
+    with engine.begin() as conn:
+        pending = set(pending_migrations(conn))
+        for name, migrate in MIGRATIONS:
+            if name not in pending:
+                continue
+            logger.info(f"Applying migration {name}")
+            migrate(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(name=name))
+            applied.append(name)
+    return applied
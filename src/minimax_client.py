@@ -1,13 +1,74 @@
 """MiniMax T2A API client."""
 from __future__ import annotations
 import os
+import json
 import base64
-from typing import Dict, Any
+import threading
+from typing import BinaryIO, Dict, Any, Iterator, Optional, Tuple
 
-try:
-    import requests
-except Exception:
-    requests = None
+from .upstream_parser import UpstreamAudioParser, UPSTREAM_CHUNK_SIZE
+from .audio_profiles import AudioFormat, upstream_format, upstream_duration
+
+# ``requests`` is imported on first use to keep it off the cold-start path
+requests = None
+
+DEFAULT_BASE_URL = "https://api.minimaxi.chat"
+UPSTREAM_POOL_SIZE = int(os.getenv("MINIMAX_POOL_SIZE", "20"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _requests():
+    global requests
+    if requests is None:
+        import requests as requests_module
+        requests = requests_module
+    return requests
+
+
+def get_http_session():
+    """
+    Shared ``requests.Session`` with a keep-alive connection pool to MiniMax.
+
+    Reusing it saves a TCP and TLS handshake on every request after the first.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                http = _requests()
+                session = http.Session()
+                adapter = http.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=UPSTREAM_POOL_SIZE
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def warm_upstream_pool(timeout: float = 5.0) -> bool:
+    """
+    Open a pooled connection to the MiniMax host ahead of the first request.
+
+    Any HTTP response counts as warm: the point is the established
+    connection, not the status code.
+    """
+    base_url = os.getenv("MINIMAX_BASE_URL", DEFAULT_BASE_URL)
+    try:
+        get_http_session().head(base_url, timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
+# MiniMax base_resp status codes -> readable messages
+ERROR_MESSAGES = {
+    1008: "Insufficient balance in MiniMax account. Please add credits.",
+    2013: "Invalid parameters provided to MiniMax API.",
+    401: "Invalid MiniMax API key or authentication failed.",
+}
 
 
 class MinimaxAPIError(Exception):
@@ -38,7 +99,31 @@ class MinimaxClient:
         if not self.group_id:
             raise ValueError("MINIMAX_GROUP_ID not provided")
         
-        self.base_url = "https://api.minimaxi.chat"
+        self.base_url = os.getenv("MINIMAX_BASE_URL", DEFAULT_BASE_URL)
+    
+    def _request(self, text: str, voice_id: str, model: str, speed: float, pitch: int, emotion: str,
+                 audio_format: Optional[AudioFormat]) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """URL, headers and JSON payload of a T2A call."""
+        url = f"{self.base_url}/v1/t2a_v2?GroupId={self.group_id}"
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        
+        payload = {
+            "text": text,
+            "model": model,
+            "voice_setting": {
+                "voice_id": voice_id,
+                "speed": speed,
+                "pitch": pitch,
+                "emotion": emotion,
+            },
+        }
+        if audio_format is not None:
+            payload["audio_setting"] = audio_format.audio_setting()
+        return url, headers, payload
     
     def text_to_speech(
         self,
@@ -48,7 +133,10 @@ class MinimaxClient:
         speed: float = 1.0,
         pitch: int = 0,
         emotion: str = "neutral",
-        timeout: int = 30
+        timeout: int = 30,
+        encode_base64: bool = True,
+        spill_file: Optional[BinaryIO] = None,
+        audio_format: Optional[AudioFormat] = None,
     ) -> Dict[str, Any]:
         """
         Convert text to speech using MiniMax API.
@@ -61,34 +149,29 @@ class MinimaxClient:
             pitch: Voice pitch (-12 to 12)
             emotion: Emotion (neutral, happy, sad, angry, etc.)
             timeout: Request timeout in seconds
+            encode_base64: Also return the audio base64-encoded (skip when
+                sending raw bytes to save a copy of the clip)
+            spill_file: Write the audio to this file instead of memory
+                (``audio_data`` and ``audio_base64`` are then None)
+            audio_format: Output format sent as ``audio_setting`` (default:
+                MiniMax's 32 kHz, 128 kbps MP3)
             
         Returns:
             dict with keys:
-                - audio_data: bytes of MP3 audio
-                - audio_base64: base64-encoded audio
-                - duration_seconds: estimated duration
+                - audio_data: the audio (a bytearray, decoded in place)
+                - audio_base64: base64-encoded audio (None if not requested)
+                - audio_size: length of the audio in bytes
+                - duration_seconds: duration reported by MiniMax (else estimated)
                 - sample_rate: audio sample rate
+                - audio_format: the ``AudioFormat`` MiniMax produced
                 
         Raises:
             MinimaxAPIError: If API request fails
         """
-        url = f"{self.base_url}/v1/t2a_v2?GroupId={self.group_id}"
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+        url, headers, payload = self._request(text, voice_id, model, speed, pitch, emotion, audio_format)
+        requested_format = audio_format or AudioFormat()
         
-        payload = {
-            "text": text,
-            "model": model,
-            "voice_setting": {
-                "voice_id": voice_id,
-                "speed": speed,
-                "pitch": pitch,
-                "emotion": emotion,
-            },
-        }
+        requests = _requests()
         
         try:
             # Debug logging
@@ -97,17 +180,22 @@ class MinimaxClient:
             print(f"[DEBUG] Group ID: {self.group_id}")
             print(f"[DEBUG] Headers: {headers}")
             
-            response = requests.post(url, headers=headers, json=payload, timeout=timeout)
-            
-            # Check HTTP status
-            if response.status_code != 200:
-                raise MinimaxAPIError(
-                    response.status_code,
-                    f"HTTP {response.status_code}",
-                    response.text
-                )
-            
-            data = response.json()
+            # Stream the body through the parser instead of response.json():
+            # the hex never exists as one string
+            with get_http_session().post(url, headers=headers, json=payload, timeout=timeout,
+                                         stream=True) as response:
+                # Check HTTP status
+                if response.status_code != 200:
+                    raise MinimaxAPIError(
+                        response.status_code,
+                        f"HTTP {response.status_code}",
+                        response.text
+                    )
+                
+                parser = UpstreamAudioParser(int(response.headers.get("Content-Length") or 0), sink=spill_file)
+                for chunk in response.iter_content(UPSTREAM_CHUNK_SIZE):
+                    parser.feed(chunk)
+                data, audio_bytes = parser.close()
             
             # Check MiniMax API response status
             base_resp = data.get("base_resp", {})
@@ -115,34 +203,31 @@ class MinimaxClient:
             status_msg = base_resp.get("status_msg", "Unknown error")
             
             if status_code != 0:
-                # Map MiniMax error codes to readable messages
-                error_messages = {
-                    1008: "Insufficient balance in MiniMax account. Please add credits.",
-                    2013: "Invalid parameters provided to MiniMax API.",
-                    401: "Invalid MiniMax API key or authentication failed.",
-                }
-                
-                readable_msg = error_messages.get(status_code, status_msg)
-                raise MinimaxAPIError(status_code, readable_msg, data)
+                raise MinimaxAPIError(status_code, ERROR_MESSAGES.get(status_code, status_msg), data)
             
-            # Extract audio data
-            audio_hex = data.get("data", {}).get("audio")
-            if not audio_hex:
+            if not parser.audio_length:
                 raise MinimaxAPIError(500, "No audio data in response", data)
             
-            # Decode hex to bytes
-            audio_bytes = bytes.fromhex(audio_hex)
-            audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
+            if spill_file is not None:
+                spill_file.flush()
+                audio_bytes, encode_base64 = None, False
+            audio_base64 = base64.b64encode(audio_bytes).decode("utf-8") if encode_base64 else None
             
-            # Estimate duration (rough estimate: ~150 words per minute)
-            word_count = len(text.split())
-            estimated_duration = (word_count / 150) * 60 / speed
+            extra_info = data.get("extra_info")
+            actual_format = upstream_format(extra_info, requested_format)
+            duration = upstream_duration(extra_info)
+            if duration is None:
+                # Estimate duration (rough estimate: ~150 words per minute)
+                word_count = len(text.split())
+                duration = (word_count / 150) * 60 / speed
             
             return {
                 "audio_data": audio_bytes,
                 "audio_base64": audio_base64,
-                "duration_seconds": estimated_duration,
-                "sample_rate": 32000,  # Default MiniMax sample rate
+                "audio_size": parser.audio_length,
+                "duration_seconds": duration,
+                "sample_rate": actual_format.sample_rate,
+                "audio_format": actual_format,
             }
             
         except requests.exceptions.Timeout:
@@ -153,3 +238,67 @@ class MinimaxClient:
             raise MinimaxAPIError(500, f"Request failed: {str(e)}")
         except (ValueError, KeyError) as e:
             raise MinimaxAPIError(500, f"Failed to parse MiniMax response: {str(e)}")
+
+    def stream_speech(
+        self,
+        text: str,
+        voice_id: str,
+        model: str = "speech-02-turbo",
+        speed: float = 1.0,
+        pitch: int = 0,
+        emotion: str = "neutral",
+        timeout: int = 30,
+        audio_format: Optional[AudioFormat] = None,
+    ) -> Iterator[bytes]:
+        """
+        Stream speech as MiniMax synthesizes it (``"stream": true``).
+        
+        MiniMax answers with server-sent events, one hex audio chunk each
+        (``data.status`` 1); the closing event (status 2) repeats the whole
+        clip and is skipped. MP3 and PCM can be streamed, WAV cannot.
+        
+        Yields:
+            bytes: Decoded audio chunks, in order
+            
+        Raises:
+            MinimaxAPIError: If the request fails (possibly after some chunks)
+        """
+        url, headers, payload = self._request(text, voice_id, model, speed, pitch, emotion, audio_format)
+        payload["stream"] = True
+        requests = _requests()
+        
+        try:
+            with get_http_session().post(url, headers=headers, json=payload, timeout=timeout,
+                                         stream=True) as response:
+                if response.status_code != 200:
+                    raise MinimaxAPIError(response.status_code, f"HTTP {response.status_code}", response.text)
+                
+                streamed = False
+                for line in response.iter_lines(UPSTREAM_CHUNK_SIZE):
+                    if line.startswith(b"data:"):
+                        line = line[5:]
+                    elif not line.startswith(b"{"):
+                        continue  # blank separators, comments
+                    event = json.loads(line)
+                    status_code = event.get("base_resp", {}).get("status_code", 0)
+                    if status_code != 0:
+                        status_msg = event["base_resp"].get("status_msg", "Unknown error")
+                        raise MinimaxAPIError(status_code, ERROR_MESSAGES.get(status_code, status_msg), event)
+                    data = event.get("data") or {}
+                    audio = data.get("audio")
+                    if not audio or (data.get("status") == 2 and streamed):
+                        continue
+                    streamed = True
+                    yield bytes.fromhex(audio)
+                
+                if not streamed:
+                    raise MinimaxAPIError(500, "No audio data in response")
+            
+        except requests.exceptions.Timeout:
+            raise MinimaxAPIError(408, "Request to MiniMax API timed out")
+        except requests.exceptions.ConnectionError:
+            raise MinimaxAPIError(503, "Could not connect to MiniMax API")
+        except requests.exceptions.RequestException as e:
+            raise MinimaxAPIError(500, f"Request failed: {str(e)}")
+        except (ValueError, KeyError) as e:
+            raise MinimaxAPIError(500, f"Failed to parse MiniMax response: {str(e)}")
@@ -3,9 +3,9 @@ from __future__ import annotations
 import os
 import base64
 import re
+import time
 import asyncio
 from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
 
 try:
     import httpx
@@ -21,8 +21,15 @@ except Exception:
     httpx = None
     retry = None
 
+from .shared_state import SharedStore, get_shared_store
+from .upstream_parser import UpstreamAudioParser, UPSTREAM_CHUNK_SIZE
+from .audio_profiles import AudioFormat, upstream_format, upstream_duration
+
 logger = logging.getLogger(__name__)
 
+# Clips larger than this are base64-encoded in a worker thread, off the event loop
+CODEC_OFFLOAD_BYTES = int(os.getenv("MINIMAX_CODEC_OFFLOAD_BYTES", "262144"))
+
 
 class MinimaxAPIError(Exception):
     """Custom exception for MiniMax API errors."""
@@ -40,7 +47,11 @@ class CircuitBreakerOpen(Exception):
 
 class CircuitBreaker:
     """
-    Simple circuit breaker implementation.
+    Circuit breaker whose state lives in the shared store.
+    
+    All worker processes record failures against the same counter, so the
+    breaker opens for every worker at once, and exactly one worker gets the
+    HALF_OPEN probe after the timeout.
     
     States:
     - CLOSED: Normal operation
@@ -48,51 +59,65 @@ class CircuitBreaker:
     - HALF_OPEN: Testing if service recovered
     """
     
-    def __init__(self, failure_threshold: int = 5, timeout: int = 60):
+    def __init__(self, failure_threshold: int = 5, timeout: int = 60,
+                 name: str = "minimax", store: Optional[SharedStore] = None):
         """
         Initialize circuit breaker.
         
         Args:
             failure_threshold: Number of failures before opening
             timeout: Seconds to wait before trying again
+            name: Key namespace in the shared store
+            store: Shared store (default: process-wide store from SHARED_STATE_URL)
         """
         self.failure_threshold = failure_threshold
         self.timeout = timeout
-        self.failure_count = 0
-        self.last_failure_time = None
-        self.state = "CLOSED"
+        self.store = store or get_shared_store()
+        self._failures_key = f"cb:{name}:failures"
+        self._opened_key = f"cb:{name}:opened_at"
+        self._probe_key = f"cb:{name}:probe"
+    
+    @property
+    def failure_count(self) -> int:
+        return int(self.store.get(self._failures_key) or 0)
+    
+    @property
+    def state(self) -> str:
+        opened_at = self.store.get(self._opened_key)
+        if opened_at is None:
+            return "CLOSED"
+        if time.time() - float(opened_at) >= self.timeout:
+            return "HALF_OPEN"
+        return "OPEN"
     
     def record_success(self):
         """Record successful request."""
-        self.failure_count = 0
-        self.state = "CLOSED"
+        self.store.delete(self._failures_key)
+        self.store.delete(self._opened_key)
+        self.store.delete(self._probe_key)
     
     def record_failure(self):
         """Record failed request."""
-        self.failure_count += 1
-        self.last_failure_time = datetime.utcnow()
+        failures = self.store.incr(self._failures_key, ttl=self.timeout * 2)
         
-        if self.failure_count >= self.failure_threshold:
-            self.state = "OPEN"
-            logger.warning(f"Circuit breaker OPEN after {self.failure_count} failures")
+        if failures >= self.failure_threshold or self.store.get(self._opened_key) is not None:
+            # Failed HALF_OPEN probes restart the open period
+            self.store.set(self._opened_key, str(time.time()))
+            self.store.delete(self._probe_key)
+            logger.warning(f"Circuit breaker OPEN after {failures} failures")
     
     def can_execute(self) -> bool:
         """Check if request can be executed."""
-        if self.state == "CLOSED":
+        state = self.state
+        if state == "CLOSED":
             return True
         
-        if self.state == "OPEN":
-            # Check if timeout has passed
-            if self.last_failure_time:
-                elapsed = (datetime.utcnow() - self.last_failure_time).total_seconds()
-                if elapsed >= self.timeout:
-                    self.state = "HALF_OPEN"
-                    logger.info("Circuit breaker entering HALF_OPEN state")
-                    return True
-            return False
-        
-        # HALF_OPEN state - allow one request
-        return True
+        if state == "HALF_OPEN":
+            # Only one request across all workers gets to probe
+            if self.store.add(self._probe_key, "1", ttl=self.timeout):
+                logger.info("Circuit breaker entering HALF_OPEN state")
+                return True
+        return False
 
 
 class MinimaxClient:
@@ -230,6 +255,7 @@ class MinimaxClient:
         speed: float = 1.0,
         pitch: int = 0,
         emotion: str = "neutral",
+        audio_format: Optional[AudioFormat] = None,
     ) -> Dict[str, Any]:
         """
         Convert text to speech using MiniMax API (async with retries).
@@ -241,13 +267,15 @@ class MinimaxClient:
             speed: Speech speed (0.5-2.0)
             pitch: Voice pitch (-12 to 12)
             emotion: Emotion
+            audio_format: Output format sent as ``audio_setting``
             
         Returns:
             dict with keys:
-                - audio_data: bytes of MP3 audio
+                - audio_data: the audio (a bytearray, decoded in place)
                 - audio_base64: base64-encoded audio
-                - duration_seconds: estimated duration
+                - duration_seconds: duration reported by MiniMax (else estimated)
                 - sample_rate: audio sample rate
+                - audio_format: the ``AudioFormat`` MiniMax produced
                 
         Raises:
             MinimaxAPIError: If API request fails
@@ -280,23 +308,31 @@ class MinimaxClient:
                 "emotion": emotion,
             },
         }
+        requested_format = audio_format or AudioFormat()
+        if audio_format is not None:
+            payload["audio_setting"] = audio_format.audio_setting()
         
         try:
             logger.info(f"Calling MiniMax API: {len(text)} chars, voice={voice_id}, model={model}")
             
-            response = await self.client.post(url, headers=headers, json=payload)
-            
-            # Check HTTP status
-            if response.status_code != 200:
-                error_detail = response.text[:200] if response.text else "No details"
-                self.circuit_breaker.record_failure()
-                raise MinimaxAPIError(
-                    response.status_code,
-                    f"HTTP {response.status_code}",
-                    error_detail
-                )
-            
-            data = response.json()
+            # Stream the body through the parser: the hex is decoded chunk by
+            # chunk into a preallocated buffer and never held as one string
+            async with self.client.stream("POST", url, headers=headers, json=payload) as response:
+                # Check HTTP status
+                if response.status_code != 200:
+                    await response.aread()
+                    error_detail = response.text[:200] if response.text else "No details"
+                    self.circuit_breaker.record_failure()
+                    raise MinimaxAPIError(
+                        response.status_code,
+                        f"HTTP {response.status_code}",
+                        error_detail
+                    )
+                
+                parser = UpstreamAudioParser(int(response.headers.get("Content-Length") or 0))
+                async for chunk in response.aiter_bytes(UPSTREAM_CHUNK_SIZE):
+                    parser.feed(chunk)
+                data, audio_bytes = parser.close()
             
             # Check MiniMax API response status
             base_resp = data.get("base_resp", {})
@@ -318,24 +354,23 @@ class MinimaxClient:
                 readable_msg = error_messages.get(status_code, status_msg)
                 raise MinimaxAPIError(status_code, readable_msg, data)
             
-            # Extract audio data
-            audio_hex = data.get("data", {}).get("audio")
-            if not audio_hex:
+            if not audio_bytes:
                 self.circuit_breaker.record_failure()
                 raise MinimaxAPIError(500, "No audio data in response", data)
             
-            # Decode hex to bytes
-            try:
-                audio_bytes = bytes.fromhex(audio_hex)
-            except ValueError as e:
-                self.circuit_breaker.record_failure()
-                raise MinimaxAPIError(500, f"Invalid audio hex format: {e}", audio_hex[:100])
-            
-            audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
+            if len(audio_bytes) > CODEC_OFFLOAD_BYTES:
+                audio_base64 = await asyncio.to_thread(base64.b64encode, audio_bytes)
+            else:
+                audio_base64 = base64.b64encode(audio_bytes)
+            audio_base64 = audio_base64.decode("ascii")
             
-            # Estimate duration (rough estimate: ~150 words per minute)
-            word_count = len(text.split())
-            estimated_duration = (word_count / 150) * 60 / speed
+            extra_info = data.get("extra_info")
+            actual_format = upstream_format(extra_info, requested_format)
+            estimated_duration = upstream_duration(extra_info)
+            if estimated_duration is None:
+                # Estimate duration (rough estimate: ~150 words per minute)
+                word_count = len(text.split())
+                estimated_duration = (word_count / 150) * 60 / speed
             
             # Record success
             self.circuit_breaker.record_success()
@@ -346,7 +381,8 @@ class MinimaxClient:
                 "audio_data": audio_bytes,
                 "audio_base64": audio_base64,
                 "duration_seconds": estimated_duration,
-                "sample_rate": 32000,  # Default MiniMax sample rate
+                "sample_rate": actual_format.sample_rate,
+                "audio_format": actual_format,
             }
             
         except httpx.TimeoutException:
@@ -4,21 +4,28 @@ from datetime import datetime
 
 try:
     from sqlalchemy.orm import declarative_base, relationship
+    from sqlalchemy.ext.hybrid import hybrid_property
     from sqlalchemy import (
         Column, Integer, String, DateTime, Boolean, Float, 
-        ForeignKey, Text, Enum as SQLEnum
+        ForeignKey, Text, Index, Enum as SQLEnum, case, literal
     )
     import enum
 except Exception:
     declarative_base = lambda: None  # type: ignore
     relationship = None
+    hybrid_property = property
     Column = Integer = String = DateTime = Boolean = Float = None
-    ForeignKey = Text = SQLEnum = None
+    ForeignKey = Text = Index = SQLEnum = case = literal = None
     enum = None
 
 Base = declarative_base() if callable(declarative_base) else None
 
 
+def billing_cycle(now: datetime = None) -> str:
+    """Billing cycle (UTC calendar month) containing ``now``, as ``YYYY-MM``."""
+    return (now or datetime.utcnow()).strftime("%Y-%m")
+
+
 class Plan(enum.Enum if enum else object):
     """Billing plan tiers."""
     FREE = "free"
@@ -45,33 +52,58 @@ class UsageStatus(enum.Enum if enum else object):
 class User(Base if Base else object):
     """User account with API key and quota management."""
     __tablename__ = "users"
+    # Admin listing: keyset pages in id order, narrowed by plan or active flag
+    __table_args__ = (
+        Index("ix_users_plan_id", "plan", "id"),
+        Index("ix_users_is_active_id", "is_active", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     email = Column(String(255), unique=True, index=True, nullable=False)
-    api_key_hash = Column(String(64), unique=True, nullable=False)  # SHA256 hash
+    # Public key ID from "odk_<prefix>_<secret>" keys; NULL for legacy keys
+    api_key_prefix = Column(String(16), unique=True, index=True, nullable=True)
+    # Salted PBKDF2 ("pbkdf2_sha256$...") or legacy unsalted SHA-256 hex
+    api_key_hash = Column(String(128), unique=True, nullable=False)
     plan = Column(SQLEnum(Plan), default=Plan.FREE, nullable=False)
     quota_seconds = Column(Float, default=600.0, nullable=False)  # 10 min for free
     used_seconds = Column(Float, default=0.0, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Billing cycle ("YYYY-MM") whose quota reset this user has received
+    last_reset_cycle = Column(String(7), default=billing_cycle, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationships
     usage_logs = relationship("Usage", back_populates="user", cascade="all, delete-orphan")
 
-    @property
+    @hybrid_property
     def remaining_seconds(self) -> float:
         """Calculate remaining quota."""
         return max(0.0, self.quota_seconds - self.used_seconds)
 
-    @property
+    @remaining_seconds.expression
+    def remaining_seconds(cls):
+        return case(
+            (cls.used_seconds < cls.quota_seconds, cls.quota_seconds - cls.used_seconds),
+            else_=literal(0.0),
+        )
+
+    @hybrid_property
     def quota_percentage_used(self) -> float:
         """Percentage of quota consumed."""
         if self.quota_seconds == 0:
             return 100.0
         return min(100.0, (self.used_seconds / self.quota_seconds) * 100)
 
+    @quota_percentage_used.expression
+    def quota_percentage_used(cls):
+        return case(
+            (cls.quota_seconds <= 0, literal(100.0)),
+            (cls.used_seconds >= cls.quota_seconds, literal(100.0)),
+            else_=cls.used_seconds * 100.0 / cls.quota_seconds,
+        )
+
 
 class Voice(Base if Base else object):
     """Voice mapping between friendly names and MiniMax voice IDs."""
@@ -86,6 +118,7 @@ class Voice(Base if Base else object):
     is_cloned = Column(Boolean, default=False, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationships
     usage_logs = relationship("Usage", back_populates="voice")
@@ -105,11 +138,44 @@ class Usage(Base if Base else object):
     model_used = Column(String(50), nullable=True)  # e.g., "speech-02-hd"
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
+    # Per-user history newest-first, for keyset pagination (migration 0001)
+    __table_args__ = (
+        Index("ix_usage_logs_user_id_timestamp", user_id, timestamp.desc(), id.desc()),
+    )
+
     # Relationships
     user = relationship("User", back_populates="usage_logs")
     voice = relationship("Voice", back_populates="usage_logs")
 
 
+class UsageRollup(Base if Base else object):
+    """Daily aggregate of compacted usage logs (see src/retention.py)."""
+    __tablename__ = "usage_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    voice_id = Column(Integer, nullable=True)
+    model_used = Column(String(50), nullable=True)
+    status = Column(SQLEnum(UsageStatus), nullable=False)
+    day = Column(DateTime, nullable=False, index=True)  # UTC midnight of the bucket
+    request_count = Column(Integer, default=0, nullable=False)
+    text_length_total = Column(Integer, default=0, nullable=False)
+    audio_seconds_total = Column(Float, default=0.0, nullable=False)
+
+    # One row per bucket, so compaction can increment in place (migration 0006)
+    __table_args__ = (
+        Index("ux_usage_rollups_key", user_id, voice_id, model_used, status, day, unique=True),
+    )
+
+
+class SchemaMigration(Base if Base else object):
+    """Applied schema migrations (see src/migrations.py)."""
+    __tablename__ = "schema_migrations"
+
+    name = Column(String(100), primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 # Plan quotas configuration (not a DB table, just reference)
 PLAN_CONFIGS = {
     Plan.FREE: {
@@ -117,23 +183,27 @@ PLAN_CONFIGS = {
         "quota_seconds": 600,  # 10 minutes
         "rpm": 10,
         "max_streams": 1,
+        "audio_profile": "web",  # default output format (audio_profiles.py)
     },
     Plan.BASIC: {
         "price": 19,
         "quota_seconds": 3600,  # 60 minutes
         "rpm": 30,
         "max_streams": 2,
+        "audio_profile": "web",
     },
     Plan.PRO: {
         "price": 70,
         "quota_seconds": 14400,  # 240 minutes
         "rpm": 60,
         "max_streams": 5,
+        "audio_profile": "default",
     },
     Plan.ENTERPRISE: {
         "price": 180,
         "quota_seconds": 36000,  # 600 minutes (customizable)
         "rpm": 120,
         "max_streams": 10,
+        "audio_profile": "default",
     },
 }
@@ -0,0 +1,57 @@
+"""Opaque keyset cursors for paginated listings.
+
+A cursor encodes the sort key of the last row on a page, e.g.
+``(timestamp, id)``, so the next page is fetched with a range predicate on an
+index instead of ``OFFSET`` and costs the same at page 1000 as at page 1.
+"""
+from __future__ import annotations
+import json
+import base64
+from datetime import datetime
+from typing import Any, List
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded."""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row on a page as a URL-safe token."""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Args:
+        token: Cursor token from a previous page
+        size: Expected number of key values
+
+    Raises:
+        InvalidCursor: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong cursor size")
+        return [_decode_value(v) for v in values]
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {token!r}") from e
@@ -0,0 +1,177 @@
+"""Bulk user provisioning.
+
+``provision_users`` validates every row up front, checks all emails against
+the database in a handful of ``IN`` queries, inserts the valid rows in
+batches of ``BULK_INSERT_BATCH_SIZE`` inside a single transaction, and only
+then hands back the one-time API keys. Rows that fail validation or collide
+with an existing (or earlier, in-request) email are reported individually;
+they never abort the rest of the batch. That includes emails a concurrent
+request registers between the check and the insert: the unique constraint
+rejects the transaction, the emails are re-checked, and the remaining rows
+are inserted again.
+
+Results are serialized as NDJSON by ``iter_ndjson`` so large batches stream
+back without building one big response body.
+"""
+from __future__ import annotations
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List
+
+try:
+    from pydantic import ValidationError
+    from sqlalchemy import insert, select
+    from sqlalchemy.exc import IntegrityError
+except Exception:
+    ValidationError = IntegrityError = Exception
+    insert = select = None
+
+from .api_keys import issue_api_key, user_key_token
+from .key_filter import active_keys
+from .models import User, Plan, PLAN_CONFIGS
+from .schemas import UserCreate
+
+logger = logging.getLogger(__name__)
+
+BULK_INSERT_BATCH_SIZE = int(os.getenv("BULK_INSERT_BATCH_SIZE", "500"))
+MAX_BULK_USERS = int(os.getenv("MAX_BULK_USERS", "10000"))
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+EMAIL_LOOKUP_CHUNK = 500
+# PBKDF2 releases the GIL, so key hashing spreads across cores
+KEY_HASH_WORKERS = int(os.getenv("KEY_HASH_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first.get("loc", ())) or "row"
+    return f"{field}: {first.get('msg', 'invalid value')}"
+
+
+def existing_emails(db, emails: Iterable[str]) -> set:
+    """Return the subset of ``emails`` already registered."""
+    emails = list(emails)
+    found = set()
+    for chunk in _chunks(emails, EMAIL_LOOKUP_CHUNK):
+        found.update(db.execute(select(User.email).where(User.email.in_(chunk))).scalars())
+    return found
+
+
+def provision_users(db, rows: List[Dict[str, Any]], batch_size: int = None) -> List[Dict[str, Any]]:
+    """
+    Create users in bulk.
+
+    Args:
+        db: Database session (committed on success, rolled back on error)
+        rows: Raw user dicts (``name``, ``email``, optional ``plan``)
+        batch_size: Rows per INSERT statement
+
+    Returns:
+        list: One result per input row, in input order. Created rows carry
+        ``user_id`` and the plain ``api_key``; rejected rows carry ``error``.
+    """
+    batch_size = batch_size or BULK_INSERT_BATCH_SIZE
+    results: List[Dict[str, Any]] = [None] * len(rows)
+    valid = []
+    seen = set()
+
+    for index, raw in enumerate(rows):
+        try:
+            user = UserCreate.model_validate(raw)
+        except ValidationError as e:
+            email = raw.get("email") if isinstance(raw, dict) else None
+            results[index] = {"row": index, "email": email, "error": _validation_message(e)}
+            continue
+        if user.email in seen:
+            results[index] = {"row": index, "email": user.email, "error": "Duplicate email in request"}
+            continue
+        seen.add(user.email)
+        valid.append((index, user))
+
+    taken = existing_emails(db, seen)
+    accepted = []
+    for index, user in valid:
+        if user.email in taken:
+            results[index] = {"row": index, "email": user.email, "error": "Email already registered"}
+            continue
+        accepted.append((index, user))
+
+    with ThreadPoolExecutor(max_workers=KEY_HASH_WORKERS) as pool:
+        keys = list(pool.map(lambda _: issue_api_key(), accepted))
+
+    to_insert = []
+    for (index, user), (api_key, key_id, key_hash) in zip(accepted, keys):
+        plan = Plan[user.plan.upper()]
+        to_insert.append((index, api_key, {
+            "name": user.name,
+            "email": user.email,
+            "api_key_prefix": key_id,
+            "api_key_hash": key_hash,
+            "plan": plan,
+            "quota_seconds": PLAN_CONFIGS[plan]["quota_seconds"],
+            "used_seconds": 0.0,
+        }))
+
+    while True:
+        try:
+            for batch in _chunks(to_insert, batch_size):
+                ids = db.execute(
+                    insert(User).returning(User.id, sort_by_parameter_order=True),
+                    [values for _, _, values in batch],
+                ).scalars().all()
+                for (index, api_key, values), user_id in zip(batch, ids):
+                    results[index] = {
+                        "row": index,
+                        "email": values["email"],
+                        "user_id": user_id,
+                        "plan": values["plan"].value,
+                        "api_key": api_key,
+                    }
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            # A concurrent request registered some of these emails after the check
+            raced = existing_emails(db, [values["email"] for _, _, values in to_insert])
+            if not raced:
+                raise
+            for index, _, values in to_insert:
+                if values["email"] in raced:
+                    results[index] = {"row": index, "email": values["email"], "error": "Email already registered"}
+            to_insert = [item for item in to_insert if item[2]["email"] not in raced]
+        except Exception:
+            db.rollback()
+            raise
+    if to_insert:
+        active_keys.add(*[
+            user_key_token(values["api_key_prefix"], values["api_key_hash"]) for _, _, values in to_insert
+        ])
+
+    logger.info(f"Bulk provisioning: {len(to_insert)} created, {len(rows) - len(to_insert)} rejected")
+    return results
+
+
+def iter_ndjson(results: List[Dict[str, Any]]) -> Iterator[bytes]:
+    """Yield one JSON line per result, then a summary line."""
+    created = 0
+    for result in results:
+        if "error" not in result:
+            created += 1
+        yield json.dumps(result).encode() + b"\n"
+    summary = {"summary": {"total": len(results), "created": created, "failed": len(results) - created}}
+    yield json.dumps(summary).encode() + b"\n"
+
+
+__all__ = [
+    "BULK_INSERT_BATCH_SIZE",
+    "MAX_BULK_USERS",
+    "existing_emails",
+    "provision_users",
+    "iter_ndjson",
+]
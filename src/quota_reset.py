@@ -0,0 +1,126 @@
+"""Billing-cycle quota resets in set-based SQL.
+
+At the start of each (UTC calendar month) billing cycle every user's
+``used_seconds`` goes back to 0 and ``quota_seconds`` is reset to the
+plan's ``PLAN_CONFIGS`` value. The reset is a chunked
+``UPDATE ... WHERE id BETWEEN ...`` (``QUOTA_RESET_CHUNK_SIZE`` ids per
+statement, committed per chunk) rather than a round trip per user.
+
+Each user records the cycle it was last reset for in ``last_reset_cycle``,
+so re-running a cycle (after a crash, or from two workers) only touches
+users not yet reset. New users start stamped with the current cycle.
+Requests charge usage with an increment in SQL (``main.charge_user``), so
+a charge landing mid-reset counts against the new cycle instead of
+writing the old total back.
+
+Run manually with ``python -m src.quota_reset [YYYY-MM]``.
+"""
+from __future__ import annotations
+import os
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+try:
+    from sqlalchemy import update, select, func, case, or_
+except Exception:
+    update = select = func = case = or_ = None
+
+from .models import User, PLAN_CONFIGS, billing_cycle
+from .shared_state import SharedStore, get_shared_store
+
+logger = logging.getLogger(__name__)
+
+QUOTA_RESET_CHUNK_SIZE = int(os.getenv("QUOTA_RESET_CHUNK_SIZE", "5000"))
+# How often the scheduler checks whether a new cycle has started
+QUOTA_RESET_CHECK_SECONDS = float(os.getenv("QUOTA_RESET_CHECK_SECONDS", "300"))
+# Marks a cycle as fully reset so later checks skip the table scan
+CYCLE_DONE_TTL = 40 * 24 * 3600
+
+
+def plan_quota_expression():
+    """``CASE plan WHEN ... THEN <quota> END`` built from ``PLAN_CONFIGS``."""
+    return case(
+        *[(User.plan == plan, config["quota_seconds"]) for plan, config in PLAN_CONFIGS.items()],
+        else_=User.quota_seconds,
+    )
+
+
+def reset_quotas(db, cycle: Optional[str] = None, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Reset usage and reapply plan quotas for every user not yet reset in ``cycle``.
+
+    Args:
+        db: Database session (committed after each chunk)
+        cycle: Billing cycle ``YYYY-MM`` (default: current)
+        chunk_size: Width of the id range updated per statement
+
+    Returns:
+        dict: ``cycle``, ``users_reset`` and ``chunks`` executed
+    """
+    cycle = cycle or billing_cycle()
+    chunk_size = chunk_size or QUOTA_RESET_CHUNK_SIZE
+    low, high = db.execute(select(func.min(User.id), func.max(User.id))).one()
+    users_reset = chunks = 0
+    if low is None:
+        return {"cycle": cycle, "users_reset": 0, "chunks": 0}
+
+    quota = plan_quota_expression()
+    start = low
+    while start <= high:
+        end = start + chunk_size - 1
+        result = db.execute(
+            update(User)
+            .where(
+                User.id.between(start, end),
+                or_(User.last_reset_cycle.is_(None), User.last_reset_cycle < cycle),
+            )
+            .values(
+                used_seconds=0.0,
+                quota_seconds=quota,
+                last_reset_cycle=cycle,
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        users_reset += result.rowcount
+        chunks += 1
+        start = end + 1
+
+    logger.info(f"Quota reset for cycle {cycle}: {users_reset} users in {chunks} chunks")
+    return {"cycle": cycle, "users_reset": users_reset, "chunks": chunks}
+
+
+def reset_current_cycle(session_factory, store: Optional[SharedStore] = None) -> Optional[Dict[str, Any]]:
+    """
+    Scheduler job: reset quotas once per billing cycle.
+
+    Returns:
+        dict or None: ``reset_quotas`` result, or None if the cycle was done
+    """
+    store = store or get_shared_store()
+    cycle = billing_cycle()
+    done_key = f"quota_reset:done:{cycle}"
+    if store.get(done_key):
+        return None
+    db = session_factory()
+    try:
+        result = reset_quotas(db, cycle)
+    finally:
+        db.close()
+    store.set(done_key, "1", ttl=CYCLE_DONE_TTL)
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+    from .database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        result = reset_quotas(db, sys.argv[1] if len(sys.argv) > 1 else None)
+    finally:
+        db.close()
+    print(f"✅ Reset {result['users_reset']} users for billing cycle {result['cycle']}")
@@ -0,0 +1,169 @@
+"""Read replica routing for read-only sessions.
+
+``DATABASE_REPLICA_URLS`` lists the replicas (comma-separated URLs), each
+with its own pool. ``RoutingSession`` sends a session's reads to a replica
+chosen by ``ReplicaRouter`` and everything else to the primary.
+"""
+from __future__ import annotations
+import os
+import time
+import logging
+import itertools
+import threading
+from typing import List, Optional, Sequence
+
+from sqlalchemy import create_engine, text, Select, Insert, Update, Delete
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Optional read replicas (comma-separated URLs), each with its own pool
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+# Replicas further behind than this are skipped until they catch up
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "2"))
+
+# Seconds since the last replayed transaction; 0 when the replica has
+# replayed everything it received (an idle primary is not lag)
+REPLICA_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    """A read replica engine and its last measured lag."""
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.lag: Optional[float] = None  # None: unknown or unreachable
+        self.checked_at = float("-inf")
+
+
+class ReplicaRouter:
+    """
+    Picks a replica for read-only sessions, skipping lagging ones.
+    
+    Lag is re-measured at most every ``check_interval`` seconds, by whichever
+    thread gets there first; others keep using the previous measurement.
+    A replica that is unreachable or more than ``max_lag`` seconds behind is
+    skipped, and with no usable replica reads fall back to the primary.
+    """
+
+    def __init__(self, replicas: List[Replica], max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = REPLICA_LAG_CHECK_SECONDS):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+
+    def measure_lag(self, replica: Replica) -> Optional[float]:
+        try:
+            with replica.engine.connect() as conn:
+                lag = conn.execute(text(REPLICA_LAG_SQL)).scalar()
+            return float(lag) if lag is not None else None
+        except Exception as e:
+            logger.warning(f"Replica {replica.name} lag check failed: {type(e).__name__}")
+            return None
+
+    def refresh(self, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            for replica in self.replicas:
+                if now - replica.checked_at >= self.check_interval:
+                    replica.lag = self.measure_lag(replica)
+                    replica.checked_at = now
+        finally:
+            self._lock.release()
+
+    def choose(self):
+        """Engine of a healthy replica (round-robin), or None for the primary."""
+        if not self.replicas:
+            return None
+        self.refresh()
+        healthy = [r for r in self.replicas if r.lag is not None and r.lag <= self.max_lag]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)].engine
+
+    def status(self) -> List[dict]:
+        return [
+            {"name": r.name, "lag_seconds": r.lag,
+             "healthy": r.lag is not None and r.lag <= self.max_lag}
+            for r in self.replicas
+        ]
+
+
+def _is_write(clause) -> bool:
+    if clause is None:
+        return False
+    if isinstance(clause, (Insert, Update, Delete)):
+        return True
+    if isinstance(clause, Select):
+        return clause._for_update_arg is not None
+    # Raw SQL: can't tell, so it goes to the primary
+    return True
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from a replica and writes to the primary.
+    
+    The replica is chosen once per session so a request sees one consistent
+    snapshot. Flushes, DML, ``SELECT ... FOR UPDATE`` and raw SQL go to the
+    primary, and from then on every read does too, so the session reads its
+    own writes. Call ``use_primary()`` to pin it up front.
+    """
+
+    def __init__(self, *args, router: Optional[ReplicaRouter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self._replica = None
+        self._pinned = router is None
+
+    def use_primary(self) -> None:
+        self._pinned = True
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self._pinned or self._flushing or _is_write(clause):
+            self._pinned = True
+            return primary
+        if self._replica is None:
+            self._replica = self.router.choose() or primary
+        return self._replica
+
+
+def create_replica_router(urls: Sequence[str] = DATABASE_REPLICA_URLS, echo: bool = False) -> Optional[ReplicaRouter]:
+    """A router over one pooled engine per URL, or None without replicas."""
+    if not urls:
+        return None
+    return ReplicaRouter([
+        Replica(f"replica{i}", create_engine(
+            url,
+            poolclass=QueuePool,
+            pool_size=int(os.getenv("DB_REPLICA_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_REPLICA_MAX_OVERFLOW", "20")),
+            pool_timeout=30,
+            pool_recycle=3600,
+            pool_pre_ping=True,
+            echo=echo,
+        ))
+        for i, url in enumerate(urls)
+    ])
+
+
+__all__ = [
+    "DATABASE_REPLICA_URLS",
+    "Replica",
+    "ReplicaRouter",
+    "RoutingSession",
+    "create_replica_router",
+]
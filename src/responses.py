@@ -0,0 +1,103 @@
+"""JSON envelopes for audio responses that never hold the whole payload.
+
+``json_envelope`` yields a JSON object whose first field's string value
+comes from an iterator of already-encoded chunks, so a base64 clip can be
+streamed straight from a file into the response body.
+
+``AudioJSONResponse`` is the in-memory fast path: the base64 bytes are
+spliced between a small prefix and suffix and sent as three body messages.
+Nothing re-validates, re-scans, escapes or copies the (already JSON-safe)
+base64 string, unlike a pydantic model run through the JSON encoder.
+
+``AudioBytesResponse`` sends a clip buffer (the client's ``bytearray``) as
+the body as it is; ``Response`` would ``render`` it, which takes only
+``bytes`` or ``str`` in the pinned starlette and would copy it in newer ones.
+"""
+from __future__ import annotations
+import json
+import base64
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Union
+
+try:
+    from starlette.responses import Response
+except Exception:
+    Response = object
+
+# Multiple of 3, so each chunk base64-encodes on its own (no padding mid-stream)
+BASE64_CHUNK_SIZE = 3 * 16384
+
+
+def iter_file(path: str, chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+
+def iter_base64(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Base64 of the concatenated ``chunks``, whatever their sizes."""
+    carry = b""
+    for chunk in chunks:
+        data = carry + chunk
+        usable = len(data) - len(data) % 3
+        carry = data[usable:]
+        if usable:
+            yield base64.b64encode(data[:usable])
+    if carry:
+        yield base64.b64encode(carry)
+
+
+def json_envelope(field: str, value_chunks: Iterable[bytes], fields: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Yield ``{"<field>": "<value_chunks...>", **fields}`` as compact JSON.
+
+    The chunks are spliced in as they are: they must already be valid JSON
+    string content (base64 is).
+    """
+    opening = json.dumps({field: ""}, separators=(",", ":"))[:-2].encode()  # {"field":"
+    rest = json.dumps({field: "", **fields}, separators=(",", ":")).encode()
+    yield opening
+    yield from value_chunks
+    yield rest[len(opening):]
+
+
+class AudioJSONResponse(Response):
+    """``{"<field>": "<value>", **fields}`` sent as spliced parts, never joined."""
+
+    media_type = "application/json"
+
+    def __init__(self, field: str, value: bytes, fields: Dict[str, Any], status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, background=None):
+        self.status_code = status_code
+        self.background = background
+        self.parts = list(json_envelope(field, (value,), fields))
+        self.body = b""
+        self.init_headers(headers)
+        self.headers["content-length"] = str(sum(len(part) for part in self.parts))
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        last = len(self.parts) - 1
+        for i, part in enumerate(self.parts):
+            await send({"type": "http.response.body", "body": part, "more_body": i < last})
+        if self.background is not None:
+            await self.background()
+
+
+class AudioBytesResponse(Response):
+    """A ``bytes`` or ``bytearray`` body sent in one message, without a copy."""
+
+    def __init__(self, content: Union[bytes, bytearray], media_type: str, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, background=None):
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = background
+        self.content = content
+        self.body = b""
+        self.init_headers(headers)
+        self.headers["content-length"] = str(len(content))
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": self.content})
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,260 @@
+"""Usage-log retention: compaction into daily rollups, batched deletes and partitioning.
+
+Raw ``usage_logs`` rows older than ``USAGE_RETENTION_DAYS`` are folded into
+``usage_rollups`` (one row per user/voice/model/status/day) and deleted in
+batches of ``USAGE_RETENTION_BATCH_SIZE``, committing after each batch so no
+single transaction holds the write lock for long. The scheduler runs this
+every ``USAGE_RETENTION_INTERVAL_SECONDS``; overlapping runs (the admin
+endpoint, the CLI, a stale job lock) are safe: rollups are incremented in
+place against a unique key, and a batch whose rows another run already
+deleted is rolled back instead of being counted twice.
+
+On PostgreSQL, ``ensure_usage_partitions`` creates monthly range partitions
+for a ``usage_logs`` table declared ``PARTITION BY RANGE (timestamp)``. No
+migration creates such a table: the primary key would have to become
+``(id, timestamp)``, which is a manual conversion. Even on a partitioned
+table compaction still deletes row by row; expired partitions are left
+empty, not dropped.
+
+Run manually with ``python -m src.retention``.
+"""
+from __future__ import annotations
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from sqlalchemy import select, insert, update, delete, text
+    from sqlalchemy.exc import IntegrityError
+except Exception:
+    select = insert = update = delete = text = None
+    IntegrityError = Exception
+
+from .models import Usage, UsageRollup
+from .usage_archive import USAGE_ARCHIVE_LOOKBACK_DAYS
+
+logger = logging.getLogger(__name__)
+
+USAGE_RETENTION_DAYS = int(os.getenv("USAGE_RETENTION_DAYS", "90"))
+USAGE_RETENTION_BATCH_SIZE = int(os.getenv("USAGE_RETENTION_BATCH_SIZE", "5000"))
+USAGE_RETENTION_INTERVAL_SECONDS = float(os.getenv("USAGE_RETENTION_INTERVAL_SECONDS", "86400"))
+# Batches per /admin/usage/compact call; the scheduled job runs until done
+USAGE_RETENTION_REQUEST_BATCHES = int(os.getenv("USAGE_RETENTION_REQUEST_BATCHES", "20"))
+MAX_RETENTION_REQUEST_BATCHES = 200
+# The archive re-reads raw rows this far back, so they must outlive it
+MIN_RETENTION_DAYS = USAGE_ARCHIVE_LOOKBACK_DAYS
+USAGE_PARTITION_MONTHS_AHEAD = int(os.getenv("USAGE_PARTITION_MONTHS_AHEAD", "2"))
+
+
+def _day(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def retention_cutoff(now: Optional[datetime] = None, days: Optional[int] = None) -> datetime:
+    """Return the timestamp before which raw usage rows are compacted.
+
+    The cutoff is aligned to UTC midnight so a day is only ever rolled up once.
+    Raises ``ValueError`` for windows shorter than ``MIN_RETENTION_DAYS``.
+    """
+    now = now or datetime.utcnow()
+    days = USAGE_RETENTION_DAYS if days is None else days
+    if days < MIN_RETENTION_DAYS:
+        raise ValueError(f"Retention must be at least {MIN_RETENTION_DAYS} days, got {days}")
+    return _day(now - timedelta(days=days))
+
+
+ROLLUP_KEY = ("user_id", "voice_id", "model_used", "status", "day")
+
+
+def _merge_rollups(db, buckets: Dict[Tuple, list]) -> None:
+    """Add per-batch aggregates onto rollup rows (or create them).
+
+    Increments are single UPDATE statements, so concurrent runs never
+    overwrite each other's totals; a row created concurrently surfaces as an
+    ``IntegrityError`` on the unique key and is incremented instead.
+    """
+    for key, (count, text_total, audio_total) in buckets.items():
+        increment = (
+            update(UsageRollup)
+            .where(*(getattr(UsageRollup, name).is_not_distinct_from(value)
+                     for name, value in zip(ROLLUP_KEY, key)))
+            .values(
+                request_count=UsageRollup.request_count + count,
+                text_length_total=UsageRollup.text_length_total + text_total,
+                audio_seconds_total=UsageRollup.audio_seconds_total + audio_total,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if db.execute(increment).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(UsageRollup).values(
+                    **dict(zip(ROLLUP_KEY, key)),
+                    request_count=count,
+                    text_length_total=text_total,
+                    audio_seconds_total=audio_total,
+                ))
+        except IntegrityError:
+            db.execute(increment)
+
+
+def compact_usage_logs(
+    db,
+    cutoff: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Roll up and delete raw usage rows older than ``cutoff``.
+
+    Each batch selects at most ``batch_size`` of the oldest rows (walking the
+    timestamp index, so a batch spans few days), aggregates them, merges the aggregates into ``usage_rollups``,
+    deletes the raw rows and commits. Interrupting the job loses no data:
+    a batch is either fully rolled up and deleted or not touched at all.
+
+    Args:
+        db: Database session
+        cutoff: Rows with ``timestamp < cutoff`` are compacted (default: retention window)
+        batch_size: Rows per batch/transaction
+        max_batches: Stop after this many batches (None = until done)
+
+    Returns:
+        dict: ``rows_compacted``, ``batches``, ``cutoff``
+    """
+    cutoff = cutoff or retention_cutoff()
+    batch_size = batch_size or USAGE_RETENTION_BATCH_SIZE
+    rows_compacted = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        rows = db.execute(
+            select(
+                Usage.id, Usage.user_id, Usage.voice_id, Usage.model_used,
+                Usage.status, Usage.timestamp, Usage.text_length, Usage.audio_seconds,
+            )
+            .where(Usage.timestamp < cutoff)
+            .order_by(Usage.timestamp, Usage.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        buckets: Dict[Tuple, list] = {}
+        for row in rows:
+            key = (row.user_id, row.voice_id, row.model_used, row.status, _day(row.timestamp))
+            bucket = buckets.setdefault(key, [0, 0, 0.0])
+            bucket[0] += 1
+            bucket[1] += row.text_length or 0
+            bucket[2] += row.audio_seconds or 0.0
+
+        try:
+            _merge_rollups(db, buckets)
+            deleted = db.execute(
+                delete(Usage)
+                .where(Usage.id.in_([row.id for row in rows]))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if deleted != len(rows):
+                # Another run compacted some of these rows first and its
+                # rollups already count them; retry with what's left
+                db.rollback()
+                logger.info("Retention: batch raced another compaction run, retrying")
+                continue
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        rows_compacted += len(rows)
+        batches += 1
+        logger.info(f"Retention: compacted batch {batches} ({len(rows)} rows)")
+
+    return {"rows_compacted": rows_compacted, "batches": batches, "cutoff": cutoff}
+
+
+def reclaim_space(engine) -> None:
+    """
+    Return freed pages to the filesystem after large deletes.
+
+    SQLite: truncates the WAL and runs an incremental vacuum (effective when
+    the database uses ``auto_vacuum=INCREMENTAL``). PostgreSQL relies on
+    autovacuum, so this is a no-op there.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.exec_driver_sql("PRAGMA incremental_vacuum")
+
+
+def _month_start(ts: datetime) -> datetime:
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(ts: datetime) -> datetime:
+    return (ts.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def usage_partition_ddl(month: datetime, parent: str = "usage_logs") -> str:
+    """DDL for the monthly range partition of ``parent`` that contains ``month``."""
+    start = _month_start(month)
+    end = _next_month(start)
+    name = f"{parent}_y{start:%Y}m{start:%m}"
+    return (
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    )
+
+
+def ensure_usage_partitions(engine, months_ahead: Optional[int] = None, now: Optional[datetime] = None) -> int:
+    """
+    Create monthly partitions for the current month and ``months_ahead`` more.
+
+    Only applies to PostgreSQL when ``usage_logs`` has already been converted
+    to a partitioned table by hand (see the module docstring); otherwise it
+    does nothing.
+
+    Returns:
+        int: Number of partition DDL statements executed
+    """
+    if engine.dialect.name != "postgresql":
+        return 0
+    months_ahead = USAGE_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+
+    with engine.begin() as conn:
+        partitioned = conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'usage_logs'"
+        )).first()
+        if not partitioned:
+            logger.info("Retention: usage_logs is not partitioned, skipping partition maintenance")
+            return 0
+
+        month = _month_start(now or datetime.utcnow())
+        for _ in range(months_ahead + 1):
+            conn.execute(text(usage_partition_ddl(month)))
+            month = _next_month(month)
+    return months_ahead + 1
+
+
+def run_retention(engine, session_factory) -> Dict[str, Any]:
+    """Run the full retention cycle: partitions, compaction, space reclamation."""
+    ensure_usage_partitions(engine)
+    db = session_factory()
+    try:
+        result = compact_usage_logs(db)
+    finally:
+        db.close()
+    if result["rows_compacted"]:
+        reclaim_space(engine)
+    return result
+
+
+if __name__ == "__main__":
+    from .database import engine, SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    result = run_retention(engine, SessionLocal)
+    print(f"✅ Compacted {result['rows_compacted']} usage rows older than {result['cutoff']:%Y-%m-%d}")
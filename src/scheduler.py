@@ -0,0 +1,93 @@
+"""In-process scheduler for periodic maintenance jobs.
+
+Jobs run on one daemon thread per process. With several workers every
+process runs the scheduler, so each job run takes a lock in the shared store
+(``SHARED_STATE_URL``) first; only the worker holding it does the work.
+Jobs must still be idempotent: the lock expires after ``lock_ttl`` seconds in
+case its holder dies mid-run.
+
+Disable with ``SCHEDULER_ENABLED=false`` (e.g. when an external cron runs
+``python -m src.quota_reset`` instead).
+"""
+from __future__ import annotations
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from .shared_state import SharedStore, get_shared_store
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float
+    func: Callable[[], object]
+    lock_ttl: float
+    next_run: float = field(default=0.0)
+
+
+class Scheduler:
+    """Runs registered jobs every ``interval`` seconds, one worker at a time."""
+
+    def __init__(self, store: Optional[SharedStore] = None, tick: float = 1.0):
+        self._store = store
+        self.tick = tick
+        self.jobs: List[Job] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def store(self) -> SharedStore:
+        return self._store or get_shared_store()
+
+    def add_job(self, name: str, interval: float, func: Callable[[], object],
+                lock_ttl: Optional[float] = None) -> None:
+        self.jobs.append(Job(name, interval, func, lock_ttl or max(interval, 60.0)))
+
+    def run_pending(self, now: Optional[float] = None) -> List[str]:
+        """Run every due job whose lock can be taken; returns the names run."""
+        now = time.monotonic() if now is None else now
+        ran = []
+        for job in self.jobs:
+            if job.next_run > now:
+                continue
+            job.next_run = now + job.interval
+            lock_key = f"sched:{job.name}:lock"
+            if not self.store.add(lock_key, str(os.getpid()), ttl=job.lock_ttl):
+                continue
+            try:
+                job.func()
+                ran.append(job.name)
+            except Exception as e:
+                logger.error(f"Scheduled job {job.name} failed: {e}", exc_info=True)
+            finally:
+                self.store.delete(lock_key)
+        return ran
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.tick):
+                self.run_pending()
+
+        self._thread = threading.Thread(target=run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+scheduler = Scheduler()
@@ -1,7 +1,7 @@
 """Pydantic schemas for request/response validation."""
 from __future__ import annotations
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional, Union
 
 try:
     from pydantic import BaseModel, EmailStr, Field, ConfigDict
@@ -48,6 +48,18 @@ class UserCreateResponse(BaseModel):
     api_key: str  # Plain key, shown only once!
 
 
+class UserPage(BaseModel):
+    """One page of the admin user listing; pass ``next_cursor`` back for more."""
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+
+class BulkUserCreate(BaseModel):
+    """Schema for bulk user creation. Rows are validated one by one so a bad
+    row is reported instead of rejecting the whole request."""
+    users: List[Dict[str, Any]] = Field(..., min_length=1)
+
+
 class QuotaUpdate(BaseModel):
     """Schema for updating user quota."""
     quota_seconds: Optional[float] = Field(None, ge=0)
@@ -80,9 +92,21 @@ class VoiceResponse(BaseModel):
 
 
 # ==================== TTS Request/Response ====================
+class OutputFormat(BaseModel):
+    """Explicit MiniMax ``audio_setting``; ``bitrate`` applies to MP3 only."""
+    format: Literal["mp3", "wav", "flac"] = "mp3"
+    sample_rate: Literal[8000, 16000, 22050, 24000, 32000, 44100] = 32000
+    bitrate: Optional[Literal[32000, 64000, 128000, 256000]] = None
+    channels: Literal[1, 2] = 1
+
+
 class TTSRequest(BaseModel):
     """Schema for TTS generation request."""
     text: str = Field(..., min_length=1, max_length=5000)
+    text_type: str = Field(
+        default="text", pattern="^(text|ssml)$",
+        description="ssml: text is SSML (<break>, <prosody rate/pitch>, <voice>)"
+    )
     voice_name: Optional[str] = Field(None, description="Friendly voice name")
     model: str = Field(default="speech-02-turbo", pattern="^speech-0[12]-(hd|turbo).*$")
     speed: float = Field(default=1.0, ge=0.5, le=2.0)
@@ -91,13 +115,68 @@ class TTSRequest(BaseModel):
         default="neutral",
         pattern="^(neutral|happy|sad|angry|fearful|disgusted|surprised)$"
     )
+    delivery: str = Field(
+        default="inline", pattern="^(inline|url)$",
+        description="inline: audio_base64 in the response; url: stored, returned as audio_url"
+    )
+    output_format: Optional[Union[
+        Literal["studio", "default", "web", "whatsapp", "telephony"], OutputFormat
+    ]] = Field(None, description="Audio profile name or explicit format; defaults to the plan's profile")
+
+
+class DialogueTurn(BaseModel):
+    """One speaker turn of a dialogue."""
+    voice_name: Optional[str] = Field(None, description="Friendly voice name; defaults to the default voice")
+    text: str = Field(..., min_length=1, max_length=5000)
+    emotion: str = Field(
+        default="neutral",
+        pattern="^(neutral|happy|sad|angry|fearful|disgusted|surprised)$"
+    )
+    gap_ms: Optional[int] = Field(None, ge=0, le=10000, description="Silence after this turn (default: gap_ms)")
+
+
+class DialogueRequest(BaseModel):
+    """Schema for a multi-speaker dialogue, synthesized as one clip."""
+    turns: List[DialogueTurn] = Field(..., min_length=1, max_length=50)
+    model: str = Field(default="speech-02-turbo", pattern="^speech-0[12]-(hd|turbo).*$")
+    speed: float = Field(default=1.0, ge=0.5, le=2.0)
+    pitch: int = Field(default=0, ge=-12, le=12)
+    gap_ms: int = Field(default=400, ge=0, le=10000, description="Silence between turns")
+    delivery: str = Field(
+        default="inline", pattern="^(inline|url)$",
+        description="inline: audio_base64 in the response; url: stored, returned as audio_url"
+    )
+    output_format: Optional[Union[
+        Literal["studio", "default", "web", "whatsapp", "telephony"], OutputFormat
+    ]] = Field(None, description="Audio profile name or explicit mp3/wav format; defaults to the plan's profile")
+
+
+class TelephonyTTSRequest(BaseModel):
+    """One utterance on the ``/v1/tts/telephony`` WebSocket."""
+    text: str = Field(..., min_length=1, max_length=5000)
+    voice_name: Optional[str] = Field(None, description="Friendly voice name")
+    model: str = Field(default="speech-02-turbo", pattern="^speech-0[12]-(hd|turbo).*$")
+    speed: float = Field(default=1.0, ge=0.5, le=2.0)
+    pitch: int = Field(default=0, ge=-12, le=12)
+    emotion: str = Field(
+        default="neutral",
+        pattern="^(neutral|happy|sad|angry|fearful|disgusted|surprised)$"
+    )
+    encoding: Literal["mulaw", "alaw", "pcm"] = Field(
+        default="mulaw", description="G.711 mu-law/A-law (8 kHz) or 16-bit little-endian PCM"
+    )
+    sample_rate: Literal[8000, 16000] = 8000
 
 
 class TTSResponse(BaseModel):
     """Schema for TTS generation response."""
-    audio_base64: str
+    audio_base64: Optional[str] = None
+    audio_url: Optional[str] = None
     duration_seconds: float
+    format: str = "mp3"
     sample_rate: int
+    bitrate: Optional[int] = None
+    channels: int = 1
     voice_used: str
     text_length: int
     remaining_quota: float
@@ -124,3 +203,30 @@ class UsageLogResponse(BaseModel):
     timestamp: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UsageLogPage(BaseModel):
+    """One page of usage history; pass ``next_cursor`` back to get the next page."""
+    items: List[UsageLogResponse]
+    next_cursor: Optional[str] = None
+
+
+class QuotaResetResult(BaseModel):
+    """Result of a billing-cycle quota reset."""
+    cycle: str
+    users_reset: int
+    chunks: int
+
+
+class RetentionResult(BaseModel):
+    """Schema for a usage-log compaction run."""
+    rows_compacted: int
+    batches: int
+    cutoff: datetime
+
+
+class UsageAnalytics(BaseModel):
+    """Aggregates over the columnar usage archive."""
+    rows: List[Dict[str, Any]]
+    days: int
+    rows_scanned: int
@@ -0,0 +1,90 @@
+"""Production server entry point: ``python -m src.server``.
+
+Worker count comes from ``WEB_CONCURRENCY`` (default 1). With more than one
+worker and gunicorn installed, the app is preloaded once in the master and
+forked into ``uvicorn.workers.UvicornWorker`` processes; otherwise uvicorn's
+own multi-process supervisor is used. uvloop and httptools are picked up
+automatically when installed (both ship with ``uvicorn[standard]``).
+
+Multiple workers need a shared store for per-user limits such as open
+telephony streams (see shared_state.py). If ``SHARED_STATE_URL`` is unset,
+a host-local SQLite store is configured for all workers before they start.
+"""
+from __future__ import annotations
+import os
+import sys
+import tempfile
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Proxies trusted to set X-Forwarded-For (the client IP the auth throttle keys on)
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+APP = "src.main:app"
+
+
+def configure_shared_state(workers: int) -> None:
+    """Point every worker at the same store when running more than one."""
+    if workers > 1 and not os.getenv("SHARED_STATE_URL"):
+        path = os.path.join(tempfile.gettempdir(), "odiadev_shared_state.db")
+        os.environ["SHARED_STATE_URL"] = f"sqlite:///{path}"
+
+
+def run_gunicorn(workers: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{HOST}:{PORT}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", True)
+            self.cfg.set("timeout", int(os.getenv("WORKER_TIMEOUT", "60")))
+            self.cfg.set("graceful_timeout", 30)
+            self.cfg.set("keepalive", 5)
+            self.cfg.set("forwarded_allow_ips", FORWARDED_ALLOW_IPS)
+            self.cfg.set("post_fork", post_fork)
+
+        def load(self):
+            from .main import app
+            return app
+
+    Application().run()
+
+
+def post_fork(server, worker) -> None:
+    """Drop DB connections inherited from the preloading master."""
+    from .database import engine
+    engine.dispose(close=False)
+
+
+def run_uvicorn(workers: int) -> None:
+    import uvicorn
+
+    uvicorn.run(
+        APP,
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        log_level=os.getenv("LOG_LEVEL", "info").lower(),
+    )
+
+
+def main() -> None:
+    configure_shared_state(WORKERS)
+    if WORKERS > 1:
+        try:
+            import gunicorn  # noqa: F401
+            run_gunicorn(WORKERS)
+            return
+        except ImportError:
+            print("gunicorn not installed; using uvicorn workers (no app preload)", file=sys.stderr)
+    run_uvicorn(WORKERS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Cross-process key/value store for state that must agree across workers.
+
+Rate-limit counters, circuit-breaker state and similar module-level caches
+are per process; with several workers each would see only a fraction of the
+traffic. They go through a ``SharedStore`` instead, chosen by
+``SHARED_STATE_URL``:
+
+- ``memory://``                 single process (default with one worker)
+- ``sqlite:////tmp/state.db``   all workers on one host (WAL, atomic upserts)
+- ``redis://host:6379/0``       any number of hosts (needs the redis package)
+
+Values are strings; ``incr`` keeps integer counters. Every key may carry a
+TTL in seconds.
+
+Limits on resources each worker owns (RAM for in-flight audio, the
+constant-memory auth throttle) stay per process; ``per_worker`` splits
+such a host-wide limit evenly across the ``WEB_CONCURRENCY`` workers.
+"""
+from __future__ import annotations
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+try:
+    import redis
+except Exception:
+    redis = None
+
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+# Worker processes sharing this host (see server.py)
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+class SharedStore(ABC):
+    """Interface implemented by every backend."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """The value of ``key``, or None if absent or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Set ``key``, expiring after ``ttl`` seconds if given."""
+
+    @abstractmethod
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set ``key`` only if absent (or expired). Returns True if it was set."""
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """
+        Atomically add ``amount`` and return the new value.
+
+        ``ttl`` applies when the counter is created, so a fixed window expires
+        on schedule no matter how often it is incremented.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete ``key`` if present."""
+
+    @abstractmethod
+    def clear(self, prefix: str = "") -> None:
+        """Delete every key starting with ``prefix`` (all keys by default)."""
+
+
+class MemoryStore(SharedStore):
+    """In-process store; correct only with a single worker."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.time())
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._data[key] = (value, now + ttl if ttl else None)
+            return True
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        with self._lock:
+            current = self._live(key, now)
+            if current is None:
+                self._data[key] = (str(amount), now + ttl if ttl else None)
+                return amount
+            value = int(current) + amount
+            self._data[key] = (str(value), self._data[key][1])
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, prefix=""):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class SQLiteStore(SharedStore):
+    """
+    Host-local store shared by all worker processes through one SQLite file.
+
+    Each operation is a single autocommitted statement, so increments from
+    concurrent processes never lose updates. Expired rows are purged lazily.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_purge(self, now: float) -> None:
+        self._ops += 1
+        if self._ops % self.PURGE_EVERY == 0:
+            self._conn().execute("DELETE FROM shared_state WHERE expires_at <= ?", (now,))
+
+    def get(self, key):
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, now),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, now + ttl if ttl else None),
+        )
+        self._maybe_purge(now)
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE shared_state.expires_at IS NOT NULL AND shared_state.expires_at <= ?",
+            (key, value, now + ttl if ttl else None, now),
+        )
+        self._maybe_purge(now)
+        return cursor.rowcount == 1
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        row = self._conn().execute(
+            "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "value = CASE WHEN shared_state.expires_at <= ? THEN excluded.value "
+            "ELSE CAST(shared_state.value AS INTEGER) + excluded.value END, "
+            "expires_at = CASE WHEN shared_state.expires_at <= ? THEN excluded.expires_at "
+            "ELSE shared_state.expires_at END "
+            "RETURNING value",
+            (key, str(amount), now + ttl if ttl else None, now, now),
+        ).fetchone()
+        self._maybe_purge(now)
+        return int(row[0])
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    def clear(self, prefix=""):
+        self._conn().execute("DELETE FROM shared_state WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+
+class RedisStore(SharedStore):
+    """Store backed by Redis (or any server speaking its protocol)."""
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("redis package not installed; pip install redis")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def incr(self, key, amount=1, ttl=None):
+        pipe = self.client.pipeline()
+        pipe.incrby(key, amount)
+        if ttl:
+            # NX: only set the expiry when the counter was just created
+            pipe.pexpire(key, int(ttl * 1000), nx=True)
+        return int(pipe.execute()[0])
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def clear(self, prefix=""):
+        for key in self.client.scan_iter(match=f"{prefix}*"):
+            self.client.delete(key)
+
+
+def create_store(url: str) -> SharedStore:
+    """Build a store from a ``SHARED_STATE_URL``-style URL."""
+    if url.startswith("memory:"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+
+_store: Optional[SharedStore] = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store() -> SharedStore:
+    """Process-wide store built from ``SHARED_STATE_URL`` on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(SHARED_STATE_URL)
+    return _store
+
+
+def per_worker(limit: int, workers: int = WORKER_COUNT) -> int:
+    """Each worker's share of a host-wide ``limit`` (rounded up, at least 1)."""
+    return max(1, -(-limit // workers))
+
+
+__all__ = [
+    "WORKER_COUNT",
+    "SharedStore",
+    "MemoryStore",
+    "SQLiteStore",
+    "RedisStore",
+    "create_store",
+    "get_shared_store",
+    "per_worker",
+]
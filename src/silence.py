@@ -0,0 +1,57 @@
+"""Precomputed silence, spliced between clips without an upstream call.
+
+A Layer III frame whose side information and main data are all zero
+decodes to silence: every granule has no Huffman data, so the spectrum is
+empty. ``silent_mp3_frame`` builds one per frame header and caches it, and
+``mp3_silence`` repeats it; both take the header of the clip being
+extended, so the silence has the same sample rate, bitrate and channel
+mode as the audio around it and the stream stays decodable as one.
+
+PCM silence (for WAV clips) is zero samples; one second per format is
+cached and sliced.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .composition import MP3Header
+
+SILENCE_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=SILENCE_CACHE_SIZE)
+def silent_mp3_frame(header: "MP3Header") -> bytes:
+    """One silent frame with ``header`` (its padding bit cleared)."""
+    unpadded = header.unpadded()
+    return unpadded.raw + bytes(unpadded.frame_length - 4)
+
+
+def mp3_frames_for(header: "MP3Header", seconds: float) -> int:
+    return max(0, round(seconds * header.sample_rate / header.samples))
+
+
+def mp3_silence(header: "MP3Header", seconds: float) -> bytes:
+    """Silent frames with ``header``, ``seconds`` long (to the nearest frame)."""
+    return silent_mp3_frame(header) * mp3_frames_for(header, seconds)
+
+
+@lru_cache(maxsize=SILENCE_CACHE_SIZE)
+def _pcm_second(sample_rate: int, channels: int, sample_width: int) -> bytes:
+    return bytes(sample_rate * channels * sample_width)
+
+
+def pcm_silence(seconds: float, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """``seconds`` of zero samples."""
+    frame_bytes = channels * sample_width
+    total = round(seconds * sample_rate) * frame_bytes
+    second = _pcm_second(sample_rate, channels, sample_width)
+    whole, rest = divmod(total, len(second))
+    return second * whole + second[:rest]
+
+
+__all__ = [
+    "mp3_silence",
+    "pcm_silence",
+    "silent_mp3_frame",
+]
@@ -0,0 +1,177 @@
+"""Parse the SSML subset accepted by ``/v1/tts`` into segments and breaks.
+
+Supported markup:
+
+- ``<speak>`` (optional root), ``<p>`` and ``<s>``: containers
+- ``<break time="500ms"/>`` or ``<break strength="strong"/>``: a pause,
+  rendered locally as silence (at most ``MAX_BREAK_SECONDS``)
+- ``<prosody rate="..." pitch="...">``: ``rate`` as ``x-slow`` ..
+  ``x-fast``, a percentage or a multiplier of the enclosing speed;
+  ``pitch`` as ``x-low`` .. ``x-high`` or semitones (``+2st``) relative to
+  the enclosing pitch. Results are clamped to the API's speed and pitch
+  ranges; other attributes are ignored.
+- ``<voice name="joslyn">``: a voice by friendly name
+
+Anything else is rejected rather than read aloud. A document becomes a
+list of ``Segment`` (text to synthesize with one voice, speed and pitch)
+and floats (seconds of silence), the parts ``composition.stitch`` takes.
+"""
+from __future__ import annotations
+import re
+from typing import List, NamedTuple, Optional, Union
+from xml.etree import ElementTree
+
+MAX_BREAK_SECONDS = 10.0
+MAX_SEGMENTS = 50
+
+SPEED_RANGE = (0.5, 2.0)
+PITCH_RANGE = (-12, 12)
+
+BREAK_STRENGTHS = {
+    "none": 0.0, "x-weak": 0.1, "weak": 0.25, "medium": 0.5, "strong": 0.75, "x-strong": 1.25,
+}
+RATES = {"x-slow": 0.6, "slow": 0.8, "medium": 1.0, "fast": 1.25, "x-fast": 1.5, "default": 1.0}
+PITCHES = {"x-low": -6, "low": -3, "medium": 0, "high": 3, "x-high": 6, "default": 0}
+
+_TIME = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(ms|s)\s*$")
+_SEMITONES = re.compile(r"^\s*([+-]?\d+(?:\.\d+)?)\s*st\s*$")
+_PERCENT = re.compile(r"^\s*([+-]?\d+(?:\.\d+)?)\s*%\s*$")
+_NUMBER = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*$")
+
+
+class SSMLError(ValueError):
+    """The document is not valid SSML, or uses markup outside the subset."""
+
+
+class Segment(NamedTuple):
+    text: str
+    voice_name: Optional[str]
+    speed: float
+    pitch: int
+
+
+Part = Union[Segment, float]
+
+
+def _local(tag: str) -> str:
+    """``tag`` without its namespace (``{http://www.w3.org/2001/10/synthesis}speak``)."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def break_seconds(element) -> float:
+    time = element.get("time")
+    if time is not None:
+        match = _TIME.match(time)
+        if not match:
+            raise SSMLError(f"Invalid break time '{time}'; use e.g. 500ms or 1.5s")
+        seconds = float(match.group(1)) / (1000 if match.group(2) == "ms" else 1)
+    else:
+        strength = element.get("strength", "medium")
+        if strength not in BREAK_STRENGTHS:
+            raise SSMLError(f"Invalid break strength '{strength}'. Valid options: {', '.join(BREAK_STRENGTHS)}")
+        seconds = BREAK_STRENGTHS[strength]
+    if seconds > MAX_BREAK_SECONDS:
+        raise SSMLError(f"Break too long. Maximum {MAX_BREAK_SECONDS:g}s allowed.")
+    return seconds
+
+
+def prosody_speed(rate: str, speed: float) -> float:
+    if rate in RATES:
+        factor = RATES[rate]
+    elif _PERCENT.match(rate):
+        factor = float(_PERCENT.match(rate).group(1)) / 100
+    elif _NUMBER.match(rate):
+        factor = float(rate)
+    else:
+        raise SSMLError(f"Invalid prosody rate '{rate}'")
+    return round(min(max(speed * factor, SPEED_RANGE[0]), SPEED_RANGE[1]), 2)
+
+
+def prosody_pitch(value: str, pitch: int) -> int:
+    if value in PITCHES:
+        delta = PITCHES[value]
+    elif _SEMITONES.match(value):
+        delta = round(float(_SEMITONES.match(value).group(1)))
+    else:
+        raise SSMLError(f"Invalid prosody pitch '{value}'; use x-low .. x-high or semitones like +2st")
+    return min(max(pitch + delta, PITCH_RANGE[0]), PITCH_RANGE[1])
+
+
+def parse_ssml(document: str, speed: float = 1.0, pitch: int = 0,
+               voice_name: Optional[str] = None) -> List[Part]:
+    """
+    Segments and breaks of ``document``, in order.
+
+    Adjacent text with the same voice, speed and pitch is one segment;
+    adjacent breaks are summed. ``speed``, ``pitch`` and ``voice_name``
+    apply outside any ``<prosody>`` or ``<voice>``.
+
+    Raises:
+        SSMLError: Malformed XML, unsupported markup, or no text to speak
+    """
+    if "<!DOCTYPE" in document or "<!ENTITY" in document:
+        raise SSMLError("DTDs and entity declarations are not allowed in SSML")
+    # An XML declaration must be the very first thing in the document
+    document = document.lstrip()
+    if not document.startswith(("<speak", "<?xml")):
+        document = f"<speak>{document}</speak>"
+    try:
+        root = ElementTree.fromstring(document)
+    except ElementTree.ParseError as e:
+        raise SSMLError(f"Invalid SSML: {e}")
+    if _local(root.tag) != "speak":
+        raise SSMLError("SSML must have a <speak> root element")
+
+    parts: List[Part] = []
+
+    def add_text(text: Optional[str], current: Segment) -> None:
+        words = " ".join((text or "").split())
+        if not words:
+            return
+        last = parts[-1] if parts else None
+        if isinstance(last, Segment) and last[1:] == current[1:]:
+            parts[-1] = last._replace(text=f"{last.text} {words}")
+        else:
+            parts.append(current._replace(text=words))
+
+    def add_break(seconds: float) -> None:
+        if parts and isinstance(parts[-1], float):
+            parts[-1] = min(parts[-1] + seconds, MAX_BREAK_SECONDS)
+        elif seconds > 0:
+            parts.append(seconds)
+
+    def walk(element, current: Segment) -> None:
+        add_text(element.text, current)
+        for child in element:
+            tag = _local(child.tag)
+            if tag == "break":
+                add_break(break_seconds(child))
+            elif tag in ("p", "s"):
+                walk(child, current)
+            elif tag == "prosody":
+                walk(child, current._replace(
+                    speed=prosody_speed(child.get("rate", "default"), current.speed),
+                    pitch=prosody_pitch(child.get("pitch", "default"), current.pitch),
+                ))
+            elif tag == "voice":
+                name = child.get("name")
+                if not name:
+                    raise SSMLError("<voice> needs a name")
+                walk(child, current._replace(voice_name=name))
+            else:
+                raise SSMLError(f"Unsupported SSML element <{tag}>. Supported: break, prosody, voice, p, s")
+            add_text(child.tail, current)
+
+    walk(root, Segment("", voice_name, speed, pitch))
+    if not any(isinstance(part, Segment) for part in parts):
+        raise SSMLError("SSML has no text to speak")
+    if sum(isinstance(part, Segment) for part in parts) > MAX_SEGMENTS:
+        raise SSMLError(f"Too many segments. Maximum {MAX_SEGMENTS} allowed.")
+    return parts
+
+
+__all__ = [
+    "Segment",
+    "SSMLError",
+    "parse_ssml",
+]
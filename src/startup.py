@@ -0,0 +1,151 @@
+"""Startup profiling and readiness gating.
+
+``STARTUP_PROFILE=true`` logs how long each startup phase took (imports, app
+construction, each warm-up step). For a per-module import breakdown run::
+
+    python -m src.startup            # top 25 modules by cumulative import time
+    python -m src.startup 50
+
+Readiness is separate from liveness: ``/health`` answers as soon as the
+process serves HTTP, ``/ready`` only once the database pool and voice
+registry have been warmed. Advisory checks (the MiniMax connection pool)
+are warmed and reported alongside but never hold readiness back: an
+upstream outage must not take every instance out of the load balancer.
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() == "true"
+# Set to false to skip pre-opening a connection to MiniMax during warm-up
+READINESS_WARM_UPSTREAM = os.getenv("READINESS_WARM_UPSTREAM", "true").lower() == "true"
+
+_T0 = time.perf_counter()
+
+
+class StartupProfile:
+    """Collects named phase durations since process import."""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+        self._last_checkpoint = _T0
+
+    def checkpoint(self, name: str) -> None:
+        """Record the time elapsed since the previous checkpoint (or import)."""
+        now = time.perf_counter()
+        self.record(name, now - self._last_checkpoint)
+        self._last_checkpoint = now
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+        if STARTUP_PROFILE:
+            logger.info(f"Startup: {name} took {seconds * 1000:.1f} ms")
+
+    def report(self) -> Dict[str, float]:
+        report = {name: round(seconds * 1000, 1) for name, seconds in self.phases}
+        report["since_import_ms"] = round((time.perf_counter() - _T0) * 1000, 1)
+        return report
+
+
+class Readiness:
+    """Tracks warm-up checks; ready once every required check has passed."""
+
+    def __init__(self):
+        self.checks: Dict[str, Callable[[], bool]] = {}
+        self.status: Dict[str, str] = {}
+        self.advisory: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def register(self, name: str, check: Callable[[], bool], required: bool = True) -> None:
+        """Add a check; one that isn't ``required`` is reported but doesn't gate readiness."""
+        self.checks[name] = check
+        self.status[name] = "pending"
+        if not required:
+            self.advisory.add(name)
+
+    @property
+    def is_ready(self) -> bool:
+        required = [state for name, state in self.status.items() if name not in self.advisory]
+        return bool(required) and all(state == "ok" for state in required)
+
+    @property
+    def all_passed(self) -> bool:
+        return all(state == "ok" for state in self.status.values())
+
+    def warm_up(self, profile: StartupProfile) -> None:
+        """Run every pending check once; failed checks are retried on the next call."""
+        with self._lock:
+            for name, check in self.checks.items():
+                if self.status.get(name) == "ok":
+                    continue
+                try:
+                    with profile.phase(f"warm:{name}"):
+                        ok = check()
+                    self.status[name] = "ok" if ok else "failed"
+                except Exception as e:
+                    logger.warning(f"Readiness check {name} failed: {e}")
+                    self.status[name] = "failed"
+        if STARTUP_PROFILE and self.is_ready:
+            logger.info(f"Startup: ready after {profile.report()['since_import_ms']:.1f} ms")
+
+    def warm_up_in_background(self, profile: StartupProfile, retry_seconds: float = 2.0) -> threading.Thread:
+        """Warm up off the event loop, retrying failed checks (advisory ones too) until all pass."""
+        def run():
+            while True:
+                self.warm_up(profile)
+                if self.all_passed:
+                    return
+                time.sleep(retry_seconds)
+
+        thread = threading.Thread(target=run, name="readiness-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+
+startup_profile = StartupProfile()
+readiness = Readiness()
+
+
+def import_time_report(module: str = "src.main", top: int = 25) -> List[Tuple[int, int, str]]:
+    """
+    Import ``module`` in a fresh interpreter with ``-X importtime``.
+
+    Returns:
+        list: ``(cumulative_us, self_us, module)`` tuples, slowest first
+    """
+    import subprocess
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+if __name__ == "__main__":
+    top = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in import_time_report(top=top):
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
@@ -0,0 +1,261 @@
+"""Telephony streaming: fixed-size G.711 or PCM frames for call bridges.
+
+``/v1/tts/telephony`` asks MiniMax for 16-bit PCM at the line's sample rate
+(streamed, so audio arrives while it is still being synthesized), encodes
+it here and sends it as ``TELEPHONY_FRAME_MS`` frames paced in real time,
+the way a call bridge plays them out.
+
+G.711 encoding (``mulaw``, ``alaw``; 8 kHz only) is a lookup in a 65536-entry
+table indexed by the sample's bit pattern. The tables are built once, with
+vectorized NumPy, from the ITU-T reference segment rules, so encoding a
+chunk is a single array indexing operation. ``pcm`` frames are the samples
+unchanged (16-bit little-endian, 8 or 16 kHz). Requires ``numpy``.
+"""
+from __future__ import annotations
+import os
+import time
+import asyncio
+import importlib.util
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from .audio_profiles import AudioFormat, PCM_SAMPLE_WIDTH
+from .shared_state import SharedStore, get_shared_store
+
+# numpy is imported on first use to keep it off the cold-start path
+np = None
+TELEPHONY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+TELEPHONY_FRAME_MS = int(os.getenv("TELEPHONY_FRAME_MS", "20"))
+# Open-stream leases not renewed for this long are freed
+TELEPHONY_SLOT_TTL_SECONDS = float(os.getenv("TELEPHONY_SLOT_TTL_SECONDS", "60"))
+SLOT_KEY_PREFIX = "telephony:stream:"
+
+# Encoding -> (sample rates, silence byte padding the last frame)
+ENCODINGS: Dict[str, tuple] = {
+    "mulaw": ((8000,), 0xFF),
+    "alaw": ((8000,), 0xD5),
+    "pcm": ((8000, 16000), 0x00),
+}
+
+_tables: Dict[str, object] = {}
+
+# Upper bounds of the G.711 segments (ITU-T G.711, Sun reference code)
+_MULAW_SEGMENT_ENDS = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+_ALAW_SEGMENT_ENDS = (0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF)
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 8159
+
+
+def _require_numpy() -> None:
+    global np
+    if np is not None:
+        return
+    if not TELEPHONY_AVAILABLE:
+        raise RuntimeError("numpy is required for telephony streaming")
+    import numpy as np
+
+
+def _mulaw_table():
+    samples = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(samples < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(samples), _MULAW_CLIP) + (_MULAW_BIAS >> 2)
+    segment = np.searchsorted(np.array(_MULAW_SEGMENT_ENDS), magnitude)
+    value = (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)
+    return (np.where(segment >= 8, 0x7F, value) ^ mask).astype(np.uint8)
+
+
+def _alaw_table():
+    samples = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 3
+    mask = np.where(samples >= 0, 0xD5, 0x55)
+    magnitude = np.where(samples >= 0, samples, -samples - 1)
+    segment = np.searchsorted(np.array(_ALAW_SEGMENT_ENDS), magnitude)
+    shift = np.where(segment < 2, 1, segment)
+    value = (segment << 4) | ((magnitude >> shift) & 0x0F)
+    return (np.where(segment >= 8, 0x7F, value) ^ mask).astype(np.uint8)
+
+
+def _table(encoding: str):
+    table = _tables.get(encoding)
+    if table is None:
+        _require_numpy()
+        table = _tables[encoding] = _mulaw_table() if encoding == "mulaw" else _alaw_table()
+    return table
+
+
+def encode_g711(pcm: bytes, encoding: str) -> bytes:
+    """Encode 16-bit little-endian PCM (an even number of bytes) as ``mulaw`` or ``alaw``."""
+    table = _table(encoding)
+    return table[np.frombuffer(pcm, dtype="<u2")].tobytes()
+
+
+def telephony_format(encoding: str, sample_rate: int) -> AudioFormat:
+    """What to ask MiniMax for: raw mono PCM at the line's rate."""
+    rates, _ = ENCODINGS[encoding]
+    if sample_rate not in rates:
+        raise ValueError(f"{encoding} needs a sample rate of {' or '.join(map(str, rates))} Hz")
+    return AudioFormat("pcm", sample_rate, None, 1)
+
+
+class FrameEncoder:
+    """
+    Cut a stream of PCM chunks (split anywhere, even mid-sample) into
+    encoded frames of ``frame_ms``; ``flush`` pads the last one with silence.
+    """
+
+    def __init__(self, encoding: str, sample_rate: int, frame_ms: int = TELEPHONY_FRAME_MS):
+        telephony_format(encoding, sample_rate)
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        samples_per_frame = sample_rate * frame_ms // 1000
+        self.frame_bytes = samples_per_frame * (PCM_SAMPLE_WIDTH if encoding == "pcm" else 1)
+        self.silence = ENCODINGS[encoding][1]
+        self.samples = 0
+        self.frames_sent = 0
+        self._carry = b""
+        self._pending = bytearray()
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.samples / self.sample_rate
+
+    @property
+    def sent_seconds(self) -> float:
+        """Audio in the frames sent so far, without the last frame's padding."""
+        return min(self.frames_sent * self.frame_ms / 1000, self.duration_seconds)
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        data = self._carry + chunk
+        usable = len(data) & ~1
+        self._carry = data[usable:]
+        if usable:
+            self.samples += usable // PCM_SAMPLE_WIDTH
+            pcm = data[:usable]
+            self._pending += pcm if self.encoding == "pcm" else encode_g711(pcm, self.encoding)
+        count = len(self._pending) // self.frame_bytes
+        frames = [bytes(self._pending[i * self.frame_bytes:(i + 1) * self.frame_bytes]) for i in range(count)]
+        del self._pending[:count * self.frame_bytes]
+        return frames
+
+    def flush(self) -> List[bytes]:
+        if not self._pending:
+            return []
+        frame = bytes(self._pending) + bytes([self.silence]) * (self.frame_bytes - len(self._pending))
+        self._pending.clear()
+        return [frame]
+
+
+class FramePacer:
+    """
+    Release one frame per ``frame_seconds`` on a fixed schedule (no drift).
+    If the producer falls behind by more than a frame, the schedule restarts
+    instead of bursting to catch up.
+    """
+
+    def __init__(self, frame_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.frame_seconds = frame_seconds
+        self.clock = clock
+        self._next: Optional[float] = None
+
+    async def wait(self) -> None:
+        now = self.clock()
+        if self._next is None or now - self._next > self.frame_seconds:
+            self._next = now
+        elif self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next += self.frame_seconds
+
+
+async def stream_paced(chunks: AsyncIterator[bytes], encoder: FrameEncoder,
+                       send: Callable[[bytes], Awaitable[None]]) -> int:
+    """
+    Encode ``chunks`` and ``send`` the frames in real time. Upstream is read
+    concurrently, so pacing never holds up synthesis.
+
+    Returns:
+        int: Frames sent, also kept in ``encoder.frames_sent`` for callers
+        whose ``send`` fails part way
+
+    Raises:
+        Whatever reading ``chunks`` raised, once the frames before it are sent
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                for frame in encoder.feed(chunk):
+                    queue.put_nowait(frame)
+            for frame in encoder.flush():
+                queue.put_nowait(frame)
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    pacer = FramePacer(encoder.frame_ms / 1000)
+    sent = 0
+    try:
+        while (frame := await queue.get()) is not None:
+            await pacer.wait()
+            await send(frame)
+            sent += 1
+            encoder.frames_sent = sent
+        await producer
+    finally:
+        producer.cancel()
+    return sent
+
+
+class StreamSlots:
+    """
+    Open telephony streams per user across all workers, capped by the plan's
+    ``max_streams``.
+
+    Each open stream holds a lease, ``telephony:stream:<user>:<n>`` for some
+    ``n`` below the limit, in the shared store. Leases expire after
+    ``TELEPHONY_SLOT_TTL_SECONDS`` unless ``keep_alive`` renews them, so the
+    slots of a worker that dies free themselves.
+    """
+
+    def __init__(self, store: Optional[SharedStore] = None, ttl: float = TELEPHONY_SLOT_TTL_SECONDS):
+        self._store = store
+        self.ttl = ttl
+
+    @property
+    def store(self) -> SharedStore:
+        return self._store or get_shared_store()
+
+    def acquire(self, user_id: int, limit: int) -> Optional[str]:
+        """The lease key of a free slot, or None if all ``limit`` are taken."""
+        for n in range(limit):
+            slot = f"{SLOT_KEY_PREFIX}{user_id}:{n}"
+            if self.store.add(slot, "1", ttl=self.ttl):
+                return slot
+        return None
+
+    def renew(self, slot: str) -> None:
+        self.store.set(slot, "1", ttl=self.ttl)
+
+    async def keep_alive(self, slot: str) -> None:
+        """Renew ``slot`` until cancelled; cancel it before ``release``."""
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            self.renew(slot)
+
+    def release(self, slot: str) -> None:
+        self.store.delete(slot)
+
+
+telephony_streams = StreamSlots()
+
+
+__all__ = [
+    "ENCODINGS",
+    "FrameEncoder",
+    "FramePacer",
+    "StreamSlots",
+    "encode_g711",
+    "stream_paced",
+    "telephony_format",
+    "telephony_streams",
+]
@@ -0,0 +1,241 @@
+"""Pre-authentication throttle for failed API key attempts.
+
+Every request with a bad key still reaches ``get_current_user``, which opens
+a database session and looks the key up. ``AuthThrottleMiddleware`` sits in
+front of the app: responses with status 401 count as a failure for the
+client IP and for the client IP's use of the key's prefix (the key ID for
+``odk_`` keys), and once either has failed more than its limit within about
+a minute, further requests from it are answered with 429 before any route,
+dependency or database work runs. Key failures are counted per IP because
+key IDs are not secret: counting them alone would let anyone who knows a
+customer's key ID lock that customer out.
+
+Paths that need no API key (health checks, metrics, docs, stored audio)
+are never throttled, so a flood of bad keys can't fail a health check.
+The client IP is the ASGI ``client``, which uvicorn rewrites from
+``X-Forwarded-For`` only for proxies in ``FORWARDED_ALLOW_IPS`` (set it
+to the load balancer's addresses, or ``*`` where the proxy is the only way
+in, as on Render); requests without one share the ``unknown`` bucket.
+
+Failures are counted in count-min sketches (``AUTH_THROTTLE_WIDTH`` x
+``AUTH_THROTTLE_DEPTH`` counters per window), so memory stays constant no
+matter how many distinct IPs or keys a flood uses. Sketches only
+overestimate; conservative updates keep collisions from pushing unrelated
+clients over the limit until a flood is several times the sketch width.
+The sketches are per process, which is what keeps them constant-size and
+off the request path's shared store; the limits are host totals, so each
+of the ``WEB_CONCURRENCY`` workers enforces its share of them, and a
+client spread across all workers gets about the configured limit.
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from .api_keys import parse_key_id
+from .shared_state import per_worker
+
+AUTH_THROTTLE_ENABLED = os.getenv("AUTH_THROTTLE_ENABLED", "true").lower() == "true"
+# Failed attempts allowed per sliding window before requests are rejected
+# (this worker's share of the host-wide limit)
+AUTH_FAIL_LIMIT_PER_IP = per_worker(int(os.getenv("AUTH_FAIL_LIMIT_PER_IP", "30")))
+AUTH_FAIL_LIMIT_PER_KEY = per_worker(int(os.getenv("AUTH_FAIL_LIMIT_PER_KEY", "10")))
+AUTH_THROTTLE_WINDOW_SECONDS = float(os.getenv("AUTH_THROTTLE_WINDOW_SECONDS", "60"))
+AUTH_THROTTLE_WIDTH = int(os.getenv("AUTH_THROTTLE_WIDTH", "16384"))
+AUTH_THROTTLE_DEPTH = int(os.getenv("AUTH_THROTTLE_DEPTH", "4"))
+
+# Legacy keys have no key ID; throttle on their first characters instead
+LEGACY_KEY_PREFIX_LENGTH = 12
+# Routes that take no API key
+AUTH_THROTTLE_EXEMPT_PATHS = frozenset({"/health", "/ready", "/metrics", "/docs", "/redoc", "/openapi.json"})
+AUTH_THROTTLE_EXEMPT_PREFIXES = ("/v1/audio/",)
+UNKNOWN_CLIENT = "unknown"
+
+
+class CountMinSketch:
+    """Fixed-size frequency estimates; never undercounts."""
+
+    def __init__(self, width: int = AUTH_THROTTLE_WIDTH, depth: int = AUTH_THROTTLE_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows: List[List[int]] = [[0] * width for _ in range(depth)]
+
+    def _cells(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=4 * self.depth).digest()
+        return [
+            int.from_bytes(digest[4 * i:4 * i + 4], "little") % self.width
+            for i in range(self.depth)
+        ]
+
+    def add(self, key: str, amount: int = 1) -> int:
+        """Conservative update: raise only the cells below the new estimate."""
+        cells = self._cells(key)
+        estimate = min(row[cell] for row, cell in zip(self.rows, cells)) + amount
+        for row, cell in zip(self.rows, cells):
+            if row[cell] < estimate:
+                row[cell] = estimate
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[cell] for row, cell in zip(self.rows, self._cells(key)))
+
+    def clear(self) -> None:
+        for row in self.rows:
+            row[:] = [0] * self.width
+
+
+class AuthThrottle:
+    """
+    Sliding-window failure counts per client IP and per (client IP, key prefix).
+
+    Two sketches are kept, for the current and the previous window; the
+    estimate is the current count plus the previous one weighted by how much
+    of it still overlaps the sliding window.
+    """
+
+    def __init__(self, ip_limit: int = AUTH_FAIL_LIMIT_PER_IP, key_limit: int = AUTH_FAIL_LIMIT_PER_KEY,
+                 window: float = AUTH_THROTTLE_WINDOW_SECONDS, width: int = AUTH_THROTTLE_WIDTH,
+                 depth: int = AUTH_THROTTLE_DEPTH):
+        self.ip_limit = ip_limit
+        self.key_limit = key_limit
+        self.window = window
+        self._current = CountMinSketch(width, depth)
+        self._previous = CountMinSketch(width, depth)
+        self._window_index = None
+        self.counters: Dict[str, int] = {
+            "checked": 0,
+            "rejected_ip": 0,
+            "rejected_key": 0,
+            "failures": 0,
+        }
+
+    def _rotate(self, now: float) -> float:
+        """Advance to ``now``'s window; returns the fraction of it elapsed."""
+        index, offset = divmod(now, self.window)
+        if index != self._window_index:
+            if self._window_index is not None and index == self._window_index + 1:
+                self._previous, self._current = self._current, self._previous
+            else:
+                self._previous.clear()
+            self._current.clear()
+            self._window_index = index
+        return offset / self.window
+
+    def _estimate(self, key: str, elapsed: float) -> float:
+        return self._current.estimate(key) + self._previous.estimate(key) * (1.0 - elapsed)
+
+    def check(self, ip: Optional[str], key_prefix: Optional[str],
+              now: Optional[float] = None) -> Optional[Tuple[str, int]]:
+        """
+        Returns:
+            None if allowed, else ``(reason, retry_after_seconds)``
+        """
+        now = time.time() if now is None else now
+        elapsed = self._rotate(now)
+        self.counters["checked"] += 1
+        retry_after = int(self.window * (1.0 - elapsed)) + 1
+        if ip is not None and self._estimate(f"ip:{ip}", elapsed) >= self.ip_limit:
+            self.counters["rejected_ip"] += 1
+            return "ip", retry_after
+        if key_prefix is not None and self._estimate(f"key:{ip}:{key_prefix}", elapsed) >= self.key_limit:
+            self.counters["rejected_key"] += 1
+            return "key", retry_after
+        return None
+
+    def record_failure(self, ip: Optional[str], key_prefix: Optional[str],
+                       now: Optional[float] = None) -> None:
+        self._rotate(time.time() if now is None else now)
+        self.counters["failures"] += 1
+        if ip is not None:
+            self._current.add(f"ip:{ip}")
+        if key_prefix is not None:
+            self._current.add(f"key:{ip}:{key_prefix}")
+
+    def reset(self) -> None:
+        self._current.clear()
+        self._previous.clear()
+        for name in self.counters:
+            self.counters[name] = 0
+
+    def metrics(self) -> str:
+        """Counters in Prometheus text exposition format."""
+        c = self.counters
+        return (
+            "# HELP auth_throttle_checks_total Requests checked by the pre-auth throttle.\n"
+            "# TYPE auth_throttle_checks_total counter\n"
+            f"auth_throttle_checks_total {c['checked']}\n"
+            "# HELP auth_throttle_rejected_total Requests rejected before authentication.\n"
+            "# TYPE auth_throttle_rejected_total counter\n"
+            f'auth_throttle_rejected_total{{reason="ip"}} {c["rejected_ip"]}\n'
+            f'auth_throttle_rejected_total{{reason="key"}} {c["rejected_key"]}\n'
+            "# HELP auth_failures_total Failed authentication attempts recorded.\n"
+            "# TYPE auth_failures_total counter\n"
+            f"auth_failures_total {c['failures']}\n"
+        )
+
+
+def key_prefix_from_header(authorization: Optional[str]) -> Optional[str]:
+    """Key ID of an ``odk_`` key, or the first characters of any other token."""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    api_key = authorization[7:]
+    if not api_key:
+        return None
+    return parse_key_id(api_key) or api_key[:LEGACY_KEY_PREFIX_LENGTH]
+
+
+class AuthThrottleMiddleware:
+    """
+    ASGI middleware applying ``AuthThrottle`` ahead of routing.
+
+    Runs on the event loop with no awaits between check and update, so the
+    throttle needs no lock.
+    """
+
+    def __init__(self, app, throttle: AuthThrottle):
+        self.app = app
+        self.throttle = throttle
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if (scope["type"] != "http" or not AUTH_THROTTLE_ENABLED or path in AUTH_THROTTLE_EXEMPT_PATHS
+                or path.startswith(AUTH_THROTTLE_EXEMPT_PREFIXES)):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        ip = client[0] if client and client[0] else UNKNOWN_CLIENT
+        authorization = None
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        key_prefix = key_prefix_from_header(authorization)
+
+        rejected = self.throttle.check(ip, key_prefix)
+        if rejected is not None:
+            _, retry_after = rejected
+            body = json.dumps({"detail": "Too many failed authentication attempts"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] == 401:
+                self.throttle.record_failure(ip, key_prefix)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+auth_throttle = AuthThrottle()
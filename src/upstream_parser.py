@@ -0,0 +1,131 @@
+"""Incremental parser for MiniMax T2A responses.
+
+MiniMax returns the clip as a hex string inside the JSON body
+(``{"data": {"audio": "<hex>", ...}, "base_resp": {...}}``). Parsing that
+with ``json.loads`` holds the raw body, the decoded hex ``str`` (each twice
+the clip) and then the clip bytes at the same time.
+
+``UpstreamAudioParser`` is fed the body chunk by chunk as it streams in.
+The ``data.audio`` hex is decoded straight into a buffer preallocated from
+the ``Content-Length`` (half of it is an upper bound on the clip), and only
+the small remainder of the document is kept and parsed as JSON at the end,
+with the audio value left empty. Peak memory is the clip plus one chunk;
+with a ``sink`` file the decoded audio goes there instead, and peak memory
+is about one chunk.
+"""
+from __future__ import annotations
+import os
+import re
+import json
+import binascii
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+UPSTREAM_CHUNK_SIZE = int(os.getenv("MINIMAX_CHUNK_SIZE", "65536"))
+
+_AUDIO_KEY = re.compile(rb'"audio"\s*:\s*$')
+# "audio" sits inside the top-level "data" object
+_AUDIO_DEPTH = 2
+
+
+class UpstreamAudioParser:
+    """
+    Split a streamed MiniMax response into its metadata and audio bytes.
+
+    Raises ``ValueError`` on malformed input (bad hex, truncated document),
+    like ``json.loads`` and ``bytes.fromhex`` do.
+    """
+
+    def __init__(self, size_hint: Optional[int] = None, sink: Optional[BinaryIO] = None):
+        self.sink = sink
+        self.audio = bytearray(0 if sink is not None else (size_hint or 0) // 2)
+        self.audio_length = 0
+        self.found_audio = False
+        self._meta = bytearray()
+        self._in_audio = False
+        self._in_string = False
+        self._escape = False
+        self._depth = 0
+        self._string_start = -1
+        self._last_string_start = -1
+        self._nibble = b""
+
+    def feed(self, chunk: bytes) -> None:
+        pos, end = 0, len(chunk)
+        while pos < end:
+            if self._in_audio:
+                pos = self._feed_audio(chunk, pos)
+            else:
+                pos = self._feed_meta(chunk, pos)
+
+    def _feed_audio(self, chunk: bytes, pos: int) -> int:
+        quote = chunk.find(b'"', pos)
+        stop = len(chunk) if quote < 0 else quote
+        digits = self._nibble + chunk[pos:stop]
+        usable = len(digits) & ~1
+        self._nibble = digits[usable:]
+        if usable:
+            try:
+                decoded = binascii.unhexlify(digits[:usable])
+            except binascii.Error as e:
+                raise ValueError(f"Invalid audio hex: {e}")
+            if self.sink is not None:
+                self.sink.write(decoded)
+            else:
+                start = self.audio_length
+                # Grows the buffer if the size hint was short (e.g. compressed bodies)
+                self.audio[start:start + len(decoded)] = decoded
+            self.audio_length += len(decoded)
+        if quote < 0:
+            return len(chunk)
+        if self._nibble:
+            raise ValueError("Invalid audio hex: odd number of digits")
+        self._in_audio = False
+        self._meta += b'"'  # close the emptied string
+        return quote + 1
+
+    def _feed_meta(self, chunk: bytes, pos: int) -> int:
+        meta = self._meta
+        for i in range(pos, len(chunk)):
+            c = chunk[i]
+            if self._in_string:
+                meta.append(c)
+                if self._escape:
+                    self._escape = False
+                elif c == 0x5C:  # backslash
+                    self._escape = True
+                elif c == 0x22:  # closing quote
+                    self._in_string = False
+                    self._last_string_start = self._string_start
+                continue
+            if c == 0x22:
+                if (self._depth == _AUDIO_DEPTH and not self.found_audio
+                        and self._last_string_start >= 0
+                        and _AUDIO_KEY.match(meta, self._last_string_start)):
+                    meta.append(c)
+                    self.found_audio = True
+                    self._in_audio = True
+                    return i + 1
+                self._in_string = True
+                self._string_start = len(meta)
+            elif c in b"{[":
+                self._depth += 1
+            elif c in b"}]":
+                self._depth -= 1
+            meta.append(c)
+        return len(chunk)
+
+    def close(self) -> Tuple[Dict[str, Any], bytearray]:
+        """
+        Finish parsing.
+
+        Returns:
+            tuple: The response document with ``data.audio`` emptied, and the
+            decoded audio (trimmed in place, not copied; empty with a sink)
+        """
+        if self._in_audio:
+            raise ValueError("Truncated response: unterminated audio string")
+        document = json.loads(self._meta)
+        if not isinstance(document, dict):
+            raise ValueError("Unexpected MiniMax response")
+        del self.audio[self.audio_length:]
+        return document, self.audio
@@ -0,0 +1,250 @@
+"""Columnar archive of usage logs for analytics.
+
+Closed days of ``usage_logs`` are written to zstd-compressed Parquet files,
+one per UTC day, under ``USAGE_ARCHIVE_DIR/day=YYYY-MM-DD/usage.parquet``
+(hive-style partitioning). A day is closed once
+``USAGE_ARCHIVE_GRACE_HOURS`` have passed since its end; the scheduler
+archives closed days that have no file yet, oldest first.
+
+``query_archive`` answers aggregate questions (seconds per voice per hour,
+error rate by model and text length, ...) with vectorized pyarrow
+group-bys over only the day partitions in range, so they never touch the
+OLTP database.
+
+Archive days before ``USAGE_RETENTION_DAYS`` compaction deletes their raw
+rows; the default lookback is well inside it. Requires ``pyarrow``.
+
+Run manually with ``python -m src.usage_archive [YYYY-MM-DD ...]``.
+"""
+from __future__ import annotations
+import os
+import logging
+import importlib.util
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+# pyarrow is imported on first use to keep it (~150 ms) off the cold-start path
+pa = pc = ds = pq = None
+ARCHIVE_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+try:
+    from sqlalchemy import select, func
+except Exception:
+    select = func = None
+
+from .models import Usage, UsageStatus
+
+logger = logging.getLogger(__name__)
+
+USAGE_ARCHIVE_DIR = os.getenv("USAGE_ARCHIVE_DIR", "./usage_archive")
+USAGE_ARCHIVE_GRACE_HOURS = float(os.getenv("USAGE_ARCHIVE_GRACE_HOURS", "1"))
+USAGE_ARCHIVE_LOOKBACK_DAYS = int(os.getenv("USAGE_ARCHIVE_LOOKBACK_DAYS", "30"))
+USAGE_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("USAGE_ARCHIVE_INTERVAL_SECONDS", "3600"))
+USAGE_ARCHIVE_BATCH_SIZE = int(os.getenv("USAGE_ARCHIVE_BATCH_SIZE", "50000"))
+
+ARCHIVE_COLUMNS = (
+    Usage.id, Usage.user_id, Usage.voice_id, Usage.text_length, Usage.audio_seconds,
+    Usage.status, Usage.model_used, Usage.timestamp,
+)
+ARCHIVE_SCHEMA = None  # built by _require_pyarrow
+
+# group_by values accepted by query_archive; derived ones are computed per batch
+GROUP_KEYS = ("day", "hour", "user_id", "voice_id", "model_used", "status", "text_length_bucket")
+TEXT_LENGTH_BUCKET = int(os.getenv("USAGE_ANALYTICS_TEXT_BUCKET", "500"))
+
+
+def _require_pyarrow() -> None:
+    global pa, pc, ds, pq, ARCHIVE_SCHEMA
+    if ARCHIVE_SCHEMA is not None:
+        return
+    if not ARCHIVE_AVAILABLE:
+        raise RuntimeError("pyarrow is required for the usage archive")
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    ARCHIVE_SCHEMA = pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("voice_id", pa.int64()),
+        ("text_length", pa.int32()),
+        ("audio_seconds", pa.float64()),
+        ("status", pa.dictionary(pa.int8(), pa.string())),
+        ("model_used", pa.dictionary(pa.int8(), pa.string())),
+        ("timestamp", pa.timestamp("us")),
+    ])
+
+
+def day_path(day: date, archive_dir: Optional[str] = None) -> str:
+    return os.path.join(archive_dir or USAGE_ARCHIVE_DIR, f"day={day.isoformat()}", "usage.parquet")
+
+
+def archived_days(archive_dir: Optional[str] = None) -> List[date]:
+    root = archive_dir or USAGE_ARCHIVE_DIR
+    if not os.path.isdir(root):
+        return []
+    days = []
+    for name in os.listdir(root):
+        if name.startswith("day=") and os.path.exists(os.path.join(root, name, "usage.parquet")):
+            days.append(date.fromisoformat(name[4:]))
+    return sorted(days)
+
+
+def archive_day(engine, day: date, archive_dir: Optional[str] = None,
+                batch_size: Optional[int] = None) -> int:
+    """
+    Write every usage row of ``day`` (UTC) to its Parquet partition.
+
+    Rows are streamed from the database in ``batch_size`` record batches and
+    the file is swapped in atomically, so re-archiving a day is safe.
+
+    Returns:
+        int: Rows written
+    """
+    _require_pyarrow()
+    start = datetime.combine(day, datetime.min.time())
+    path = day_path(day, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    rows = 0
+    query = (
+        select(*ARCHIVE_COLUMNS)
+        .where(Usage.timestamp >= start, Usage.timestamp < start + timedelta(days=1))
+        .order_by(Usage.id)
+    )
+    with engine.connect() as conn, pq.ParquetWriter(tmp_path, ARCHIVE_SCHEMA, compression="zstd") as writer:
+        result = conn.execution_options(
+            stream_results=True, yield_per=batch_size or USAGE_ARCHIVE_BATCH_SIZE
+        ).execute(query)
+        for batch in result.partitions():
+            columns = list(zip(*batch))
+            columns[5] = [s.value if isinstance(s, UsageStatus) else s for s in columns[5]]
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, ARCHIVE_SCHEMA)],
+                schema=ARCHIVE_SCHEMA,
+            ))
+            rows += len(batch)
+    os.replace(tmp_path, path)
+    return rows
+
+
+def closed_days_to_archive(engine, now: Optional[datetime] = None, archive_dir: Optional[str] = None,
+                           lookback_days: Optional[int] = None) -> List[date]:
+    """Closed days within the lookback window that have usage but no archive file."""
+    now = now or datetime.utcnow()
+    last_closed = (now - timedelta(hours=USAGE_ARCHIVE_GRACE_HOURS)).date() - timedelta(days=1)
+    first = last_closed - timedelta(days=(lookback_days or USAGE_ARCHIVE_LOOKBACK_DAYS) - 1)
+    with engine.connect() as conn:
+        oldest = conn.execute(
+            select(func.min(Usage.timestamp)).where(Usage.timestamp >= datetime.combine(first, datetime.min.time()))
+        ).scalar()
+    if oldest is None:
+        return []
+    done = set(archived_days(archive_dir))
+    day, days = max(first, oldest.date()), []
+    while day <= last_closed:
+        if day not in done:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def archive_closed_days(engine, now: Optional[datetime] = None, archive_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Scheduler job: archive every closed, not yet archived day."""
+    _require_pyarrow()
+    days = closed_days_to_archive(engine, now, archive_dir)
+    rows = 0
+    for day in days:
+        rows += archive_day(engine, day, archive_dir)
+    if days:
+        logger.info(f"Usage archive: {len(days)} days, {rows} rows")
+    return {"days": [d.isoformat() for d in days], "rows": rows}
+
+
+def _with_derived(table, group_by: Sequence[str]):
+    for name in ("status", "model_used"):
+        if name in table.column_names:
+            index = table.column_names.index(name)
+            table = table.set_column(index, name, pc.cast(table[name], pa.string()))
+    if "day" in group_by:
+        table = table.append_column("day", pc.strftime(table["timestamp"], format="%Y-%m-%d"))
+    if "hour" in group_by:
+        table = table.append_column("hour", pc.hour(table["timestamp"]))
+    if "text_length_bucket" in group_by:
+        bucket = pc.multiply(pc.divide(table["text_length"], TEXT_LENGTH_BUCKET), TEXT_LENGTH_BUCKET)
+        table = table.append_column("text_length_bucket", bucket)
+    return table
+
+
+def query_archive(start: date, end: date, group_by: Sequence[str],
+                  archive_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Aggregate archived usage for days ``start <= day < end``.
+
+    Args:
+        group_by: Keys from ``GROUP_KEYS`` (``hour`` is the UTC hour of day,
+            ``text_length_bucket`` the lower bound of a
+            ``USAGE_ANALYTICS_TEXT_BUCKET``-character bucket)
+
+    Returns:
+        dict: ``rows`` (one per group: keys plus ``requests``,
+        ``audio_seconds``, ``text_length``, ``error_rate``), ``days`` read
+        and ``rows_scanned``
+    """
+    _require_pyarrow()
+    unknown = set(group_by) - set(GROUP_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown group_by keys: {', '.join(sorted(unknown))}")
+
+    days = [d for d in archived_days(archive_dir) if start <= d < end]
+    if not days:
+        return {"rows": [], "days": 0, "rows_scanned": 0}
+
+    # Only the partitions in range are opened
+    dataset = ds.dataset([day_path(d, archive_dir) for d in days], format="parquet", schema=ARCHIVE_SCHEMA)
+    needed = {"status", "audio_seconds", "text_length", "timestamp"} | (set(group_by) & set(ARCHIVE_SCHEMA.names))
+    table = dataset.to_table(columns=sorted(needed))
+    table = _with_derived(table, group_by)
+    table = table.append_column(
+        "is_error", pc.cast(pc.not_equal(table["status"], "success"), pa.int8())
+    )
+
+    aggregated = table.group_by(list(group_by)).aggregate([
+        ([], "count_all"),
+        ("audio_seconds", "sum"),
+        ("text_length", "sum"),
+        ("is_error", "mean"),
+    ]) if group_by else pa.table({
+        "count_all": [table.num_rows],
+        "audio_seconds_sum": [pc.sum(table["audio_seconds"]).as_py()],
+        "text_length_sum": [pc.sum(table["text_length"]).as_py()],
+        "is_error_mean": [pc.mean(table["is_error"]).as_py()],
+    })
+    if group_by:
+        aggregated = aggregated.sort_by([(key, "ascending") for key in group_by])
+
+    renamed = {
+        "count_all": "requests",
+        "audio_seconds_sum": "audio_seconds",
+        "text_length_sum": "text_length",
+        "is_error_mean": "error_rate",
+    }
+    rows = [
+        {renamed.get(k, k): v for k, v in row.items()}
+        for row in aggregated.to_pylist()
+    ]
+    return {"rows": rows, "days": len(days), "rows_scanned": table.num_rows}
+
+
+if __name__ == "__main__":
+    import sys
+    from .database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1:
+        for arg in sys.argv[1:]:
+            count = archive_day(engine, date.fromisoformat(arg))
+            print(f"✅ Archived {count} rows for {arg}")
+    else:
+        result = archive_closed_days(engine)
+        print(f"✅ Archived {result['rows']} rows across {len(result['days'])} days")
@@ -0,0 +1,127 @@
+"""Streaming export of raw usage logs for billing.
+
+``iter_usage_export`` reads ``usage_logs`` rows in a time range through a
+server-side cursor (``stream_results``; a named cursor on PostgreSQL) and
+yields the CSV or NDJSON encoding one fetch batch
+(``USAGE_EXPORT_BATCH_SIZE`` rows) at a time, so memory stays flat however
+large the export is. Rows are plain tuples, never ORM objects.
+
+Rows come out in id order. The id bounds of the range are looked up first
+through the timestamp index, then the export walks the primary key between
+them, so an interrupted download resumes with ``after_id`` set to the id of
+the last row received.
+"""
+from __future__ import annotations
+import io
+import os
+import csv
+import enum
+import json
+from datetime import datetime, timezone
+from typing import Iterator, Optional, Tuple
+
+try:
+    from sqlalchemy import select, func
+except Exception:
+    select = func = None
+
+from .models import Usage
+
+USAGE_EXPORT_BATCH_SIZE = int(os.getenv("USAGE_EXPORT_BATCH_SIZE", "5000"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+EXPORT_COLUMNS = (
+    Usage.id, Usage.user_id, Usage.voice_id, Usage.text_length, Usage.audio_seconds,
+    Usage.status, Usage.model_used, Usage.timestamp,
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+def cycle_bounds(cycle: str) -> Tuple[datetime, datetime]:
+    """``[start, end)`` of a ``YYYY-MM`` billing cycle."""
+    start = datetime.strptime(cycle, "%Y-%m")
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _encode_csv(rows, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow(["" if v is None else _plain(v) for v in row])
+    return buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(rows, header: bool) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, map(_plain, row))), separators=(",", ":")) + "\n"
+        for row in rows
+    ).encode("utf-8")
+
+
+def iter_usage_export(
+    engine,
+    start: datetime,
+    end: datetime,
+    fmt: str = "csv",
+    after_id: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Yield an export of usage rows with ``start <= timestamp < end``.
+
+    Opens its own connection, so it can run after the request's session has
+    closed (as ``StreamingResponse`` bodies do).
+
+    Args:
+        engine: SQLAlchemy engine
+        start: Range start (inclusive)
+        end: Range end (exclusive)
+        fmt: ``csv`` (with a header row, unless resuming) or ``ndjson``
+        after_id: Resume after this row id
+        batch_size: Rows fetched (and encoded) per chunk
+    """
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    batch_size = batch_size or USAGE_EXPORT_BATCH_SIZE
+    in_range = (Usage.timestamp >= naive_utc(start), Usage.timestamp < naive_utc(end))
+
+    with engine.connect() as conn:
+        low, high = conn.execute(select(func.min(Usage.id), func.max(Usage.id)).where(*in_range)).one()
+        if low is None or (after_id is not None and after_id >= high):
+            if fmt == "csv" and after_id is None:
+                yield encode([], header=True)
+            return
+
+        query = (
+            select(*EXPORT_COLUMNS)
+            .where(Usage.id.between(max(low, (after_id or 0) + 1), high), *in_range)
+            .order_by(Usage.id)
+        )
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        header = after_id is None
+        for rows in result.partitions():
+            yield encode(rows, header=header)
+            header = False
+        if header:
+            yield encode([], header=True)
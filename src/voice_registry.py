@@ -0,0 +1,253 @@
+"""Voice registry: one indexed view over voices.json and the ``voices`` table.
+
+Each rebuild produces an immutable ``VoiceSnapshot`` with dict indexes by id,
+language prefix and gender. The registry swaps the snapshot atomically when
+the voices file's mtime, the table's signature (row count, newest id and
+``updated_at``, active count) or the shared generation bumped by
+``invalidate()`` changes, so adding or editing a voice needs no restart on
+any worker and request-time lookups are O(1).
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+try:
+    from sqlalchemy import func, case
+except Exception:
+    func = case = None
+
+from .database import SessionLocal
+from .models import Voice
+from .shared_state import SharedStore, get_shared_store
+
+logger = logging.getLogger(__name__)
+
+VOICES_FILE = os.getenv(
+    "VOICES_FILE", str(Path(__file__).resolve().parent.parent / "voices.json")
+)
+VOICE_REGISTRY_CHECK_SECONDS = float(os.getenv("VOICE_REGISTRY_CHECK_SECONDS", "2"))
+# Upper bound on lazily rendered filter combinations per snapshot
+VOICE_LIST_RENDER_CACHE_SIZE = 256
+GENERATION_KEY = "voice_registry:generation"
+
+# Used when voices.json is missing
+DEFAULT_VOICES = [
+    {"id": "marcus", "name": "Marcus", "minimax_voice_id": "moss_audio_a59cd561-ab87-11f0-a74c-2a7a0b4baedc"},
+    {"id": "marcy", "name": "Marcy", "minimax_voice_id": "moss_audio_fdad4786-ab84-11f0-a816-023f15327f7a"},
+    {"id": "austyn", "name": "Austyn", "minimax_voice_id": "moss_audio_4e6eb029-ab89-11f0-a74c-2a7a0b4baedc"},
+    {"id": "joslyn", "name": "Joslyn", "minimax_voice_id": "moss_audio_141d8c4c-a6f8-11f0-84c1-0ec6fa858d82"},
+]
+
+VoiceEntry = Mapping[str, Any]
+
+
+def public_voice(voice: VoiceEntry) -> Dict[str, Any]:
+    """Public fields of a voice as returned by ``/v1/voices/list``."""
+    return {
+        "id": voice["id"],
+        "name": voice["name"],
+        "description": voice.get("description", ""),
+        "language": voice.get("language", "en-US"),
+        "gender": voice.get("gender", "unknown"),
+        "accent": voice.get("accent", "unknown"),
+        "tone": voice.get("tone", "neutral"),
+        "use_cases": voice.get("use_cases", []),
+        "is_verified": voice.get("is_verified", False),
+    }
+
+
+class RenderedVoiceList:
+    """Pre-serialized ``/v1/voices/list`` body with its strong ETag."""
+    __slots__ = ("body", "etag")
+
+    def __init__(self, voices: Tuple[VoiceEntry, ...]):
+        self.body = json.dumps([public_voice(v) for v in voices], separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+
+class VoiceSnapshot:
+    """Immutable, indexed set of voices. Never mutated after construction."""
+
+    def __init__(self, voices: List[Dict[str, Any]], version: Tuple = ()):
+        self.version = version
+        self.voices: Tuple[VoiceEntry, ...] = tuple(MappingProxyType(dict(v)) for v in voices)
+        self.by_id: Dict[str, VoiceEntry] = {}
+        self.by_language: Dict[str, Tuple[VoiceEntry, ...]] = {}
+        self.by_gender: Dict[str, Tuple[VoiceEntry, ...]] = {}
+
+        by_language: Dict[str, List[VoiceEntry]] = {}
+        by_gender: Dict[str, List[VoiceEntry]] = {}
+        for voice in self.voices:
+            self.by_id.setdefault(voice["id"], voice)
+            if not voice.get("is_active", True):
+                continue
+            # Index every prefix so ?language=en and ?language=en-US both hit a dict
+            language = voice.get("language", "")
+            for end in range(1, len(language) + 1):
+                by_language.setdefault(language[:end], []).append(voice)
+            by_gender.setdefault(voice.get("gender", "").lower(), []).append(voice)
+
+        self.by_language = {k: tuple(v) for k, v in by_language.items()}
+        self.by_gender = {k: tuple(v) for k, v in by_gender.items()}
+        self.active: Tuple[VoiceEntry, ...] = tuple(v for v in self.voices if v.get("is_active", True))
+        self.default: Optional[VoiceEntry] = self.active[0] if self.active else None
+
+        # Render every (language, gender) filter the indexes know about up front
+        self._rendered: Dict[Tuple[Optional[str], Optional[str]], RenderedVoiceList] = {}
+        for language in [None, *self.by_language]:
+            for gender in [None, *self.by_gender]:
+                self._rendered[(language, gender)] = RenderedVoiceList(self.filter(language, gender))
+
+    def get(self, voice_id: str) -> Optional[VoiceEntry]:
+        """Look up a voice by id (active or not)."""
+        return self.by_id.get(voice_id)
+
+    def filter(self, language: Optional[str] = None, gender: Optional[str] = None) -> Tuple[VoiceEntry, ...]:
+        """Active voices whose language starts with ``language`` and gender matches."""
+        voices = self.active
+        if language:
+            voices = self.by_language.get(language, ())
+        if gender:
+            wanted = self.by_gender.get(gender.lower(), ())
+            if language:
+                wanted_ids = {id(v) for v in wanted}
+                voices = tuple(v for v in voices if id(v) in wanted_ids)
+            else:
+                voices = wanted
+        return voices
+
+    def rendered_list(self, language: Optional[str] = None, gender: Optional[str] = None) -> RenderedVoiceList:
+        """Serialized voice list for a filter; unseen filters are rendered once and kept."""
+        key = (language or None, gender.lower() if gender else None)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            rendered = RenderedVoiceList(self.filter(*key))
+            if len(self._rendered) < VOICE_LIST_RENDER_CACHE_SIZE:
+                self._rendered[key] = rendered
+        return rendered
+
+
+def _voice_from_row(row: Voice) -> Dict[str, Any]:
+    return {
+        "id": row.friendly_name,
+        "name": row.friendly_name,
+        "minimax_voice_id": row.minimax_voice_id,
+        "description": row.description or "",
+        "language": row.language,
+        "gender": row.gender.value if row.gender else "unknown",
+        "is_cloned": row.is_cloned,
+        "is_active": row.is_active,
+        "is_verified": False,
+    }
+
+
+class VoiceRegistry:
+    """
+    Thread-safe holder of the current ``VoiceSnapshot``.
+
+    Change detection runs at most every ``check_interval`` seconds: one
+    ``stat()`` of the voices file, one aggregate query on ``voices`` and one
+    read of the shared generation. Readers never block; they get whichever
+    snapshot is current.
+    """
+
+    def __init__(self, path: str = VOICES_FILE, session_factory=None,
+                 check_interval: float = VOICE_REGISTRY_CHECK_SECONDS,
+                 store: Optional[SharedStore] = None):
+        self.path = path
+        self.session_factory = session_factory
+        self.check_interval = check_interval
+        self._store = store
+        self._lock = threading.Lock()
+        self._snapshot: Optional[VoiceSnapshot] = None
+        self._next_check = 0.0
+
+    @property
+    def store(self) -> SharedStore:
+        return self._store or get_shared_store()
+
+    def snapshot(self) -> VoiceSnapshot:
+        """Return the current snapshot, rebuilding it if its sources changed."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() < self._next_check:
+                return self._snapshot
+            version = (self._file_mtime(), self._db_signature(), self._shared_generation())
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = VoiceSnapshot(self._load(), version)
+                logger.info(f"Voice registry loaded {len(self._snapshot.voices)} voices")
+            self._next_check = time.monotonic() + self.check_interval
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """
+        Rebuild on every worker: here on the next ``snapshot()`` call, and in
+        other processes at their next check, even for changes the table's
+        signature can't see (voices.json on another host, raw SQL edits).
+        """
+        self.store.incr(GENERATION_KEY)
+        self._next_check = 0.0
+
+    def _shared_generation(self) -> int:
+        return int(self.store.get(GENERATION_KEY) or 0)
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _db_signature(self) -> Optional[Tuple]:
+        if self.session_factory is None:
+            return None
+        db = self.session_factory()
+        try:
+            return tuple(db.query(
+                func.count(Voice.id),
+                func.max(Voice.id),
+                func.max(Voice.updated_at),
+                func.sum(case((Voice.is_active, 1), else_=0)),
+            ).one())
+        except Exception:
+            return None
+        finally:
+            db.close()
+
+    def _load(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.path, "r") as f:
+                voices = list(json.load(f).get("voices", []))
+        except FileNotFoundError:
+            logger.warning(f"{self.path} not found, using default voices")
+            voices = [dict(v) for v in DEFAULT_VOICES]
+        except (OSError, ValueError) as e:
+            # Keep serving the previous snapshot rather than an empty registry
+            if self._snapshot is not None:
+                logger.error(f"Failed to reload {self.path}: {e}")
+                return [dict(v) for v in self._snapshot.voices]
+            raise
+
+        if self.session_factory is not None:
+            known = {v["id"] for v in voices}
+            db = self.session_factory()
+            try:
+                for row in db.query(Voice).order_by(Voice.id).all():
+                    if row.friendly_name not in known:
+                        voices.append(_voice_from_row(row))
+            except Exception as e:
+                logger.warning(f"Voice registry could not read voices table: {e}")
+            finally:
+                db.close()
+        return voices
+
+
+voice_registry = VoiceRegistry(session_factory=SessionLocal)
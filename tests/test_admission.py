@@ -0,0 +1,167 @@
+from __future__ import annotations
+import os
+import json
+import base64
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import main
+from src.admission import AudioBudget, estimate_audio_bytes, MIB
+from src.audio_store import LocalAudioStore, audio_id_for
+from src.dependencies import get_db, get_current_user
+from src.minimax_client import MinimaxAPIError
+from src.models import Base, User, Plan
+
+AUDIO = bytes(range(256)) * 1000
+
+
+class FakeMinimax:
+    fail = False
+    spill_paths = []
+    spill_files = []
+
+    def text_to_speech(self, text, encode_base64=True, spill_file=None, **kwargs):
+        audio = bytearray(AUDIO)
+        if spill_file is not None:
+            FakeMinimax.spill_paths.append(spill_file.name)
+            FakeMinimax.spill_files.append(spill_file)
+        if self.fail:
+            raise MinimaxAPIError(500, "upstream down")
+        if spill_file is not None:
+            spill_file.write(audio)
+            audio = None
+        return {
+            "audio_data": audio,
+            "audio_base64": base64.b64encode(audio).decode() if audio is not None and encode_base64 else None,
+            "audio_size": len(AUDIO),
+            "duration_seconds": 2.0,
+            "sample_rate": 32000,
+        }
+
+
+class TestAudioBudget(unittest.TestCase):
+    def test_estimate_scales_with_text_and_speed(self):
+        base = estimate_audio_bytes(1500, "speech-02-hd")
+        # 100 s of 128 kbps audio, plus the margin
+        self.assertEqual(base, int(100 * 16000 * 1.25))
+        self.assertEqual(estimate_audio_bytes(3000, "speech-02-hd"), 2 * base)
+        self.assertEqual(estimate_audio_bytes(1500, "speech-02-hd", speed=2.0), base // 2)
+
+    def test_memory_then_spill_then_reject(self):
+        budget = AudioBudget(memory_budget=10 * MIB, spill_threshold=6 * MIB,
+                             spill_budget=8 * MIB, spill_reserve=1 * MIB)
+        in_memory = budget.reserve(2 * MIB, copies=2)
+        self.assertFalse(in_memory.spill)
+        self.assertEqual(budget.memory_in_use, 4 * MIB)
+
+        spilled = [budget.reserve(4 * MIB), budget.reserve(4 * MIB)]
+        self.assertTrue(all(r.spill for r in spilled))
+        self.assertEqual((budget.memory_in_use, budget.spill_in_use), (6 * MIB, 8 * MIB))
+        self.assertIsNone(budget.reserve(1 * MIB, copies=2))
+
+        spilled[0].release()
+        spilled[0].release()
+        self.assertEqual((budget.memory_in_use, budget.spill_in_use), (5 * MIB, 4 * MIB))
+        self.assertIsNotNone(budget.reserve(1 * MIB))
+        self.assertEqual(budget.counters, {"admitted": 4, "spilled": 2, "rejected": 1})
+
+    def test_oversized_clip_spills_alone(self):
+        budget = AudioBudget(memory_budget=4 * MIB, spill_threshold=2 * MIB, spill_budget=8 * MIB)
+        self.assertTrue(budget.reserve(100 * MIB).spill)
+        self.assertIsNone(budget.reserve(3 * MIB))
+
+    def test_release_deletes_spill_files(self):
+        reservation = AudioBudget(spill_threshold=0).reserve(1000)
+        with reservation.spill_file() as f:
+            f.write(b"audio")
+        self.assertTrue(os.path.exists(f.name))
+        reservation.release()
+        self.assertFalse(os.path.exists(f.name))
+
+
+class TestAdmissionEndpoint(unittest.TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.store = LocalAudioStore(root)
+        # Everything spills: nothing fits under the threshold
+        self.budget = AudioBudget(memory_budget=8 * MIB, spill_threshold=0, spill_budget=64 * MIB,
+                                  spill_reserve=MIB)
+        FakeMinimax.fail = False
+        FakeMinimax.spill_paths = []
+        FakeMinimax.spill_files = []
+
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        self.addCleanup(db.close)
+        user = User(name="a", email="a@test.com", api_key_hash="h", plan=Plan.PRO,
+                    quota_seconds=100.0, used_seconds=0.0)
+        db.add(user)
+        db.commit()
+
+        def override_db():
+            yield db
+
+        main.app.dependency_overrides[get_db] = override_db
+        main.app.dependency_overrides[get_current_user] = lambda: user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        for target, value in (("MinimaxClient", FakeMinimax), ("get_audio_store", lambda: self.store),
+                              ("audio_budget", self.budget)):
+            patcher = mock.patch.object(main, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def post(self, accept=None, **fields):
+        headers = {"Accept": accept} if accept else {}
+        return self.client.post("/v1/tts", json={"text": "Hello there", **fields}, headers=headers)
+
+    def assertReleased(self):
+        self.assertEqual((self.budget.memory_in_use, self.budget.spill_in_use), (0, 0))
+        self.assertTrue(FakeMinimax.spill_paths)
+        self.assertFalse(any(os.path.exists(p) for p in FakeMinimax.spill_paths))
+
+    def test_spilled_json_is_streamed_from_disk(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertEqual(base64.b64decode(body["audio_base64"]), AUDIO)
+        self.assertEqual(body["remaining_quota"], 98.0)
+        self.assertIsNone(body["audio_url"])
+        self.assertReleased()
+
+    def test_spilled_binary_and_url(self):
+        response = self.post("audio/mpeg")
+        self.assertEqual(response.content, AUDIO)
+        self.assertEqual(response.headers["x-audio-duration"], "2.000")
+
+        body = self.post(delivery="url").json()
+        self.assertTrue(body["audio_url"].endswith(audio_id_for(AUDIO)))
+        self.assertEqual(self.client.get(body["audio_url"]).content, AUDIO)
+        self.assertReleased()
+
+    def test_failed_synthesis_closes_spill_file(self):
+        FakeMinimax.fail = True
+        response = self.post()
+        self.assertEqual(response.status_code, 200)  # silent fallback
+        self.assertTrue(all(f.closed for f in FakeMinimax.spill_files))
+        self.assertReleased()
+
+    def test_over_budget_gets_503(self):
+        self.budget.memory_in_use = self.budget.memory_budget
+        response = self.post()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "2")
+        self.assertEqual(self.budget.counters["rejected"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
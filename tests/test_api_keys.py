@@ -0,0 +1,113 @@
+from __future__ import annotations
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import api_keys
+from src.api_keys import (
+    issue_api_key, parse_key_id, verify_key_secret, hash_key_secret,
+    resolve_api_key_user, rotate_user_api_key, VerifiedKeyCache, verified_keys,
+)
+from src.auth import generate_api_key, hash_api_key
+from src.models import Base, User, Plan
+
+
+class TestKeyFormat(unittest.TestCase):
+    def test_issue_and_verify(self):
+        api_key, key_id, stored = issue_api_key()
+        self.assertEqual(parse_key_id(api_key), key_id)
+        self.assertTrue(stored.startswith("pbkdf2_sha256$"))
+        self.assertTrue(verify_key_secret(api_key, stored))
+        self.assertFalse(verify_key_secret(api_key + "x", stored))
+
+    def test_iterations_are_stored(self):
+        stored = hash_key_secret("odk_abc", iterations=1000)
+        self.assertTrue(stored.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(verify_key_secret("odk_abc", stored))
+
+    def test_legacy_keys_have_no_key_id(self):
+        self.assertIsNone(parse_key_id(generate_api_key()))
+        self.assertIsNone(parse_key_id("odk_short_secret"))
+
+
+class TestVerifiedKeyCache(unittest.TestCase):
+    def test_ttl_and_forget(self):
+        cache = VerifiedKeyCache(ttl=0.05, max_size=10)
+        cache.put("k1", 1, "h1")
+        cache.put("k2", 2, "h2")
+        self.assertEqual(cache.get("k1"), (1, "h1"))
+        cache.forget_user(2)
+        self.assertIsNone(cache.get("k2"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k1"))
+
+    def test_bounded(self):
+        cache = VerifiedKeyCache(ttl=60, max_size=2)
+        for i in range(3):
+            cache.put(f"k{i}", i, f"h{i}")
+        self.assertIsNone(cache.get("k0"))
+        self.assertEqual(cache.get("k2"), (2, "h2"))
+
+
+class TestResolveUser(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        verified_keys.clear()
+
+    def tearDown(self):
+        self.db.close()
+        verified_keys.clear()
+
+    def add_user(self, email, **key_columns):
+        user = User(name=email, email=email, plan=Plan.FREE, **key_columns)
+        self.db.add(user)
+        self.db.commit()
+        return user
+
+    def test_prefixed_key_verifies_once(self):
+        api_key, key_id, stored = issue_api_key()
+        user = self.add_user("a@test.com", api_key_prefix=key_id, api_key_hash=stored)
+
+        with mock.patch.object(api_keys, "verify_key_secret", wraps=verify_key_secret) as verify:
+            self.assertEqual(resolve_api_key_user(self.db, api_key).id, user.id)
+            self.assertEqual(resolve_api_key_user(self.db, api_key).id, user.id)
+        self.assertEqual(verify.call_count, 1)
+
+        wrong = f"odk_{key_id}_{generate_api_key()}"
+        self.assertIsNone(resolve_api_key_user(self.db, wrong))
+
+    def test_legacy_key_and_rotation(self):
+        legacy = generate_api_key()
+        user = self.add_user("b@test.com", api_key_hash=hash_api_key(legacy))
+        self.assertEqual(resolve_api_key_user(self.db, legacy).id, user.id)
+
+        new_key = rotate_user_api_key(self.db, user)
+        self.assertIsNone(resolve_api_key_user(self.db, legacy))
+        self.assertEqual(resolve_api_key_user(self.db, new_key).id, user.id)
+        self.assertEqual(user.api_key_prefix, parse_key_id(new_key))
+
+    def test_rotation_by_another_worker_invalidates_cached_key(self):
+        api_key, key_id, stored = issue_api_key()
+        user = self.add_user("d@test.com", api_key_prefix=key_id, api_key_hash=stored)
+        self.assertEqual(resolve_api_key_user(self.db, api_key).id, user.id)
+        # That worker's cache, not this one's, forgets the key
+        with mock.patch.object(verified_keys, "forget_user"):
+            rotate_user_api_key(self.db, user)
+        self.assertIsNotNone(verified_keys.get(api_key))
+        self.assertIsNone(resolve_api_key_user(self.db, api_key))
+
+    def test_legacy_keys_can_be_disabled(self):
+        legacy = generate_api_key()
+        self.add_user("c@test.com", api_key_hash=hash_api_key(legacy))
+        with mock.patch.object(api_keys, "ALLOW_LEGACY_API_KEYS", False):
+            self.assertIsNone(resolve_api_key_user(self.db, legacy))
+
+
+if __name__ == "__main__":
+    unittest.main()
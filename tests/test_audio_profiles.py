@@ -0,0 +1,161 @@
+from __future__ import annotations
+import json
+import base64
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import main
+from src.audio_profiles import (
+    AudioFormat, AUDIO_PROFILES, audio_format, resolve_output_format, upstream_format, upstream_duration,
+)
+from src.dependencies import get_db, get_current_user
+from src.minimax_client import MinimaxClient
+from src.models import Base, User, Plan, PLAN_CONFIGS
+from src.schemas import TTSRequest
+
+AUDIO = b"\xff\xf3\x44\xc4" * 500
+
+
+class TestResolveOutputFormat(unittest.TestCase):
+    def test_profiles_and_plan_defaults(self):
+        self.assertEqual(resolve_output_format("whatsapp"), AudioFormat("mp3", 16000, 32000, 1))
+        self.assertEqual(resolve_output_format(None, "web"), AUDIO_PROFILES["web"])
+        self.assertEqual(resolve_output_format(None), AudioFormat())
+        for config in PLAN_CONFIGS.values():
+            self.assertIn(config["audio_profile"], AUDIO_PROFILES)
+        with self.assertRaises(ValueError):
+            resolve_output_format("opus")
+
+    def test_explicit_format(self):
+        request = TTSRequest(text="hi", output_format={"format": "mp3", "sample_rate": 22050, "bitrate": 64000})
+        self.assertEqual(resolve_output_format(request.output_format), AudioFormat("mp3", 22050, 64000, 1))
+        # bitrate only means something for MP3
+        self.assertIsNone(audio_format("wav", 8000, 64000).bitrate)
+        self.assertEqual(AUDIO_PROFILES["telephony"].audio_setting(),
+                         {"format": "wav", "sample_rate": 8000, "channel": 1})
+        with self.assertRaises(ValueError):
+            audio_format("mp3", 48000)
+
+    def test_upstream_extra_info(self):
+        requested = AUDIO_PROFILES["web"]
+        self.assertEqual(upstream_format(None, requested), requested)
+        reported = {"audio_format": "mp3", "audio_sample_rate": 24000, "bitrate": 64000,
+                    "audio_channel": 1, "audio_length": 2350}
+        self.assertEqual(upstream_format(reported, requested), requested)
+        self.assertEqual(upstream_duration(reported), 2.35)
+        self.assertIsNone(upstream_duration({}))
+
+
+class FakeSession:
+    def __init__(self):
+        self.payloads = []
+
+    def post(self, url, **kwargs):
+        payload = kwargs["json"]
+        self.payloads.append(payload)
+        setting = payload.get("audio_setting", {})
+        body = (
+            b'{"data": {"audio": "' + AUDIO.hex().encode() + b'"}, "extra_info": '
+            + json.dumps({
+                "audio_format": setting.get("format", "mp3"),
+                "audio_sample_rate": setting.get("sample_rate", 32000),
+                "bitrate": setting.get("bitrate", 128000),
+                "audio_channel": setting.get("channel", 1),
+                "audio_length": 1250,
+            }).encode()
+            + b', "base_resp": {"status_code": 0, "status_msg": "success"}}'
+        )
+        response = mock.MagicMock(status_code=200, headers={"Content-Length": str(len(body))})
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [body]
+        return response
+
+
+class TestClientAudioSetting(unittest.TestCase):
+    def test_audio_setting_sent_and_reported(self):
+        session = FakeSession()
+        client = MinimaxClient(api_key="key", group_id="1")
+        with mock.patch("src.minimax_client.get_http_session", return_value=session), \
+                mock.patch("builtins.print"):
+            result = client.text_to_speech("hello", "voice", audio_format=AUDIO_PROFILES["whatsapp"])
+        self.assertEqual(session.payloads[0]["audio_setting"],
+                         {"format": "mp3", "sample_rate": 16000, "bitrate": 32000, "channel": 1})
+        self.assertEqual(result["audio_format"], AUDIO_PROFILES["whatsapp"])
+        self.assertEqual(result["sample_rate"], 16000)
+        self.assertEqual(result["duration_seconds"], 1.25)
+
+
+class FakeMinimax:
+    calls = []
+
+    def text_to_speech(self, text, audio_format=None, **kwargs):
+        self.calls.append(audio_format)
+        return {
+            "audio_data": AUDIO,
+            "audio_base64": None,
+            "duration_seconds": 1.25,
+            "sample_rate": audio_format.sample_rate,
+            "audio_format": audio_format,
+        }
+
+
+class TestTTSOutputFormat(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        self.user = User(name="a", email="a@test.com", api_key_hash="h", plan=Plan.FREE,
+                         quota_seconds=100.0, used_seconds=0.0)
+        db.add(self.user)
+        db.commit()
+
+        def override_db():
+            yield db
+
+        main.app.dependency_overrides[get_db] = override_db
+        main.app.dependency_overrides[get_current_user] = lambda: self.user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.addCleanup(db.close)
+        FakeMinimax.calls = []
+        patcher = mock.patch.object(main, "MinimaxClient", FakeMinimax)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def test_plan_default_profile(self):
+        response = self.client.post("/v1/tts", json={"text": "Hello there"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FakeMinimax.calls, [AUDIO_PROFILES["web"]])
+        body = json.loads(response.content)
+        self.assertEqual((body["format"], body["sample_rate"], body["bitrate"], body["channels"]),
+                         ("mp3", 24000, 64000, 1))
+        self.assertEqual(base64.b64decode(body["audio_base64"]), AUDIO)
+
+    def test_profile_negotiates_its_media_type(self):
+        response = self.client.post("/v1/tts", json={"text": "Hello there", "output_format": "telephony"},
+                                    headers={"Accept": "audio/wav"})
+        self.assertEqual(response.headers["content-type"], "audio/wav")
+        self.assertEqual(response.headers["x-sample-rate"], "8000")
+        self.assertNotIn("x-bitrate", response.headers)
+        # An MP3 Accept doesn't match a WAV profile: JSON is the fallback default
+        response = self.client.post("/v1/tts", json={"text": "Hello there", "output_format": "telephony"},
+                                    headers={"Accept": "audio/mpeg, application/json;q=0.5"})
+        self.assertEqual(response.headers["content-type"], "application/json")
+
+    def test_explicit_format_and_unknown_profile(self):
+        response = self.client.post("/v1/tts", json={
+            "text": "Hello there", "output_format": {"format": "mp3", "sample_rate": 44100, "bitrate": 256000},
+        }, headers={"Accept": "audio/mpeg"})
+        self.assertEqual(response.headers["x-bitrate"], "256000")
+        self.assertEqual(FakeMinimax.calls, [AudioFormat("mp3", 44100, 256000, 1)])
+        response = self.client.post("/v1/tts", json={"text": "Hello there", "output_format": "opus"})
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
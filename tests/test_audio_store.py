@@ -0,0 +1,172 @@
+from __future__ import annotations
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import main
+from src.audio_store import LocalAudioStore, S3AudioStore, audio_id_for, create_audio_store
+from src.dependencies import get_db, get_current_user
+from src.http_cache import byte_range
+from src.models import Base, User, Plan
+
+AUDIO = bytes(range(256)) * 400
+
+
+class NotFound(Exception):
+    response = {"ResponseMetadata": {"HTTPStatusCode": 404}}
+
+
+class FakeS3:
+    """The slice of the boto3 S3 client the store uses."""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = 0
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NotFound()
+        return {"ContentLength": len(self.objects[Bucket, Key])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.puts += 1
+        self.objects[Bucket, Key] = bytes(Body)
+
+    def get_object(self, Bucket, Key, Range):
+        data = self.objects[Bucket, Key]
+        first, last = Range[6:].split("-")
+        body = io.BytesIO(data[int(first):int(last) + 1 if last else None])
+        body.iter_chunks = lambda size: iter(lambda: body.read(size), b"")
+        return {"Body": body}
+
+
+class FakeMinimax:
+    def text_to_speech(self, text, encode_base64=True, **kwargs):
+        return {"audio_data": bytearray(AUDIO), "audio_base64": None,
+                "duration_seconds": 2.0, "sample_rate": 32000}
+
+
+class TestByteRange(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(byte_range("bytes=0-99", 1000), (0, 100))
+        self.assertEqual(byte_range("bytes=900-", 1000), (900, 1000))
+        self.assertEqual(byte_range("bytes=-100", 1000), (900, 1000))
+        self.assertEqual(byte_range("bytes=0-5000", 1000), (0, 1000))
+        for ignored in (None, "bytes=0-1,5-6", "items=0-1", "bytes=x-", "bytes=-", "bytes=9-2"):
+            self.assertIsNone(byte_range(ignored, 1000))
+        for unsatisfiable in ("bytes=1000-", "bytes=-0"):
+            with self.assertRaises(ValueError):
+                byte_range(unsatisfiable, 1000)
+
+
+class TestStores(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_local_store_is_content_addressed(self):
+        store = create_audio_store(f"file://{self.root}")
+        audio_id = store.put(AUDIO)
+        self.assertEqual(audio_id, audio_id_for(AUDIO))
+        self.assertEqual(store.put(bytearray(AUDIO)), audio_id)
+        obj = store.stat(audio_id)
+        self.assertEqual((obj.size, obj.media_type), (len(AUDIO), "audio/mpeg"))
+        self.assertEqual(b"".join(store.read(audio_id, 10, 20)), AUDIO[10:20])
+        self.assertEqual(os.listdir(os.path.dirname(obj.path)), [audio_id])
+
+    def test_malformed_ids_never_touch_the_filesystem(self):
+        store = LocalAudioStore(self.root)
+        for audio_id in ("../../etc/passwd", "abc.mp3", audio_id_for(AUDIO, "wav") + "x"):
+            self.assertIsNone(store.stat(audio_id))
+
+    def test_s3_store(self):
+        s3 = FakeS3()
+        store = S3AudioStore("bucket", "audio/", client=s3)
+        audio_id = store.put(AUDIO)
+        store.put(AUDIO)
+        self.assertEqual(s3.puts, 1)
+        self.assertIn(("bucket", f"audio/{audio_id}"), s3.objects)
+        self.assertEqual(store.stat(audio_id).size, len(AUDIO))
+        self.assertIsNone(store.stat(audio_id_for(b"other")))
+        self.assertEqual(b"".join(store.read(audio_id, 100)), AUDIO[100:])
+
+
+class TestAudioEndpoints(unittest.TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.store = LocalAudioStore(root)
+
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        self.addCleanup(db.close)
+        user = User(name="a", email="a@test.com", api_key_hash="h", plan=Plan.PRO,
+                    quota_seconds=100.0, used_seconds=0.0)
+        db.add(user)
+        db.commit()
+
+        def override_db():
+            yield db
+
+        main.app.dependency_overrides[get_db] = override_db
+        main.app.dependency_overrides[get_current_user] = lambda: user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        for target, value in (("MinimaxClient", FakeMinimax), ("get_audio_store", lambda: self.store)):
+            patcher = mock.patch.object(main, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def generate(self):
+        response = self.client.post("/v1/tts", json={"text": "Hello", "delivery": "url"},
+                                    headers={"Accept": "audio/mpeg"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_url_delivery(self):
+        body = self.generate()
+        self.assertIsNone(body["audio_base64"])
+        self.assertTrue(body["audio_url"].endswith(f"/v1/audio/{audio_id_for(AUDIO)}"))
+
+        response = self.client.get(body["audio_url"])
+        self.assertEqual(response.content, AUDIO)
+        self.assertEqual(response.headers["content-type"], "audio/mpeg")
+        self.assertIn("immutable", response.headers["cache-control"])
+        self.assertEqual(response.headers["etag"], f'"{audio_id_for(AUDIO).split(".")[0]}"')
+
+    def test_conditional_and_range_requests(self):
+        url = self.generate()["audio_url"]
+        etag = self.client.get(url).headers["etag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+
+        partial = self.client.get(url, headers={"Range": "bytes=100-199"})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.content, AUDIO[100:200])
+        self.assertEqual(partial.headers["content-range"], f"bytes 100-199/{len(AUDIO)}")
+        self.assertEqual(self.client.get(url, headers={"Range": "bytes=100-199", "If-Range": '"stale"'}).status_code, 200)
+
+    def test_s3_backed_range(self):
+        self.store = S3AudioStore("bucket", client=FakeS3())
+        url = self.generate()["audio_url"]
+        partial = self.client.get(url, headers={"Range": "bytes=-56"})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.content, AUDIO[-56:])
+        self.assertEqual(self.client.get(url).content, AUDIO)
+        self.assertEqual(self.client.get(url, headers={"Range": f"bytes={len(AUDIO)}-"}).status_code, 416)
+
+    def test_unknown_audio(self):
+        self.assertEqual(self.client.get(f"/v1/audio/{audio_id_for(b'nothing')}").status_code, 404)
+        self.assertEqual(self.client.get("/v1/audio/not-an-id").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
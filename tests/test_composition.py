@@ -0,0 +1,235 @@
+from __future__ import annotations
+import io
+import time
+import wave
+import base64
+import threading
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import main
+from src.audio_profiles import AUDIO_PROFILES, AudioFormat
+from src.composition import (
+    mp3_audio, mp3_header_for, parse_mp3_header, stitch, synthesize_concurrently, wav_audio,
+)
+from src.dependencies import get_db, get_current_user
+from src.minimax_client import MinimaxAPIError
+from src.models import Base, User, Plan, Usage
+from src.silence import mp3_silence, pcm_silence, silent_mp3_frame
+
+MP3 = AUDIO_PROFILES["default"]  # 32 kHz, 128 kbps mono: 576-byte frames of 36 ms
+
+
+def mp3_clip(fmt: AudioFormat, frames: int, fill: int = 0x55) -> bytes:
+    """Frames wrapped the way encoders write them: ID3v2 tag, Info frame, ID3v1 tag."""
+    header = mp3_header_for(fmt)
+    info = bytearray(header.frame_length)
+    info[:4] = header.raw
+    info[4 + header.side_info_length:8 + header.side_info_length] = b"Info"
+    frame = header.raw + bytes([fill]) * (header.frame_length - 4)
+    id3 = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + bytes(10)
+    return id3 + bytes(info) + frame * frames + b"TAG" + bytes(125)
+
+
+def wav_clip(seconds: float, sample_rate: int = 8000, value: int = 1000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(value.to_bytes(2, "little", signed=True) * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def frame_walk(data: bytes):
+    """Headers of the consecutive frames in ``data``, which must be frames only."""
+    pos, headers = 0, []
+    while pos < len(data):
+        header = parse_mp3_header(data, pos)
+        assert header is not None, f"no frame at {pos}"
+        headers.append(header)
+        pos += header.frame_length
+    assert pos == len(data)
+    return headers
+
+
+class TestMP3(unittest.TestCase):
+    def test_headers_for_profiles(self):
+        for fmt in AUDIO_PROFILES.values():
+            if fmt.format != "mp3":
+                continue
+            header = mp3_header_for(fmt)
+            self.assertEqual((header.sample_rate, header.bitrate, header.channels),
+                             (fmt.sample_rate, fmt.bitrate, fmt.channels))
+        self.assertEqual(mp3_header_for(AudioFormat("mp3", 44100, 128000, 1)).frame_length, 417)
+        # MPEG-2 tops out at 160 kbps
+        self.assertEqual(mp3_header_for(AudioFormat("mp3", 16000, 256000, 1)).bitrate, 160000)
+
+    def test_tags_and_info_frame_dropped(self):
+        frames, header, samples = mp3_audio(mp3_clip(MP3, 10))
+        self.assertEqual(len(frames), 10 * 576)
+        self.assertEqual(samples, 10 * 1152)
+        self.assertEqual(bytes(frames[4:8]), b"\x55" * 4)
+        with self.assertRaises(ValueError):
+            mp3_audio(b"not audio")
+
+    def test_silent_frames_cached(self):
+        header = mp3_header_for(MP3)
+        frame = silent_mp3_frame(header)
+        self.assertIs(silent_mp3_frame(header), frame)
+        self.assertEqual(frame, header.raw + bytes(572))
+        self.assertEqual(len(mp3_silence(header, 0.36)), 10 * 576)
+
+    def test_stitch_is_one_frame_stream(self):
+        stitched = stitch([mp3_clip(MP3, 10), 0.5, mp3_clip(MP3, 5, fill=0x66)], MP3)
+        headers = frame_walk(stitched.audio)
+        silent = round(0.5 * 32000 / 1152)
+        self.assertEqual(len(headers), 15 + silent)
+        self.assertAlmostEqual(stitched.duration_seconds, (15 + silent) * 1152 / 32000)
+        self.assertEqual(stitched.audio[10 * 576 + 4:10 * 576 + 8], bytes(4))
+        self.assertEqual(stitched.audio[-4:], b"\x66" * 4)
+
+    def test_mismatched_clips_rejected(self):
+        with self.assertRaises(ValueError):
+            stitch([mp3_clip(MP3, 2), mp3_clip(AUDIO_PROFILES["web"], 2)], MP3)
+        with self.assertRaises(ValueError):
+            stitch([b"fLaC"], AudioFormat("flac", 32000, None, 1))
+
+
+class TestWav(unittest.TestCase):
+    def test_stitch(self):
+        fmt = AUDIO_PROFILES["telephony"]
+        stitched = stitch([wav_clip(0.5), 0.25, wav_clip(0.25, value=-1000)], fmt)
+        self.assertAlmostEqual(stitched.duration_seconds, 1.0)
+        with wave.open(io.BytesIO(stitched.audio)) as w:
+            self.assertEqual((w.getframerate(), w.getnchannels(), w.getnframes()), (8000, 1, 8000))
+            samples = w.readframes(8000)
+        self.assertEqual(samples[4000 * 2:6000 * 2], bytes(4000))
+        self.assertEqual(samples[-2:], (-1000).to_bytes(2, "little", signed=True))
+        self.assertEqual(len(pcm_silence(0.5, 8000)), 8000)
+        self.assertEqual(len(wav_audio(stitched.audio)[0]), 16000)
+
+
+class TestSynthesizeConcurrently(unittest.TestCase):
+    def test_bounded_and_ordered(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def work(n):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return n * 2
+
+        start = time.perf_counter()
+        self.assertEqual(synthesize_concurrently(work, list(range(6)), limit=3), [0, 2, 4, 6, 8, 10])
+        self.assertEqual(peak[0], 3)
+        self.assertLess(time.perf_counter() - start, 0.25)
+
+    def test_first_failure_raised(self):
+        def work(n):
+            if n == 1:
+                raise MinimaxAPIError(500, "down")
+            return n
+
+        with self.assertRaises(MinimaxAPIError):
+            synthesize_concurrently(work, [0, 1, 2])
+
+
+class FakeMinimax:
+    delay = 0.2
+    fail = False
+
+    def text_to_speech(self, text, voice_id, emotion="neutral", audio_format=None, **kwargs):
+        time.sleep(self.delay)
+        if self.fail:
+            raise MinimaxAPIError(1008, "no balance")
+        if audio_format.format == "wav":
+            audio = wav_clip(len(text) / 10, audio_format.sample_rate)
+        else:
+            audio = mp3_clip(audio_format, len(text))
+        return {
+            "audio_data": audio,
+            "audio_base64": None,
+            "duration_seconds": len(text) * 1152 / audio_format.sample_rate,
+            "sample_rate": audio_format.sample_rate,
+            "audio_format": audio_format,
+        }
+
+
+class TestDialogueEndpoint(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.user = User(name="a", email="a@test.com", api_key_hash="h", plan=Plan.PRO,
+                         quota_seconds=100.0, used_seconds=0.0)
+        self.db.add(self.user)
+        self.db.commit()
+
+        def override_db():
+            yield self.db
+
+        main.app.dependency_overrides[get_db] = override_db
+        main.app.dependency_overrides[get_current_user] = lambda: self.user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.addCleanup(self.db.close)
+        FakeMinimax.fail = False
+        patcher = mock.patch.object(main, "MinimaxClient", FakeMinimax)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def test_turns_synthesized_concurrently_and_stitched(self):
+        turns = [
+            {"voice_name": "marcus", "text": "Thanks for calling."},
+            {"voice_name": "joslyn", "text": "Please hold.", "gap_ms": 1000},
+            {"voice_name": "marcus", "text": "Connecting you now."},
+        ]
+        start = time.perf_counter()
+        response = self.client.post("/v1/tts/dialogue", json={"turns": turns, "gap_ms": 500})
+        elapsed = time.perf_counter() - start
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertLess(elapsed, 2 * FakeMinimax.delay)
+        body = response.json()
+        headers = frame_walk(base64.b64decode(body["audio_base64"]))
+        speech_frames = sum(len(turn["text"]) for turn in turns)
+        silent_frames = round(0.5 * 32000 / 1152) + round(1.0 * 32000 / 1152)
+        self.assertEqual(len(headers), speech_frames + silent_frames)
+        self.assertAlmostEqual(body["duration_seconds"], len(headers) * 1152 / 32000)
+        self.assertEqual(body["voice_used"], "marcus,joslyn")
+        # Billed per turn, silence excluded
+        self.assertEqual(self.db.query(Usage).count(), 3)
+        self.assertAlmostEqual(self.user.used_seconds, speech_frames * 1152 / 32000)
+
+    def test_wav_binary_and_rejections(self):
+        response = self.client.post("/v1/tts/dialogue", json={
+            "turns": [{"text": "a"}, {"text": "b"}], "output_format": "telephony",
+        }, headers={"Accept": "audio/wav"})
+        self.assertEqual(response.headers["content-type"], "audio/wav")
+        with wave.open(io.BytesIO(response.content)) as w:
+            # 0.1 s per character, 0.4 s default gap
+            self.assertEqual((w.getframerate(), w.getnframes()), (8000, 4800))
+        response = self.client.post("/v1/tts/dialogue", json={
+            "turns": [{"text": "a"}], "output_format": {"format": "flac"},
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/v1/tts/dialogue", json={"turns": [{"voice_name": "nobody", "text": "a"}]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_upstream_failure(self):
+        FakeMinimax.fail = True
+        response = self.client.post("/v1/tts/dialogue", json={"turns": [{"text": "a"}, {"text": "b"}]})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.user.used_seconds, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
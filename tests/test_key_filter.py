@@ -0,0 +1,111 @@
+from __future__ import annotations
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import api_keys
+from src.api_keys import (
+    issue_api_key, resolve_api_key_user, rotate_user_api_key, deactivate_user,
+    active_key_tokens, verified_keys,
+)
+from src.key_filter import CountingBloomFilter, KeyFilter
+from src.models import Base, User, Plan
+from src.shared_state import MemoryStore
+
+
+class TestCountingBloomFilter(unittest.TestCase):
+    def test_add_remove_and_fp_rate(self):
+        bloom = CountingBloomFilter(capacity=1000, fp_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"id:{i}")
+        self.assertTrue(all(f"id:{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other:{i}" in bloom for i in range(10_000))
+        self.assertLess(false_positives, 300)
+        self.assertAlmostEqual(bloom.estimated_fp_rate(), 0.01, delta=0.005)
+
+        bloom.remove("id:7")
+        self.assertNotIn("id:7", bloom)
+        self.assertIn("id:8", bloom)
+
+
+class TestKeyFilter(unittest.TestCase):
+    def setUp(self):
+        self.store = MemoryStore()
+        self.tokens = ["id:a", "id:b"]
+
+    def make(self):
+        return KeyFilter(capacity=100, fp_rate=0.001, loader=lambda: list(self.tokens),
+                         store=self.store, sync_interval=0)
+
+    def test_maybe_until_built(self):
+        key_filter = self.make()
+        self.assertTrue(key_filter.might_contain("id:zzz"))
+        key_filter.rebuild()
+        self.assertFalse(key_filter.might_contain("id:zzz"))
+        self.assertTrue(key_filter.might_contain("id:a"))
+        self.assertEqual(key_filter.stats()["rejected"], 1)
+        self.assertIn("key_filter_keys 2", key_filter.metrics())
+
+    def test_other_process_changes_trigger_rebuild(self):
+        mine, theirs = self.make(), self.make()
+        mine.rebuild()
+        theirs.rebuild()
+        self.tokens.append("id:c")
+        theirs.add("id:c")
+        self.assertTrue(theirs.might_contain("id:c"))
+        # Generation moved: stop rejecting, rebuild in the background
+        self.assertTrue(mine.might_contain("id:c"))
+        for _ in range(100):
+            if not mine.stats()["stale"]:
+                break
+            time.sleep(0.01)
+        self.assertFalse(mine.might_contain("id:zzz"))
+        self.assertTrue(mine.might_contain("id:c"))
+
+
+class TestKeyFilterAuth(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        self.api_key, key_id, stored = issue_api_key()
+        self.user = User(name="a", email="a@test.com", plan=Plan.FREE,
+                         api_key_prefix=key_id, api_key_hash=stored)
+        self.db.add(self.user)
+        self.db.commit()
+        self.key_filter = KeyFilter(loader=lambda: active_key_tokens(self.Session), store=MemoryStore())
+        self.key_filter.rebuild()
+        patcher = mock.patch.object(api_keys, "active_keys", self.key_filter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        verified_keys.clear()
+
+    def tearDown(self):
+        self.db.close()
+        verified_keys.clear()
+
+    def test_unknown_key_rejected_without_query(self):
+        unknown, _, _ = issue_api_key()
+        db = mock.Mock()
+        self.assertIsNone(resolve_api_key_user(db, unknown))
+        db.query.assert_not_called()
+        db.get.assert_not_called()
+
+    def test_rotate_and_deactivate_update_filter(self):
+        self.assertEqual(resolve_api_key_user(self.db, self.api_key).id, self.user.id)
+        new_key = rotate_user_api_key(self.db, self.user)
+        self.assertFalse(self.key_filter.might_contain(f"id:{api_keys.parse_key_id(self.api_key)}"))
+        self.assertEqual(resolve_api_key_user(self.db, new_key).id, self.user.id)
+
+        deactivate_user(self.db, self.user)
+        self.assertFalse(self.user.is_active)
+        self.assertIsNone(resolve_api_key_user(self.db, new_key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.main import usage_log_page, user_list_page
+from src.migrations import run_migrations, MIGRATIONS
+from src.models import User, Usage, Plan, UsageStatus
+from src.pagination import encode_cursor, decode_cursor, InvalidCursor
+
+
+class TestCursor(unittest.TestCase):
+    def test_roundtrip(self):
+        ts = datetime(2026, 10, 19, 8, 30, 15, 123)
+        self.assertEqual(decode_cursor(encode_cursor(ts, 42), 2), [ts, 42])
+
+    def test_invalid(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not-a-cursor", 2)
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor(1, 2, 3), 2)
+
+
+class TestUsagePagination(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        run_migrations(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        user = User(name="u", email="u@test.com", api_key_hash="h", plan=Plan.FREE)
+        self.db.add(user)
+        self.db.commit()
+        self.user_id = user.id
+        base = datetime(2026, 10, 1)
+        # Pairs of rows share a timestamp so the id tie-breaker is exercised
+        for i in range(25):
+            self.db.add(Usage(user_id=user.id, voice_id=0, text_length=i, status=UsageStatus.SUCCESS,
+                              timestamp=base + timedelta(minutes=i // 2)))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_migrations_idempotent(self):
+        self.assertEqual(run_migrations(self.engine), [])
+        indexes = {ix["name"] for ix in inspect(self.engine).get_indexes("usage_logs")}
+        self.assertIn("ix_usage_logs_user_id_timestamp", indexes)
+        self.assertEqual(len(MIGRATIONS), len(set(name for name, _ in MIGRATIONS)))
+
+    def test_walks_all_pages_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            page = usage_log_page(self.db, self.user_id, 10, cursor)
+            seen.extend(item.id for item in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(page.items[-1].status, "success")
+
+
+class TestUserListing(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        run_migrations(engine)
+        self.db = sessionmaker(bind=engine)()
+        # (plan, quota, used, active): 0%, 50%, 95%, 120%, zero quota
+        specs = [(Plan.FREE, 100, 0, True), (Plan.PRO, 100, 50, True), (Plan.PRO, 100, 95, True),
+                 (Plan.FREE, 100, 120, False), (Plan.BASIC, 0, 0, True)]
+        for i, (plan, quota, used, active) in enumerate(specs * 3):
+            self.db.add(User(name=f"u{i}", email=f"u{i}@test.com", api_key_hash=f"h{i}", plan=plan,
+                             quota_seconds=quota, used_seconds=used, is_active=active))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def walk(self, **filters):
+        items, cursor = [], None
+        while True:
+            page = user_list_page(self.db, 4, cursor, **filters)
+            items.extend(page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                return items
+
+    def test_sql_aggregates_match_python_properties(self):
+        items = self.walk()
+        self.assertEqual(len(items), 15)
+        self.assertEqual([i.id for i in items], sorted(i.id for i in items))
+        for item in items:
+            user = self.db.get(User, item.id)
+            self.assertAlmostEqual(item.remaining_seconds, user.remaining_seconds)
+            self.assertAlmostEqual(item.quota_percentage_used, user.quota_percentage_used)
+
+    def test_filters(self):
+        self.assertEqual(len(self.walk(plan="pro")), 6)
+        self.assertEqual(len(self.walk(is_active=False)), 3)
+        self.assertEqual({i.quota_percentage_used for i in self.walk(quota_bucket="over_90")}, {95.0, 100.0})
+        self.assertEqual(len(self.walk(quota_bucket="exhausted", is_active=True)), 3)
+        self.assertEqual(len(self.walk(plan="pro", quota_bucket="50_to_90")), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+import json
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.api_keys import parse_key_id, verify_key_secret
+from src.models import Base, User, Plan, PLAN_CONFIGS
+from src import provisioning
+from src.provisioning import provision_users, iter_ndjson
+
+
+class TestProvisioning(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(User(name="taken", email="taken@test.com", api_key_hash="h", plan=Plan.FREE))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_creates_users_in_batches(self):
+        rows = [{"name": f"u{i}", "email": f"u{i}@test.com", "plan": "pro"} for i in range(7)]
+        results = provision_users(self.db, rows, batch_size=3)
+
+        self.assertEqual([r["row"] for r in results], list(range(7)))
+        self.assertEqual(self.db.query(User).count(), 8)
+        for result in results:
+            user = self.db.get(User, result["user_id"])
+            self.assertEqual(user.email, result["email"])
+            self.assertEqual(user.api_key_prefix, parse_key_id(result["api_key"]))
+            self.assertTrue(verify_key_secret(result["api_key"], user.api_key_hash))
+            self.assertEqual(user.quota_seconds, PLAN_CONFIGS[Plan.PRO]["quota_seconds"])
+
+    def test_reports_per_row_errors(self):
+        rows = [
+            {"name": "ok", "email": "ok@test.com"},
+            {"name": "dup", "email": "taken@test.com"},
+            {"name": "again", "email": "ok@test.com"},
+            {"name": "bad", "email": "not-an-email"},
+            {"name": "plan", "email": "plan@test.com", "plan": "gold"},
+        ]
+        results = provision_users(self.db, rows)
+
+        self.assertIn("api_key", results[0])
+        self.assertEqual(results[1]["error"], "Email already registered")
+        self.assertEqual(results[2]["error"], "Duplicate email in request")
+        self.assertTrue(results[3]["error"].startswith("email"))
+        self.assertTrue(results[4]["error"].startswith("plan"))
+        self.assertEqual(self.db.query(User).count(), 2)
+
+    def test_email_registered_concurrently(self):
+        rows = [{"name": f"u{i}", "email": f"u{i}@test.com"} for i in range(4)]
+        rows[2]["email"] = "taken@test.com"
+        check = provisioning.existing_emails
+        calls = []
+
+        def racing_check(db, emails):
+            # The up-front check misses "taken@test.com", as if it was registered right after
+            calls.append(emails)
+            return set() if len(calls) == 1 else check(db, emails)
+
+        with mock.patch.object(provisioning, "existing_emails", racing_check):
+            results = provision_users(self.db, rows, batch_size=2)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results[2]["error"], "Email already registered")
+        self.assertEqual([bool(r.get("user_id")) for r in results], [True, True, False, True])
+        self.assertEqual(self.db.query(User).count(), 4)
+        for result in (results[0], results[1], results[3]):
+            self.assertEqual(self.db.get(User, result["user_id"]).email, result["email"])
+
+    def test_ndjson_summary(self):
+        results = provision_users(self.db, [{"name": "a", "email": "a@test.com"}, {"name": "b"}])
+        lines = [json.loads(line) for line in iter_ndjson(results)]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[-1]["summary"], {"total": 2, "created": 1, "failed": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import unittest
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.main import charge_user
+from src.migrations import run_migrations
+from src.models import User, Plan, PLAN_CONFIGS, billing_cycle
+from src.quota_reset import reset_quotas, reset_current_cycle
+from src.scheduler import Scheduler
+from src.shared_state import MemoryStore
+
+
+class TestQuotaReset(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        run_migrations(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        for i in range(12):
+            self.db.add(User(name=f"u{i}", email=f"u{i}@test.com", api_key_hash=f"h{i}",
+                             plan=Plan.PRO if i % 2 else Plan.FREE, quota_seconds=1.0,
+                             used_seconds=50.0, last_reset_cycle="2026-09"))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_resets_in_chunks_and_reapplies_plan_quota(self):
+        result = reset_quotas(self.db, "2026-10", chunk_size=5)
+        self.assertEqual(result, {"cycle": "2026-10", "users_reset": 12, "chunks": 3})
+        self.db.expire_all()
+        for user in self.db.query(User):
+            self.assertEqual(user.used_seconds, 0.0)
+            self.assertEqual(user.quota_seconds, PLAN_CONFIGS[user.plan]["quota_seconds"])
+            self.assertEqual(user.last_reset_cycle, "2026-10")
+
+    def test_idempotent_per_cycle(self):
+        reset_quotas(self.db, "2026-10")
+        self.db.query(User).update({"used_seconds": 7.0})
+        self.db.commit()
+        self.assertEqual(reset_quotas(self.db, "2026-10")["users_reset"], 0)
+        self.assertEqual(reset_quotas(self.db, "2026-09")["users_reset"], 0)
+        self.assertEqual({u.used_seconds for u in self.db.query(User)}, {7.0})
+
+    def test_charge_during_reset_is_not_lost(self):
+        # A request loaded the user before the reset ran, then charges
+        user = self.db.query(User).first()
+        self.assertEqual(user.used_seconds, 50.0)
+        with self.Session() as other:
+            reset_quotas(other, "2026-10")
+        charge_user(self.db, user, 5.0)
+        self.db.commit()
+        self.db.refresh(user)
+        self.assertEqual(user.used_seconds, 5.0)
+        self.assertEqual(user.last_reset_cycle, "2026-10")
+
+    def test_new_users_start_in_current_cycle(self):
+        user = User(name="new", email="new@test.com", api_key_hash="hn", plan=Plan.FREE)
+        self.db.add(user)
+        self.db.commit()
+        self.assertEqual(user.last_reset_cycle, billing_cycle())
+
+    def test_current_cycle_job_runs_once(self):
+        store = MemoryStore()
+        self.assertEqual(reset_current_cycle(self.Session, store)["users_reset"], 12)
+        self.assertIsNone(reset_current_cycle(self.Session, store))
+
+
+class TestScheduler(unittest.TestCase):
+    def test_runs_due_jobs_once_per_interval(self):
+        calls = []
+        scheduler = Scheduler(store=MemoryStore())
+        scheduler.add_job("job", 10, lambda: calls.append(1))
+        self.assertEqual(scheduler.run_pending(now=100), ["job"])
+        self.assertEqual(scheduler.run_pending(now=105), [])
+        self.assertEqual(scheduler.run_pending(now=110), ["job"])
+        self.assertEqual(len(calls), 2)
+
+    def test_lock_held_elsewhere_skips(self):
+        store = MemoryStore()
+        store.add("sched:job:lock", "other-worker", ttl=60)
+        scheduler = Scheduler(store=store)
+        scheduler.add_job("job", 10, lambda: None)
+        self.assertEqual(scheduler.run_pending(now=0), [])
+
+    def test_failing_job_releases_lock(self):
+        store = MemoryStore()
+        scheduler = Scheduler(store=store)
+        scheduler.add_job("job", 10, lambda: 1 / 0)
+        scheduler.run_pending(now=0)
+        self.assertIsNone(store.get("sched:job:lock"))
+
+
+if __name__ == "__main__":
+    unittest.main()
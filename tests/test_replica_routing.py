@@ -0,0 +1,123 @@
+from __future__ import annotations
+import unittest
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from fastapi.testclient import TestClient
+
+from src import main
+from src.dependencies import get_db, get_read_db, get_admin_user
+from src.replicas import Replica, ReplicaRouter, RoutingSession
+from src.models import Base, User, Plan
+
+
+def memory_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return engine
+
+
+class StubRouter(ReplicaRouter):
+    """Lag comes from ``lags`` instead of pg_last_xact_replay_timestamp()."""
+
+    def __init__(self, replicas, lags):
+        super().__init__(replicas, max_lag=5, check_interval=0)
+        self.lags = lags
+
+    def measure_lag(self, replica):
+        return self.lags.get(replica.name)
+
+
+class ReplicaFixture:
+    """A primary and a replica holding different users, routed by ``StubRouter``."""
+
+    def setUp(self):
+        self.primary = memory_engine()
+        self.replica = memory_engine()
+        with sessionmaker(bind=self.primary)() as db:
+            db.add(User(name="primary", email="p@test.com", api_key_hash="h", plan=Plan.FREE))
+            db.commit()
+        with sessionmaker(bind=self.replica)() as db:
+            db.add(User(name="replica", email="r@test.com", api_key_hash="h", plan=Plan.FREE))
+            db.commit()
+        self.lags = {"r0": 0.0}
+        self.router = StubRouter([Replica("r0", self.replica)], self.lags)
+        self.Session = sessionmaker(class_=RoutingSession, router=self.router, bind=self.primary)
+
+
+class TestReplicaRouting(ReplicaFixture, unittest.TestCase):
+
+    def first_name(self, db):
+        return db.execute(select(User.name).order_by(User.id)).scalar()
+
+    def test_reads_use_replica_until_write(self):
+        with self.Session() as db:
+            self.assertEqual(self.first_name(db), "replica")
+            db.add(User(name="new", email="n@test.com", api_key_hash="h2", plan=Plan.FREE))
+            db.flush()
+            # Pinned to the primary after writing: reads see the write
+            self.assertEqual(self.first_name(db), "primary")
+            self.assertEqual(db.query(User).filter_by(email="n@test.com").count(), 1)
+            db.commit()
+            self.assertEqual(self.first_name(db), "primary")
+
+    def test_for_update_goes_to_primary(self):
+        with self.Session() as db:
+            user = db.query(User).with_for_update().first()
+            self.assertEqual(user.name, "primary")
+
+    def test_lagging_or_unreachable_replica_falls_back(self):
+        self.lags["r0"] = 30.0
+        with self.Session() as db:
+            self.assertEqual(self.first_name(db), "primary")
+        self.lags["r0"] = None
+        with self.Session() as db:
+            self.assertEqual(self.first_name(db), "primary")
+        self.assertFalse(self.router.status()[0]["healthy"])
+        self.lags["r0"] = 1.0
+        with self.Session() as db:
+            self.assertEqual(self.first_name(db), "replica")
+
+    def test_no_router_uses_primary(self):
+        with sessionmaker(class_=RoutingSession, bind=self.primary)() as db:
+            self.assertEqual(self.first_name(db), "primary")
+
+
+class TestReadOnlyEndpoints(ReplicaFixture, unittest.TestCase):
+    """The read-only endpoints take their session from ``get_read_db``."""
+
+    def setUp(self):
+        super().setUp()
+
+        def read_db():
+            with self.Session() as db:
+                yield db
+
+        def primary_db():
+            with sessionmaker(bind=self.primary)() as db:
+                yield db
+
+        main.app.dependency_overrides[get_read_db] = read_db
+        main.app.dependency_overrides[get_db] = primary_db
+        main.app.dependency_overrides[get_admin_user] = lambda: User(plan=Plan.ENTERPRISE)
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.client = TestClient(main.app)
+
+    def test_admin_user_lookup_reads_replica(self):
+        response = self.client.get("/admin/users/1")
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()["name"], "replica")
+        self.lags["r0"] = 30.0
+        self.assertEqual(self.client.get("/admin/users/1").json()["name"], "primary")
+
+    def test_me_and_voice_list_authenticate_on_replica(self):
+        for path in ("/v1/me", "/v1/voices/list"):
+            # Missing key: rejected by the replica-backed lookup without touching get_db
+            main.app.dependency_overrides[get_db] = lambda: self.fail("primary session used")
+            self.assertEqual(self.client.get(path).status_code, 401, path)
+
+
+if __name__ == "__main__":
+    unittest.main()
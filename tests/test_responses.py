@@ -0,0 +1,53 @@
+from __future__ import annotations
+import json
+import base64
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.responses import AudioBytesResponse, AudioJSONResponse, iter_base64, json_envelope
+
+AUDIO = bytes(range(256)) * 50
+FIELDS = {"audio_url": None, "duration_seconds": 1.5, "voice_used": 'say "hi"'}
+
+
+class TestEnvelope(unittest.TestCase):
+    def test_base64_of_uneven_chunks(self):
+        for size in (1, 2, 3, 17, 4096):
+            chunks = [AUDIO[i:i + size] for i in range(0, len(AUDIO), size)]
+            self.assertEqual(b"".join(iter_base64(chunks)), base64.b64encode(AUDIO))
+
+    def test_envelope_is_the_json_of_the_fields(self):
+        body = b"".join(json_envelope("audio_base64", iter_base64([AUDIO]), FIELDS))
+        self.assertEqual(json.loads(body), {"audio_base64": base64.b64encode(AUDIO).decode(), **FIELDS})
+
+    def test_audio_json_response(self):
+        app = FastAPI()
+
+        @app.get("/")
+        def endpoint():
+            return AudioJSONResponse("audio_base64", base64.b64encode(AUDIO), FIELDS, headers={"X-Test": "1"})
+
+        response = TestClient(app).get("/")
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual(int(response.headers["content-length"]), len(response.content))
+        self.assertEqual(response.headers["x-test"], "1")
+        self.assertEqual(base64.b64decode(response.json()["audio_base64"]), AUDIO)
+
+    def test_audio_bytes_response_sends_bytearray(self):
+        app = FastAPI()
+
+        @app.get("/")
+        def endpoint():
+            return AudioBytesResponse(bytearray(AUDIO), media_type="audio/mpeg", headers={"X-Test": "1"})
+
+        response = TestClient(app).get("/")
+        self.assertEqual(response.headers["content-type"], "audio/mpeg")
+        self.assertEqual(int(response.headers["content-length"]), len(AUDIO))
+        self.assertEqual(response.headers["x-test"], "1")
+        self.assertEqual(response.content, AUDIO)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import create_engine, delete, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from fastapi.testclient import TestClient
+
+from src import main
+from src.dependencies import get_db, get_admin_user
+from src.models import Base, User, Usage, UsageRollup, Plan, UsageStatus
+from src import retention
+from src.migrations import run_migrations
+from src.retention import compact_usage_logs, retention_cutoff, usage_partition_ddl, MIN_RETENTION_DAYS
+
+
+class TestRetention(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.user = User(name="u", email="u@test.com", api_key_hash="h", plan=Plan.FREE)
+        self.db.add(self.user)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def add_usage(self, when, seconds=2.0, status=UsageStatus.SUCCESS):
+        self.db.add(Usage(user_id=self.user.id, voice_id=0, text_length=10, audio_seconds=seconds,
+                          status=status, model_used="speech-02-turbo", timestamp=when))
+
+    def test_cutoff_is_midnight(self):
+        cutoff = retention_cutoff(now=datetime(2026, 10, 19, 15, 30), days=30)
+        self.assertEqual(cutoff, datetime(2026, 9, 19))
+
+    def test_cutoff_keeps_archive_window(self):
+        with self.assertRaises(ValueError):
+            retention_cutoff(days=MIN_RETENTION_DAYS - 1)
+
+    def test_compaction_rolls_up_and_deletes(self):
+        now = datetime(2026, 10, 19, 12)
+        old = now - timedelta(days=100)
+        for _ in range(7):
+            self.add_usage(old)
+        self.add_usage(old, status=UsageStatus.ERROR, seconds=None)
+        self.add_usage(now)
+        self.db.commit()
+
+        result = compact_usage_logs(self.db, cutoff=retention_cutoff(now=now, days=90), batch_size=3)
+
+        self.assertEqual(result["rows_compacted"], 8)
+        self.assertEqual(result["batches"], 3)
+        self.assertEqual(self.db.query(Usage).count(), 1)
+        rollups = {r.status: r for r in self.db.query(UsageRollup).all()}
+        self.assertEqual(rollups[UsageStatus.SUCCESS].request_count, 7)
+        self.assertAlmostEqual(rollups[UsageStatus.SUCCESS].audio_seconds_total, 14.0)
+        self.assertEqual(rollups[UsageStatus.ERROR].request_count, 1)
+        self.assertEqual(rollups[UsageStatus.SUCCESS].day, datetime(2026, 7, 11))
+
+    def test_compaction_increments_existing_rollup(self):
+        now = datetime(2026, 10, 19, 12)
+        old = now - timedelta(days=100)
+        cutoff = retention_cutoff(now=now, days=90)
+        for _ in range(2):
+            self.add_usage(old)
+            self.db.commit()
+            compact_usage_logs(self.db, cutoff=cutoff)
+
+        rollup = self.db.query(UsageRollup).one()
+        self.assertEqual(rollup.request_count, 2)
+        self.assertAlmostEqual(rollup.audio_seconds_total, 4.0)
+
+    def test_rows_taken_by_another_run_are_not_counted_twice(self):
+        now = datetime(2026, 10, 19, 12)
+        for _ in range(4):
+            self.add_usage(now - timedelta(days=100))
+        self.db.commit()
+        taken = self.db.query(Usage).first().id
+        merge = retention._merge_rollups
+        calls = []
+
+        def racing_merge(db, buckets):
+            if not calls:
+                # A concurrent run compacts one of this batch's rows first
+                with sessionmaker(bind=self.engine)() as other:
+                    other.execute(delete(Usage).where(Usage.id == taken))
+                    other.commit()
+            calls.append(buckets)
+            merge(db, buckets)
+
+        with mock.patch.object(retention, "_merge_rollups", racing_merge):
+            result = compact_usage_logs(self.db, cutoff=retention_cutoff(now=now, days=90))
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(result["rows_compacted"], 3)
+        self.assertEqual(self.db.query(UsageRollup).one().request_count, 3)
+
+    def test_migration_merges_duplicate_rollups(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ux_usage_rollups_key")
+            for count in (2, 3):
+                conn.execute(UsageRollup.__table__.insert().values(
+                    user_id=1, voice_id=0, model_used=None, status=UsageStatus.SUCCESS,
+                    day=datetime(2026, 7, 11), request_count=count, text_length_total=10 * count,
+                    audio_seconds_total=float(count),
+                ))
+        run_migrations(engine)
+
+        with sessionmaker(bind=engine)() as db:
+            rollup = db.query(UsageRollup).one()
+            self.assertEqual(rollup.request_count, 5)
+            self.assertEqual(rollup.text_length_total, 50)
+        indexes = {ix["name"] for ix in inspect(engine).get_indexes("usage_rollups")}
+        self.assertIn("ux_usage_rollups_key", indexes)
+
+    def test_compact_endpoint_is_bounded(self):
+        old = datetime.utcnow() - timedelta(days=400)
+        for _ in range(5):
+            self.add_usage(old)
+        self.db.commit()
+
+        def override_db():
+            with sessionmaker(bind=self.engine)() as db:
+                yield db
+
+        main.app.dependency_overrides[get_db] = override_db
+        main.app.dependency_overrides[get_admin_user] = lambda: User(plan=Plan.ENTERPRISE)
+        self.addCleanup(main.app.dependency_overrides.clear)
+        client = TestClient(main.app)
+
+        self.assertEqual(client.post("/admin/usage/compact", params={"retention_days": 0}).status_code, 422)
+        self.assertEqual(client.post("/admin/usage/compact", params={"max_batches": 0}).status_code, 422)
+
+        response = client.post("/admin/usage/compact", params={"max_batches": 1})
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()["batches"], 1)
+        self.assertEqual(self.db.query(Usage).count(), 0)
+
+    def test_partition_ddl(self):
+        ddl = usage_partition_ddl(datetime(2026, 12, 5))
+        self.assertIn("usage_logs_y2026m12 PARTITION OF usage_logs", ddl)
+        self.assertIn("FROM ('2026-12-01') TO ('2027-01-01')", ddl)
+
+
+if __name__ == '__main__':
+    unittest.main()
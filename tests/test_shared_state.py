@@ -0,0 +1,114 @@
+from __future__ import annotations
+import os
+import time
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from src.shared_state import MemoryStore, SQLiteStore, create_store, per_worker
+
+
+def _increment_many(path: str, key: str, times: int) -> int:
+    store = SQLiteStore(path)
+    for _ in range(times):
+        store.incr(key, ttl=60)
+    return times
+
+
+class StoreContract:
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    def test_set_get_delete(self):
+        self.store.set("a", "1")
+        self.assertEqual(self.store.get("a"), "1")
+        self.store.delete("a")
+        self.assertIsNone(self.store.get("a"))
+
+    def test_incr_creates_and_counts(self):
+        self.assertEqual(self.store.incr("c"), 1)
+        self.assertEqual(self.store.incr("c", 4), 5)
+
+    def test_ttl_expires(self):
+        self.store.incr("w", ttl=0.05)
+        self.store.set("s", "x", ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.store.get("s"))
+        self.assertEqual(self.store.incr("w", ttl=0.05), 1)
+
+    def test_add_only_when_absent(self):
+        self.assertTrue(self.store.add("p", "1", ttl=0.05))
+        self.assertFalse(self.store.add("p", "1", ttl=0.05))
+        time.sleep(0.1)
+        self.assertTrue(self.store.add("p", "1"))
+
+    def test_clear_prefix(self):
+        self.store.set("rl:1", "1")
+        self.store.set("cb:x", "1")
+        self.store.clear("rl:")
+        self.assertIsNone(self.store.get("rl:1"))
+        self.assertEqual(self.store.get("cb:x"), "1")
+
+
+class TestMemoryStore(StoreContract, unittest.TestCase):
+    def make_store(self):
+        return MemoryStore()
+
+
+class TestSQLiteStore(StoreContract, unittest.TestCase):
+    def make_store(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "state.db")
+        return SQLiteStore(self.path)
+
+    def test_incr_is_atomic_across_processes(self):
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            list(pool.map(_increment_many, [self.path] * 4, ["shared"] * 4, [200] * 4))
+        self.assertEqual(int(self.store.get("shared")), 800)
+
+
+class TestCreateStore(unittest.TestCase):
+    def test_url_schemes(self):
+        self.assertIsInstance(create_store("memory://"), MemoryStore)
+        path = os.path.join(tempfile.mkdtemp(), "state.db")
+        self.assertIsInstance(create_store(f"sqlite:///{path}"), SQLiteStore)
+        with self.assertRaises(ValueError):
+            create_store("ftp://nowhere")
+
+    def test_per_worker_share(self):
+        self.assertEqual(per_worker(30, workers=1), 30)
+        self.assertEqual(per_worker(30, workers=4), 8)
+        self.assertEqual(per_worker(1, workers=4), 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        try:
+            from src.minimax_client_async import CircuitBreaker
+        except Exception as e:  # tenacity/httpx not installed
+            self.skipTest(f"async client unavailable: {e}")
+        self.store = MemoryStore()
+        self.make = lambda: CircuitBreaker(failure_threshold=2, timeout=1, store=self.store)
+
+    def test_state_is_shared_between_instances(self):
+        worker_a, worker_b = self.make(), self.make()
+        worker_a.record_failure()
+        worker_b.record_failure()
+        self.assertFalse(worker_a.can_execute())
+        self.assertFalse(worker_b.can_execute())
+
+    def test_single_half_open_probe(self):
+        worker_a, worker_b = self.make(), self.make()
+        worker_a.record_failure()
+        worker_a.record_failure()
+        self.store.set("cb:minimax:opened_at", str(time.time() - 5))
+        self.assertTrue(worker_a.can_execute())
+        self.assertFalse(worker_b.can_execute())
+        worker_a.record_success()
+        self.assertTrue(worker_b.can_execute())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+from __future__ import annotations
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import event
+
+from src.database_fixed import create_sqlite_engine
+
+
+class TestSQLitePool(unittest.TestCase):
+    def setUp(self):
+        self.url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pool.db')}"
+
+    def test_pragmas_applied_once_per_connection(self):
+        engine = create_sqlite_engine(self.url, mode="queue", pool_size=2)
+        connects = []
+        event.listen(engine, "connect", lambda conn, record: connects.append(conn))
+        for _ in range(5):
+            with engine.connect() as conn:
+                self.assertEqual(conn.exec_driver_sql("PRAGMA journal_mode").scalar(), "wal")
+                self.assertEqual(conn.exec_driver_sql("PRAGMA busy_timeout").scalar(), 30000)
+        self.assertEqual(len(connects), 1)
+        engine.dispose()
+
+    def test_null_mode_reconnects(self):
+        engine = create_sqlite_engine(self.url, mode="null")
+        connects = []
+        event.listen(engine, "connect", lambda conn, record: connects.append(conn))
+        for _ in range(3):
+            with engine.connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+        self.assertEqual(len(connects), 3)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            create_sqlite_engine(self.url, mode="bogus")
+
+
+if __name__ == "__main__":
+    unittest.main()
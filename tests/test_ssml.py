@@ -0,0 +1,162 @@
+from __future__ import annotations
+import time
+import base64
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import main
+from src.audio_profiles import AUDIO_PROFILES
+from src.composition import mp3_header_for, parse_mp3_header, silent_clip
+from src.dependencies import get_db, get_current_user
+from src.minimax_client import MinimaxAPIError
+from src.models import Base, User, Plan, Usage
+from src.ssml import Segment, SSMLError, parse_ssml
+
+
+class TestParse(unittest.TestCase):
+    def test_plain_text_is_one_segment(self):
+        self.assertEqual(parse_ssml("Hello   there.\n"), [Segment("Hello there.", None, 1.0, 0)])
+
+    def test_breaks_prosody_and_voice(self):
+        parts = parse_ssml(
+            '<speak xmlns="http://www.w3.org/2001/10/synthesis">Hello.<break time="500ms"/>'
+            '<prosody rate="slow" pitch="+2st">Take a breath.</prosody>'
+            '<break strength="strong"/><break time="1s"/>'
+            '<voice name="joslyn">Welcome <s>back.</s></voice></speak>',
+            speed=1.5, pitch=-1, voice_name="marcus",
+        )
+        self.assertEqual(parts, [
+            Segment("Hello.", "marcus", 1.5, -1),
+            0.5,
+            Segment("Take a breath.", "marcus", 1.2, 1),
+            1.75,
+            Segment("Welcome back.", "joslyn", 1.5, -1),
+        ])
+
+    def test_xml_declaration(self):
+        parts = parse_ssml('\n<?xml version="1.0" encoding="UTF-8"?>\n'
+                           '<speak version="1.1" xmlns="http://www.w3.org/2001/10/synthesis">Hi.</speak>')
+        self.assertEqual(parts, [Segment("Hi.", None, 1.0, 0)])
+
+    def test_prosody_clamped_to_api_range(self):
+        parts = parse_ssml('<prosody rate="300%" pitch="-20st">fast</prosody>', speed=1.0)
+        self.assertEqual(parts, [Segment("fast", None, 2.0, -12)])
+
+    def test_rejections(self):
+        for document in (
+            "<speak>unclosed",
+            "<speak><emphasis>no</emphasis></speak>",
+            '<speak><break time="20s"/>too long</speak>',
+            '<speak><prosody rate="warp">x</prosody></speak>',
+            '<speak><break time="1s"/></speak>',
+            '<!DOCTYPE speak [<!ENTITY a "b">]><speak>&a;</speak>',
+        ):
+            with self.assertRaises(SSMLError, msg=document):
+                parse_ssml(document)
+
+
+def mp3_clip(fmt, frames: int) -> bytes:
+    header = mp3_header_for(fmt)
+    return (header.raw + b"\x55" * (header.frame_length - 4)) * frames
+
+
+class FakeMinimax:
+    delay = 0.2
+    fail = False
+    calls = []
+
+    def text_to_speech(self, text, voice_id, speed=1.0, pitch=0, audio_format=None, **kwargs):
+        self.calls.append((text, voice_id, speed, pitch))
+        time.sleep(self.delay)
+        if self.fail:
+            raise MinimaxAPIError(1008, "no balance")
+        return {
+            "audio_data": mp3_clip(audio_format, len(text)),
+            "audio_base64": None,
+            "duration_seconds": len(text) * 1152 / audio_format.sample_rate,
+            "sample_rate": audio_format.sample_rate,
+            "audio_format": audio_format,
+        }
+
+
+class TestSSMLEndpoint(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        self.user = User(name="a", email="a@test.com", api_key_hash="h", plan=Plan.PRO,
+                         quota_seconds=100.0, used_seconds=0.0)
+        self.db.add(self.user)
+        self.db.commit()
+
+        def override_db():
+            yield self.db
+
+        main.app.dependency_overrides[get_db] = override_db
+        main.app.dependency_overrides[get_current_user] = lambda: self.user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.addCleanup(self.db.close)
+        FakeMinimax.fail = False
+        FakeMinimax.calls = []
+        patcher = mock.patch.object(main, "MinimaxClient", FakeMinimax)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def test_segments_synthesized_concurrently_breaks_local(self):
+        text = ('<speak>Your code is <break time="1s"/><prosody pitch="+3st">four two</prosody>'
+                '<break time="500ms"/><voice name="joslyn">Goodbye.</voice></speak>')
+        start = time.perf_counter()
+        response = self.client.post("/v1/tts", json={"text": text, "text_type": "ssml"})
+        elapsed = time.perf_counter() - start
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertLess(elapsed, 2 * FakeMinimax.delay)
+        self.assertEqual(sorted(call[0] for call in FakeMinimax.calls), ["Goodbye.", "Your code is", "four two"])
+        calls = {text: (voice_id, speed, pitch) for text, voice_id, speed, pitch in FakeMinimax.calls}
+        self.assertEqual(calls["four two"][1:], (1.0, 3))
+        self.assertEqual(calls["four two"][0], calls["Your code is"][0])
+        self.assertNotEqual(calls["Goodbye."][0], calls["Your code is"][0])
+
+        body = response.json()
+        audio = base64.b64decode(body["audio_base64"])
+        pos, frames = 0, 0
+        while pos < len(audio):
+            header = parse_mp3_header(audio, pos)
+            self.assertIsNotNone(header)
+            pos, frames = pos + header.frame_length, frames + 1
+        spoken = len("Your code is") + len("four two") + len("Goodbye.")
+        silent = round(1.0 * 32000 / 1152) + round(0.5 * 32000 / 1152)
+        self.assertEqual(frames, spoken + silent)
+        self.assertEqual(body["voice_used"], "marcus,joslyn")
+        self.assertEqual(body["text_length"], spoken)
+        # Billed per segment; breaks are free
+        self.assertEqual(self.db.query(Usage).count(), 3)
+        self.assertAlmostEqual(self.user.used_seconds, spoken * 1152 / 32000)
+
+    def test_invalid_ssml_rejected(self):
+        for payload in (
+            {"text": "<speak><audio src='x'/></speak>", "text_type": "ssml"},
+            {"text": "<voice name='nobody'>hi</voice>", "text_type": "ssml"},
+            {"text": "hi", "text_type": "ssml", "output_format": {"format": "flac"}},
+        ):
+            response = self.client.post("/v1/tts", json=payload)
+            self.assertEqual(response.status_code, 400, payload)
+        self.assertEqual(FakeMinimax.calls, [])
+
+    def test_failure_falls_back_to_cached_silence(self):
+        FakeMinimax.fail = True
+        response = self.client.post("/v1/tts", json={"text": "a<break/>b", "text_type": "ssml"},
+                                    headers={"Accept": "audio/mpeg"})
+        self.assertEqual(response.headers["content-type"], "audio/mpeg")
+        silence = silent_clip(AUDIO_PROFILES["default"], 1.0)
+        self.assertEqual(response.content, silence.audio)
+        self.assertEqual(self.user.used_seconds, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
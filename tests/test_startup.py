@@ -0,0 +1,27 @@
+from __future__ import annotations
+import unittest
+
+from src.startup import Readiness, StartupProfile
+
+
+class TestReadiness(unittest.TestCase):
+    def test_advisory_check_reported_but_not_gating(self):
+        readiness = Readiness()
+        readiness.register("database", lambda: True)
+        readiness.register("upstream", lambda: False, required=False)
+        readiness.warm_up(StartupProfile())
+        self.assertTrue(readiness.is_ready)
+        self.assertFalse(readiness.all_passed)
+        self.assertEqual(readiness.status, {"database": "ok", "upstream": "failed"})
+
+    def test_required_check_gates(self):
+        readiness = Readiness()
+        self.assertFalse(readiness.is_ready)
+        readiness.register("database", lambda: False)
+        readiness.register("upstream", lambda: True, required=False)
+        readiness.warm_up(StartupProfile())
+        self.assertFalse(readiness.is_ready)
+
+
+if __name__ == "__main__":
+    unittest.main()
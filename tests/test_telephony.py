@@ -0,0 +1,283 @@
+from __future__ import annotations
+import os
+import time
+import tempfile
+import asyncio
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src import main
+from src.dependencies import get_db, get_current_user
+from src.minimax_client import MinimaxClient, MinimaxAPIError
+from src.models import Base, User, Plan, Usage, UsageStatus
+from src.shared_state import MemoryStore
+from src import telephony
+from src.telephony import FrameEncoder, FramePacer, StreamSlots, encode_g711, stream_paced
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:  # removed in Python 3.13
+        audioop = None
+
+# 0.25 s of a 440 Hz tone at 8 kHz
+TONE = (np.sin(np.arange(2000) * 2 * np.pi * 440 / 8000) * 12000).astype("<i2").tobytes()
+
+
+class TestG711(unittest.TestCase):
+    @unittest.skipIf(audioop is None, "audioop not available")
+    def test_matches_reference_encoder_for_every_sample(self):
+        every = np.arange(65536, dtype=np.uint16).tobytes()
+        self.assertEqual(encode_g711(every, "mulaw"), audioop.lin2ulaw(every, 2))
+        self.assertEqual(encode_g711(every, "alaw"), audioop.lin2alaw(every, 2))
+
+    def test_known_values(self):
+        silence = np.zeros(4, dtype="<i2").tobytes()
+        self.assertEqual(encode_g711(silence, "mulaw"), b"\xff" * 4)
+        self.assertEqual(encode_g711(silence, "alaw"), b"\xd5" * 4)
+
+
+class TestFrameEncoder(unittest.TestCase):
+    def test_frames_from_arbitrary_chunks(self):
+        encoder = FrameEncoder("mulaw", 8000)
+        self.assertEqual(encoder.frame_bytes, 160)
+        frames = []
+        # Odd-sized chunks split samples in half
+        for i in range(0, len(TONE), 333):
+            frames += encoder.feed(TONE[i:i + 333])
+        frames += encoder.flush()
+        self.assertEqual(len(frames), 13)  # 12.5 frames, the last padded
+        self.assertTrue(all(len(f) == 160 for f in frames))
+        self.assertEqual(b"".join(frames)[:2000], encode_g711(TONE, "mulaw"))
+        self.assertEqual(frames[-1][80:], b"\xff" * 80)
+        self.assertEqual(encoder.duration_seconds, 0.25)
+
+    def test_pcm_and_rates(self):
+        self.assertEqual(FrameEncoder("pcm", 16000).frame_bytes, 640)
+        with self.assertRaises(ValueError):
+            FrameEncoder("alaw", 16000)
+
+
+class TestPacing(unittest.TestCase):
+    def test_frames_paced_in_real_time(self):
+        async def chunks():
+            yield TONE  # everything at once: pacing alone spaces the frames
+
+        sent_at = []
+
+        async def send(frame):
+            sent_at.append(time.monotonic())
+
+        encoder = FrameEncoder("mulaw", 8000, frame_ms=10)
+        count = asyncio.run(stream_paced(chunks(), encoder, send))
+        self.assertEqual(count, 25)
+        # Individual gaps depend on scheduler wakeups; the span doesn't
+        self.assertGreater(sent_at[-1] - sent_at[0], 0.23)
+
+    def test_pacer_keeps_a_fixed_schedule(self):
+        now = [0.0]
+        released = []
+
+        async def sleep(seconds):
+            now[0] += seconds
+
+        async def run():
+            pacer = FramePacer(0.02, clock=lambda: now[0])
+            for i in range(5):
+                await pacer.wait()
+                released.append(round(now[0], 6))
+                if i == 1:
+                    now[0] += 0.015  # a late wakeup, less than a frame
+
+        with mock.patch.object(telephony.asyncio, "sleep", sleep):
+            asyncio.run(run())
+        # The late frame shortens the next gap instead of shifting the schedule
+        self.assertEqual(released, [0.0, 0.02, 0.04, 0.06, 0.08])
+
+    def test_pacer_restarts_after_a_stall(self):
+        now = [0.0]
+        pacer = FramePacer(0.02, clock=lambda: now[0])
+        asyncio.run(pacer.wait())
+        now[0] = 1.0  # producer stalled for a second
+        asyncio.run(pacer.wait())
+        self.assertAlmostEqual(pacer._next, 1.02)
+
+    def test_upstream_error_after_frames(self):
+        async def chunks():
+            yield TONE[:640]
+            raise MinimaxAPIError(500, "upstream down")
+
+        sent = []
+
+        async def send(frame):
+            sent.append(frame)
+
+        with self.assertRaises(MinimaxAPIError):
+            asyncio.run(stream_paced(chunks(), FrameEncoder("mulaw", 8000, frame_ms=10), send))
+        self.assertEqual(len(sent), 4)
+
+    def test_stream_slots_shared_between_workers(self):
+        store = MemoryStore()
+        worker_a, worker_b = StreamSlots(store), StreamSlots(store)
+        slot = worker_a.acquire(1, 2)
+        self.assertIsNotNone(worker_b.acquire(1, 2))
+        self.assertIsNone(worker_a.acquire(1, 2))
+        self.assertIsNotNone(worker_b.acquire(2, 2))
+        worker_a.release(slot)
+        self.assertEqual(worker_b.acquire(1, 2), slot)
+
+    def test_stream_slot_lease_expires_unless_renewed(self):
+        slots = StreamSlots(MemoryStore(), ttl=0.05)
+        held, dead = slots.acquire(1, 2), slots.acquire(1, 2)
+        time.sleep(0.03)
+        slots.renew(held)
+        time.sleep(0.03)
+        # The dead worker's slot freed itself; the renewed one is still held
+        self.assertEqual(slots.acquire(1, 2), dead)
+        self.assertIsNone(slots.acquire(1, 2))
+
+
+class TestStreamSpeech(unittest.TestCase):
+    def test_sse_chunks_without_the_final_repeat(self):
+        lines = [
+            b'data: {"data": {"audio": "0102", "status": 1}, "base_resp": {"status_code": 0}}',
+            b"",
+            b'data: {"data": {"audio": "0304", "status": 1}, "base_resp": {"status_code": 0}}',
+            b"",
+            b'data: {"data": {"audio": "01020304", "status": 2}, "extra_info": {}, "base_resp": {"status_code": 0}}',
+        ]
+        response = mock.MagicMock(status_code=200)
+        response.__enter__.return_value = response
+        response.iter_lines.return_value = lines
+        session = mock.Mock()
+        session.post.return_value = response
+        client = MinimaxClient(api_key="key", group_id="1")
+        with mock.patch("src.minimax_client.get_http_session", return_value=session):
+            chunks = list(client.stream_speech("hi", "voice"))
+        self.assertEqual(chunks, [b"\x01\x02", b"\x03\x04"])
+        self.assertTrue(session.post.call_args.kwargs["json"]["stream"])
+
+        response.iter_lines.return_value = [b'{"base_resp": {"status_code": 1008, "status_msg": "no"}}']
+        with mock.patch("src.minimax_client.get_http_session", return_value=session):
+            with self.assertRaises(MinimaxAPIError) as ctx:
+                list(client.stream_speech("hi", "voice"))
+        self.assertEqual(ctx.exception.status_code, 1008)
+
+
+class FakeMinimax:
+    fail = False
+
+    def stream_speech(self, text, audio_format=None, **kwargs):
+        assert audio_format.format == "pcm" and audio_format.sample_rate == 8000
+        if self.fail:
+            raise MinimaxAPIError(500, "upstream down")
+        for i in range(0, len(TONE), 1000):
+            yield TONE[i:i + 1000]
+
+
+class TestTelephonyWebSocket(unittest.TestCase):
+    def setUp(self):
+        # A file database with a real connection pool, to see what the socket keeps checked out
+        path = os.path.join(tempfile.mkdtemp(), "telephony.db")
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        self.addCleanup(self.engine.dispose)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.db = self.Session()
+        self.user = User(name="a", email="a@test.com", api_key_hash="h", plan=Plan.FREE,
+                         quota_seconds=100.0, used_seconds=0.0)
+        self.db.add(self.user)
+        self.db.commit()
+        self.db.refresh(self.user)
+        self.db.close()
+
+        def override_db():
+            with self.Session() as db:
+                yield db
+
+        main.app.dependency_overrides[get_db] = override_db
+        main.app.dependency_overrides[get_current_user] = lambda: self.user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        FakeMinimax.fail = False
+        for patcher in (mock.patch.object(main, "MinimaxClient", FakeMinimax),
+                        mock.patch.object(main, "SessionLocal", self.Session)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def used_seconds(self) -> float:
+        with self.Session() as db:
+            return db.get(User, self.user.id).used_seconds
+
+    def usage(self) -> Usage:
+        with self.Session() as db:
+            return db.query(Usage).one()
+
+    def test_stream_frames_and_bill(self):
+        with self.client.websocket_connect("/v1/tts/telephony") as ws:
+            ws.send_json({"text": "Please hold", "encoding": "alaw"})
+            start = ws.receive_json()
+            self.assertEqual((start["event"], start["frame_bytes"], start["frame_ms"]), ("start", 160, 20))
+            frames = [ws.receive_bytes() for _ in range(13)]
+            end = ws.receive_json()
+            # Between utterances the open socket holds no pooled connection
+            self.assertEqual(self.engine.pool.checkedout(), 0)
+        self.assertEqual(b"".join(frames)[:2000], encode_g711(TONE, "alaw"))
+        self.assertEqual((end["event"], end["frames"], end["duration_seconds"]), ("end", 13, 0.25))
+        self.assertEqual(end["remaining_quota"], 99.75)
+        self.assertEqual(self.used_seconds(), 0.25)
+        self.assertEqual(self.usage().status, UsageStatus.SUCCESS)
+
+    def test_errors_keep_the_socket_open(self):
+        with self.client.websocket_connect("/v1/tts/telephony") as ws:
+            ws.send_json({"text": "hi", "encoding": "mulaw", "sample_rate": 16000})
+            self.assertEqual(ws.receive_json()["event"], "error")
+            FakeMinimax.fail = True
+            ws.send_json({"text": "hi"})
+            self.assertEqual(ws.receive_json()["event"], "start")
+            error = ws.receive_json()
+            self.assertEqual(error["event"], "error")
+            self.assertIn("upstream down", error["detail"])
+        self.assertEqual(self.used_seconds(), 0.0)
+
+    def test_hang_up_mid_utterance_bills_frames_sent(self):
+        class HangUp:
+            """A socket whose caller hangs up after five frames."""
+            def __init__(self):
+                self.frames = 0
+
+            async def send_json(self, data):
+                pass
+
+            async def send_bytes(self, frame):
+                if self.frames == 5:
+                    raise WebSocketDisconnect(1001)
+                self.frames += 1
+
+        message = '{"text": "Please hold", "encoding": "mulaw"}'
+        with self.assertRaises(WebSocketDisconnect):
+            asyncio.run(main.telephony_utterance(HangUp(), message, self.user, self.Session))
+        usage = self.usage()
+        self.assertEqual(usage.status, UsageStatus.ERROR)
+        self.assertEqual(usage.audio_seconds, 0.1)
+        self.assertEqual(self.used_seconds(), 0.1)
+        self.assertEqual(self.engine.pool.checkedout(), 0)
+
+    def test_plan_stream_limit(self):
+        with self.client.websocket_connect("/v1/tts/telephony"):
+            with self.assertRaises(WebSocketDisconnect) as ctx:
+                with self.client.websocket_connect("/v1/tts/telephony") as second:
+                    second.receive_json()
+        self.assertEqual(ctx.exception.code, 1013)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import base64
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src import main
+from src.dependencies import get_db, get_current_user
+from src.http_cache import preferred_media_type
+from src.minimax_client import MinimaxAPIError
+from src.models import Base, User, Plan
+
+AUDIO = b"\xff\xfb\x90\x00" * 1000
+OFFERED = ("application/json", "audio/mpeg")
+
+
+class FakeMinimax:
+    fail = False
+
+    def text_to_speech(self, text, encode_base64=True, **kwargs):
+        if self.fail:
+            raise MinimaxAPIError(500, "upstream down")
+        return {
+            "audio_data": AUDIO,
+            "audio_base64": base64.b64encode(AUDIO).decode() if encode_base64 else None,
+            "duration_seconds": 2.5,
+            "sample_rate": 32000,
+        }
+
+
+class TestPreferredMediaType(unittest.TestCase):
+    def test_negotiation(self):
+        self.assertEqual(preferred_media_type(None, OFFERED), "application/json")
+        self.assertEqual(preferred_media_type("*/*", OFFERED), "application/json")
+        self.assertEqual(preferred_media_type("audio/mpeg", OFFERED), "audio/mpeg")
+        self.assertEqual(preferred_media_type("audio/*", OFFERED), "audio/mpeg")
+        self.assertEqual(preferred_media_type("application/json;q=0.5, audio/mpeg", OFFERED), "audio/mpeg")
+        self.assertEqual(preferred_media_type("audio/*;q=0.2, */*;q=0.8", OFFERED), "application/json")
+        # n8n's HTTP Request node default
+        n8n = "application/json,text/html,application/xhtml+xml,application/xml,text/*;q=0.9, */*;q=0.1"
+        self.assertEqual(preferred_media_type(n8n, OFFERED), "application/json")
+        self.assertIsNone(preferred_media_type("text/html", OFFERED))
+
+
+class TestBinaryTTS(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        self.user = User(name="a", email="a@test.com", api_key_hash="h", plan=Plan.PRO,
+                         quota_seconds=100.0, used_seconds=0.0)
+        db.add(self.user)
+        db.commit()
+
+        def override_db():
+            yield db
+
+        main.app.dependency_overrides[get_db] = override_db
+        main.app.dependency_overrides[get_current_user] = lambda: self.user
+        self.addCleanup(main.app.dependency_overrides.clear)
+        self.addCleanup(db.close)
+        FakeMinimax.fail = False
+        patcher = mock.patch.object(main, "MinimaxClient", FakeMinimax)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def post(self, accept=None, **body):
+        headers = {"Accept": accept} if accept else {}
+        return self.client.post("/v1/tts", json={"text": "Hello there", **body}, headers=headers)
+
+    def test_json_by_default(self):
+        response = self.post()
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual(base64.b64decode(response.json()["audio_base64"]), AUDIO)
+
+    def test_raw_audio_with_metadata_headers(self):
+        response = self.post("audio/mpeg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "audio/mpeg")
+        self.assertEqual(response.content, AUDIO)
+        self.assertEqual(response.headers["x-audio-duration"], "2.500")
+        self.assertEqual(response.headers["x-remaining-quota"], "97.500")
+        self.assertEqual(response.headers["x-text-length"], "11")
+        self.assertIn("x-voice-used", response.headers)
+
+    def test_silent_fallback_matches_format(self):
+        FakeMinimax.fail = True
+        response = self.post("audio/mpeg")
+        self.assertEqual(response.headers["content-type"], "audio/mpeg")
+        self.assertEqual(response.content[:2], b"\xff\xfb")
+
+        response = self.post(output_format={"format": "wav"})
+        self.assertEqual(response.json()["format"], "wav")
+        self.assertTrue(base64.b64decode(response.json()["audio_base64"]).startswith(b"RIFF"))
+
+        # No local encoder for flac: WAV, labelled as such
+        response = self.post(output_format={"format": "flac"})
+        self.assertEqual(response.json()["format"], "wav")
+        self.assertTrue(base64.b64decode(response.json()["audio_base64"]).startswith(b"RIFF"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+import json
+import base64
+import tracemalloc
+import unittest
+from unittest import mock
+
+from src.minimax_client import MinimaxClient, _requests
+from src.upstream_parser import UpstreamAudioParser
+
+FRAME = b"\xff\xfb\x90\x00"
+CLIP_BYTES = 2 * 2 ** 20
+CHUNK = 65536
+
+
+def response_chunks(clip_bytes: int = CLIP_BYTES, chunk: int = CHUNK):
+    """A MiniMax response body, generated chunk by chunk."""
+    yield b'{"data": {"status": 2, "audio": "'
+    hex_chunk = (FRAME * (chunk // 8)).hex().encode()
+    for _ in range(clip_bytes // (chunk // 2)):
+        yield hex_chunk
+    yield b'"}, "extra_info": {"audio_format": "mp3"}, "base_resp": {"status_code": 0, "status_msg": "success"}}'
+
+
+def parse(body: bytes, chunk: int, size_hint=None):
+    parser = UpstreamAudioParser(size_hint)
+    for i in range(0, len(body), chunk):
+        parser.feed(body[i:i + chunk])
+    return parser.close()
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, chunks, content_length):
+        self.chunks = chunks
+        self.headers = {"Content-Length": str(content_length)}
+
+    def iter_content(self, chunk_size):
+        return self.chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class TestUpstreamAudioParser(unittest.TestCase):
+    def test_matches_json_loads_at_any_chunk_size(self):
+        audio = bytes(range(256)) * 3
+        document = {
+            "trace_id": 'x"audio": "',
+            "data": {"audio": audio.hex(), "status": 2},
+            "extra_info": {"audio": "not this one", "audio_size": len(audio)},
+            "base_resp": {"status_code": 0, "status_msg": "success"},
+        }
+        body = json.dumps(document).encode()
+        for chunk in (1, 2, 3, 7, 64, len(body)):
+            meta, decoded = parse(body, chunk, size_hint=len(body))
+            self.assertEqual(decoded, audio)
+            self.assertEqual(meta["data"], {"audio": "", "status": 2})
+            self.assertEqual(meta["extra_info"]["audio"], "not this one")
+            self.assertEqual(meta["trace_id"], 'x"audio": "')
+
+    def test_error_response_without_audio(self):
+        body = b'{"base_resp": {"status_code": 1008, "status_msg": "insufficient balance"}}'
+        parser = UpstreamAudioParser(len(body))
+        parser.feed(body)
+        meta, audio = parser.close()
+        self.assertFalse(parser.found_audio)
+        self.assertEqual(audio, b"")
+        self.assertEqual(meta["base_resp"]["status_code"], 1008)
+
+    def test_buffer_grows_past_a_short_hint(self):
+        body = json.dumps({"data": {"audio": (FRAME * 100).hex()}}).encode()
+        self.assertEqual(parse(body, 5, size_hint=10)[1], FRAME * 100)
+
+    def test_malformed_input(self):
+        for body in (b'{"data": {"audio": "zz"}}', b'{"data": {"audio": "abc"}}',
+                     b'{"data": {"audio": "abcd', b'{"data": '):
+            with self.assertRaises(ValueError):
+                parse(body, 4)
+
+
+class TestPeakMemory(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        _requests()  # keep the lazy import out of the traced allocations
+
+    def peak_during(self, func):
+        tracemalloc.start()
+        try:
+            result = func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, peak
+
+    def call_client(self, encode_base64: bool):
+        client = MinimaxClient(api_key="key", group_id="1")
+        length = 2 * CLIP_BYTES + 200
+        session = mock.Mock()
+        session.post.return_value = FakeResponse(response_chunks(), length)
+        with mock.patch("src.minimax_client.get_http_session", return_value=session), \
+                mock.patch("builtins.print"):
+            return client.text_to_speech("hello", "voice", encode_base64=encode_base64)
+
+    def test_raw_audio_peak_is_about_one_clip(self):
+        result, peak = self.peak_during(lambda: self.call_client(encode_base64=False))
+        self.assertEqual(len(result["audio_data"]), CLIP_BYTES)
+        self.assertEqual(result["audio_data"][:4], FRAME)
+        # Clip buffer plus a chunk or two; json.loads alone needed 2x the clip
+        self.assertLess(peak, CLIP_BYTES * 1.2)
+
+    def test_base64_peak_below_whole_body_parsing(self):
+        def whole_body():
+            data = json.loads(b"".join(response_chunks()))
+            audio = bytes.fromhex(data["data"]["audio"])
+            return base64.b64encode(audio).decode("utf-8")
+
+        _, baseline = self.peak_during(whole_body)
+        result, peak = self.peak_during(lambda: self.call_client(encode_base64=True))
+        self.assertEqual(base64.b64decode(result["audio_base64"])[:4], FRAME)
+        self.assertLess(peak, baseline * 0.75)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.pool import StaticPool
+
+from src import usage_archive
+from src.models import Base, User, Usage, UsageStatus, Plan
+from src.usage_archive import (
+    archive_closed_days, closed_days_to_archive, archived_days, query_archive, day_path,
+)
+
+
+@unittest.skipUnless(usage_archive.ARCHIVE_AVAILABLE, "pyarrow not installed")
+class TestUsageArchive(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        self.dir = tempfile.mkdtemp()
+        start = datetime(2026, 10, 1)
+        rows = []
+        for i in range(72):  # one row per hour, Oct 1-3
+            rows.append({
+                "user_id": 1, "voice_id": 1 + i % 2, "text_length": 100 * (i % 10),
+                "audio_seconds": 2.0, "model_used": "speech-02-hd" if i % 3 else "speech-02-turbo",
+                "status": UsageStatus.ERROR if i % 4 == 0 else UsageStatus.SUCCESS,
+                "timestamp": start + timedelta(hours=i),
+            })
+        with self.engine.begin() as conn:
+            conn.execute(insert(User).values(id=1, name="a", email="a@test.com", api_key_hash="h", plan=Plan.FREE))
+            conn.execute(insert(Usage), rows)
+
+    def test_archives_only_closed_days(self):
+        # Oct 3 is still within the grace period at 00:30 on Oct 4
+        now = datetime(2026, 10, 4, 0, 30)
+        self.assertEqual(closed_days_to_archive(self.engine, now, self.dir),
+                         [date(2026, 10, 1), date(2026, 10, 2)])
+        result = archive_closed_days(self.engine, now, self.dir)
+        self.assertEqual(result["rows"], 48)
+        self.assertTrue(os.path.exists(day_path(date(2026, 10, 1), self.dir)))
+        self.assertEqual(archive_closed_days(self.engine, now, self.dir)["days"], [])
+
+        archive_closed_days(self.engine, datetime(2026, 10, 5), self.dir)
+        self.assertEqual(len(archived_days(self.dir)), 3)
+
+    def test_query_groups(self):
+        archive_closed_days(self.engine, datetime(2026, 10, 5), self.dir)
+
+        total = query_archive(date(2026, 10, 1), date(2026, 10, 3), [], self.dir)
+        self.assertEqual(total["days"], 2)
+        self.assertEqual(total["rows"], [{"requests": 48, "audio_seconds": 96.0,
+                                          "text_length": 20800, "error_rate": 0.25}])
+
+        by_voice_hour = query_archive(date(2026, 10, 1), date(2026, 10, 4), ["voice_id", "hour"], self.dir)
+        self.assertEqual(len(by_voice_hour["rows"]), 24)
+        self.assertEqual(by_voice_hour["rows"][0], {"voice_id": 1, "hour": 0, "requests": 3,
+                                                    "audio_seconds": 6.0, "text_length": 1200,
+                                                    "error_rate": 1.0})
+
+        by_model = query_archive(date(2026, 10, 1), date(2026, 10, 4),
+                                 ["model_used", "text_length_bucket"], self.dir)
+        self.assertEqual(sum(row["requests"] for row in by_model["rows"]), 72)
+        self.assertEqual({row["text_length_bucket"] for row in by_model["rows"]}, {0, 500})
+
+    def test_unknown_group_key(self):
+        with self.assertRaises(ValueError):
+            query_archive(date(2026, 10, 1), date(2026, 10, 2), ["colour"], self.dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import csv
+import io
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.pool import StaticPool
+
+from src.models import Base, User, Usage, UsageStatus, Plan
+from src.usage_export import iter_usage_export, cycle_bounds, EXPORT_FIELDS
+
+
+class TestUsageExport(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        start = datetime(2026, 9, 30, 12)
+        with self.engine.begin() as conn:
+            conn.execute(insert(User).values(id=1, name="a", email="a@test.com", api_key_hash="h", plan=Plan.FREE))
+            conn.execute(insert(Usage), [
+                {"user_id": 1, "text_length": i, "audio_seconds": i / 10, "status": UsageStatus.SUCCESS,
+                 "model_used": "speech-02-hd", "timestamp": start + timedelta(hours=i)}
+                for i in range(50)
+            ])
+
+    def export(self, fmt, **kwargs):
+        start, end = cycle_bounds("2026-10")
+        chunks = list(iter_usage_export(self.engine, start, end, fmt, batch_size=7, **kwargs))
+        return chunks, b"".join(chunks).decode()
+
+    def test_csv_in_batches(self):
+        chunks, body = self.export("csv")
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], EXPORT_FIELDS)
+        # 09-30 12:00 .. 23:00 fall outside the cycle
+        self.assertEqual(len(rows) - 1, 38)
+        self.assertEqual(rows[1][EXPORT_FIELDS.index("timestamp")], "2026-10-01T00:00:00")
+        self.assertEqual(rows[1][EXPORT_FIELDS.index("status")], "success")
+        self.assertEqual(len(chunks), 6)
+
+    def test_ndjson_resume(self):
+        _, body = self.export("ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        _, rest = self.export("ndjson", after_id=rows[9]["id"])
+        resumed = [json.loads(line) for line in rest.splitlines()]
+        self.assertEqual(rows[10:], resumed)
+
+        _, csv_rest = self.export("csv", after_id=rows[9]["id"])
+        self.assertEqual(len(csv_rest.splitlines()), 28)  # no header on resume
+        self.assertEqual(self.export("csv", after_id=rows[-1]["id"])[1], "")
+
+    def test_empty_range(self):
+        chunks = list(iter_usage_export(self.engine, *cycle_bounds("2025-01"), "csv"))
+        self.assertEqual(b"".join(chunks).decode().strip(), ",".join(EXPORT_FIELDS))
+        self.assertEqual(list(iter_usage_export(self.engine, *cycle_bounds("2025-01"), "ndjson")), [])
+
+    def test_cycle_bounds(self):
+        self.assertEqual(cycle_bounds("2026-12"), (datetime(2026, 12, 1), datetime(2027, 1, 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
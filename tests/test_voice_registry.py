@@ -0,0 +1,123 @@
+from __future__ import annotations
+import os
+import json
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.models import Base, Voice, Gender
+from src.http_cache import etag_matches
+from src.shared_state import MemoryStore
+from src.voice_registry import VoiceRegistry
+
+
+FILE_VOICES = [
+    {"id": "marcus", "name": "Marcus", "minimax_voice_id": "m1", "language": "en-US", "gender": "male"},
+    {"id": "joslyn", "name": "Joslyn", "minimax_voice_id": "m2", "language": "en-NG", "gender": "female"},
+    {"id": "retired", "name": "Retired", "minimax_voice_id": "m3", "language": "en-GB", "gender": "male",
+     "is_active": False},
+]
+
+
+class TestVoiceRegistry(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.write_voices(FILE_VOICES)
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+        self.store = MemoryStore()
+        self.registry = VoiceRegistry(self.path, session_factory=self.Session, check_interval=0,
+                                      store=self.store)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def write_voices(self, voices, mtime=None):
+        with open(self.path, "w") as f:
+            json.dump({"voices": voices}, f)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_indexes(self):
+        snap = self.registry.snapshot()
+        self.assertEqual(snap.get("marcus")["minimax_voice_id"], "m1")
+        self.assertIsNotNone(snap.get("retired"))
+        self.assertEqual(snap.default["id"], "marcus")
+        self.assertEqual([v["id"] for v in snap.filter(language="en")], ["marcus", "joslyn"])
+        self.assertEqual([v["id"] for v in snap.filter(language="en-NG")], ["joslyn"])
+        self.assertEqual([v["id"] for v in snap.filter(gender="MALE")], ["marcus"])
+        self.assertEqual(snap.filter(language="en-NG", gender="male"), ())
+        with self.assertRaises(TypeError):
+            snap.get("marcus")["name"] = "changed"
+
+    def test_reloads_on_file_change(self):
+        first = self.registry.snapshot()
+        self.assertIs(self.registry.snapshot(), first)
+        self.write_voices(FILE_VOICES + [{"id": "new", "name": "New", "minimax_voice_id": "m4"}],
+                          mtime=os.stat(self.path).st_mtime + 10)
+        second = self.registry.snapshot()
+        self.assertIsNot(second, first)
+        self.assertIsNotNone(second.get("new"))
+        self.assertIsNone(first.get("new"))
+
+    def test_merges_db_voices(self):
+        self.registry.snapshot()
+        db = self.Session()
+        db.add(Voice(friendly_name="nigerian-male", minimax_voice_id="db1", language="en-NG", gender=Gender.MALE))
+        db.add(Voice(friendly_name="marcus", minimax_voice_id="shadowed", language="en-US", gender=Gender.MALE))
+        db.commit()
+        db.close()
+
+        snap = self.registry.snapshot()
+        self.assertEqual(snap.get("nigerian-male")["minimax_voice_id"], "db1")
+        self.assertEqual(snap.get("marcus")["minimax_voice_id"], "m1")
+        self.assertEqual([v["id"] for v in snap.filter(language="en-NG", gender="male")], ["nigerian-male"])
+
+    def test_reloads_on_db_edit(self):
+        db = self.Session()
+        voice = Voice(friendly_name="nigerian-male", minimax_voice_id="db1", language="en-NG", gender=Gender.MALE)
+        db.add(voice)
+        db.commit()
+        self.assertEqual(self.registry.snapshot().get("nigerian-male")["minimax_voice_id"], "db1")
+        # Same count, max id and active count: only updated_at moves
+        voice.minimax_voice_id = "db2"
+        db.commit()
+        db.close()
+        self.assertEqual(self.registry.snapshot().get("nigerian-male")["minimax_voice_id"], "db2")
+
+    def test_invalidate_reaches_other_workers(self):
+        other = VoiceRegistry(self.path, session_factory=self.Session, check_interval=0, store=self.store)
+        first = other.snapshot()
+        self.assertIs(other.snapshot(), first)
+        self.registry.invalidate()
+        self.assertIsNot(other.snapshot(), first)
+
+    def test_rendered_lists(self):
+        snap = self.registry.snapshot()
+        rendered = snap.rendered_list(language="en-NG")
+        self.assertEqual([v["id"] for v in json.loads(rendered.body)], ["joslyn"])
+        self.assertIs(snap.rendered_list(language="en-NG", gender=None), rendered)
+        self.assertIs(snap.rendered_list(gender="Male"), snap.rendered_list(gender="male"))
+        self.assertEqual(json.loads(snap.rendered_list(language="fr").body), [])
+        self.assertNotEqual(snap.rendered_list().etag, rendered.etag)
+
+    def test_etag_stable_across_rebuilds(self):
+        etag = self.registry.snapshot().rendered_list().etag
+        self.write_voices(FILE_VOICES, mtime=os.stat(self.path).st_mtime + 10)
+        self.assertEqual(self.registry.snapshot().rendered_list().etag, etag)
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"x", W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches("*", '"abc"'))
+        self.assertFalse(etag_matches('"abcd"', '"abc"'))
+        self.assertFalse(etag_matches(None, '"abc"'))
+
+
+if __name__ == '__main__':
+    unittest.main()